@@ -2,6 +2,8 @@
 ASGI config for Mispronunciation project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections (live pronunciation feedback)
+go to pronouncePerfect.live_feedback.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +15,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Mispronunciation.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from pronouncePerfect.live_feedback import websocket_application  # noqa: E402 (needs Django set up)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -83,6 +83,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     
     'corsheaders.middleware.CorsMiddleware',
+    'pronouncePerfect.services.metrics.TimingsMiddleware',
 ]
 
 ROOT_URLCONF = 'Mispronunciation.urls'
@@ -119,6 +120,24 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Disk cache for transcriptions (see TRANSCRIPTION_CACHE); culls entries beyond MAX_ENTRIES
+    'transcriptions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'transcriptions'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -153,9 +172,156 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+## --audio decoding
+# Uploads are decoded in memory; above this size they are decoded from a temporary file instead.
+AUDIO_SPOOL_THRESHOLD_BYTES = 10 * 1024 * 1024
+# ffmpeg executable used to decode formats libsndfile cannot read (webm, m4a, ...)
+FFMPEG_BINARY = 'ffmpeg'
+
 # Path to the fine-tuned model
 MODEL_DIR = os.path.join(BASE_DIR, 'pronouncePerfect', 'models', 'fine_tuned_model')
 NEP_MODEL_DIR = os.path.join(BASE_DIR, 'pronouncePerfect', 'models', 'wav2vec_nep_model')
+# Languages whose ASR models are loaded (and warmed up) when the app starts, e.g. ['eng', 'np'].
+# Empty means each model is loaded on its first request and kept for the life of the process.
+ASR_PRELOAD_LANGUAGES = []
+# Back the fp32 model weights with read-only memory maps of the checkpoints' .safetensors files,
+# so every worker process on the host shares one copy through the page cache. Combine with
+# GUNICORN_PRELOAD=1 (see gunicorn.conf.py); 'manage.py memory_report' shows the effect.
+ASR_MMAP_WEIGHTS = False
+
+# Energy-based voice activity detection before inference. Frames quieter than THRESHOLD_DB
+# relative to the loudest frame are silence; PADDING_MS of context is kept around speech.
+# With SPLIT, pauses longer than MIN_SILENCE_MS are cut out and each segment is transcribed on its own.
+# Off by default: trimming changes transcriptions and can clip the onsets of quiet speakers, so
+# check it on recordings of the target users before enabling it.
+ASR_VAD = {
+    'ENABLED': False,
+    'THRESHOLD_DB': -40,
+    'FRAME_MS': 30,
+    'PADDING_MS': 200,
+    'SPLIT': False,
+    'MIN_SILENCE_MS': 700,
+}
+
+# Dynamic micro-batching: concurrent transcription requests for the same language are
+# collected for up to MAX_WAIT_MS (or MAX_BATCH_SIZE requests) and run in one forward pass.
+# Models with group norm feature extractors (feat_extract_norm == "group", such as the English
+# fine_tuned_model) cannot mask padding, so only clips of equal length share their pass.
+ASR_BATCHING = {
+    'ENABLED': False,
+    'MAX_BATCH_SIZE': 8,
+    'MAX_WAIT_MS': 20,
+}
+
+# Languages served by a dynamically int8-quantized model (Linear layers only). Faster and
+# smaller on CPU at a small accuracy cost; compare with 'manage.py quantization_report'.
+ASR_QUANTIZED_LANGUAGES = []
+
+# Inference backend per language: 'torch' (eager PyTorch) or 'onnx' (ONNX Runtime, CPU provider).
+# The onnx backend reads model.onnx from the model directory; create it with 'manage.py export_onnx'.
+ASR_BACKENDS = {
+    'eng': 'torch',
+    'np': 'torch',
+}
+# ONNX Runtime thread pools (0: intra-op follows ASR_THREADING, inter-op is left to onnxruntime)
+ONNX_INTRA_OP_THREADS = 0
+ONNX_INTER_OP_THREADS = 0
+
+# Recordings longer than ASR_CHUNK_LENGTH_S seconds are transcribed in overlapping windows of
+# that length; ASR_STRIDE_LENGTH_S seconds of context on each side of a window are discarded.
+ASR_CHUNK_LENGTH_S = 20
+ASR_STRIDE_LENGTH_S = 4
+
+# CTC decoding per language. TYPE 'greedy' takes the most likely token of every frame (fastest);
+# 'beam' runs a prefix beam search keeping BEAM_WIDTH prefixes, expanding only tokens with a
+# log-probability of at least PRUNE_LOG_PROB in a frame. Each word it completes scores
+# LM_WEIGHT * log P(word | previous words) under a word n-gram model of order LM_ORDER built from
+# the PracticeSample texts of the language (0 disables it; built once per process), plus
+# WORD_BONUS, plus HOTWORD_BONUS if the word is in the sentence the speaker was asked to read.
+# 'manage.py benchmark_decoder' reports the cost per audio-second of each setting.
+ASR_DECODER = {
+    'eng': {'TYPE': 'greedy'},
+    'np': {'TYPE': 'greedy'},
+}
+
+# Live feedback over WebSocket (pronouncePerfect/live_feedback.py): shorter windows give
+# feedback sooner at some cost in accuracy; sessions are cut off after LIVE_MAX_SECONDS.
+LIVE_CHUNK_LENGTH_S = 4
+LIVE_STRIDE_LENGTH_S = 1
+LIVE_MAX_SECONDS = 300
+
+# Transcriptions are cached by hash of the decoded audio + language + model version, so
+# re-submitted recordings skip inference. MAX_ENTRIES bounds the in-process LRU; set
+# DJANGO_CACHE to an alias in CACHES (e.g. 'transcriptions') to share results between workers.
+TRANSCRIPTION_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 1024,
+    'DJANGO_CACHE': None,
+    'TIMEOUT': 7 * 24 * 3600,
+}
+
+# Background transcription jobs (/api/jobs/). EXECUTOR is 'process' (spawned worker processes,
+# each loading its own models) or 'thread'. Submissions beyond MAX_QUEUE_DEPTH unfinished jobs
+# per web process get a 429; long-polling waits at most MAX_WAIT_S seconds.
+TRANSCRIPTION_JOBS = {
+    'EXECUTOR': 'process',
+    'WORKERS': 2,
+    'MAX_QUEUE_DEPTH': 16,
+    'MAX_WAIT_S': 30,
+}
+
+# Latency metrics exported at /metrics (Prometheus text format). BUCKETS are the histogram
+# bucket bounds in seconds. Requests sending the DEBUG_HEADER get a 'timings' object (seconds
+# per pipeline stage, plus 'total') added to their JSON response.
+METRICS = {
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+    'DEBUG_HEADER': 'X-Debug-Timings',
+}
+
+# Thread topology of each worker process. The usable CPUs are split between WORKERS processes
+# (None: $WEB_CONCURRENCY, else 1); each runs INTRA_OP_THREADS torch threads (None: its share
+# of the CPUs) and INTER_OP_THREADS inter-op threads. PIN_CPUS pins every worker to its own
+# block of CPUs. 'manage.py calibrate_topology' recommends values for a host.
+ASR_THREADING = {
+    'WORKERS': None,
+    'INTRA_OP_THREADS': None,
+    'INTER_OP_THREADS': 1,
+    'PIN_CPUS': False,
+}
+
+# Batch scoring (/api/batch-score/, 'manage.py score_batch'): DECODE_WORKERS threads decode the
+# uploads while decoded clips are transcribed BATCH_SIZE at a time. Requests with more than
+# MAX_FILES files are refused (Django's DATA_UPLOAD_MAX_NUMBER_FILES caps uploads too).
+BATCH_SCORING = {
+    'DECODE_WORKERS': 4,
+    'BATCH_SIZE': 8,
+    'MAX_FILES': 100,
+}
+
+# With a threshold, /api/process-audio-text/ decides each expected word by its acoustic
+# confidence (frame-averaged CTC posterior from forced alignment, 0..1) instead of exact string
+# equality: 'correct' at or above the threshold. None keeps string comparison; requests can
+# override it with a 'confidence_threshold' field.
+COMPARISON_CONFIDENCE_THRESHOLD = None
+
+# Word comparison aligns the expected text and the transcription with a banded edit distance:
+# only alignments that stay within WORD_ALIGNMENT_BAND words of the diagonal are considered, so
+# the cost grows linearly with passage length. Raise it if readers skip or repeat longer stretches.
+WORD_ALIGNMENT_BAND = 32
+
+# Rule tables of the Nepali comparer (schwa variations, homophones, honorifics, sound classes).
+# Running processes check the file every NEPALI_RULES_RELOAD_INTERVAL_S seconds and swap in the
+# new tables when it changed (0 disables reloading).
+NEPALI_RULES_FILE = os.path.join(BASE_DIR, 'pronouncePerfect', 'data', 'nepali_rules.json')
+NEPALI_RULES_RELOAD_INTERVAL_S = 5
+
+# Word list used by segment_nepali_text to split run-together ASR output (one word per line,
+# optionally "<word>\t<count>"); loaded once per process.
+NEPALI_LEXICON_FILE = os.path.join(BASE_DIR, 'pronouncePerfect', 'data', 'nepali_words.txt')
+# Compiled, memory-mapped form of the word list ('manage.py build_lexicon'); used instead of
+# NEPALI_LEXICON_FILE when it exists. Workers share its pages and open it instantly.
+NEPALI_LEXICON_COMPILED = os.path.join(BASE_DIR, 'pronouncePerfect', 'data', 'nepali_words.lex')
+
 # W2V_EN_MODEL_DIR = os.path.join(BASE_DIR, 'pronouncePerfect', 'models', 'wav2vec_en_model')
 
 # WHISPER_NEP_MODEL_DIR = os.path.join(BASE_DIR, 'pronouncePerfect', 'models', 'whisper_nep_model')
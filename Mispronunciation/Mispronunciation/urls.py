@@ -20,10 +20,12 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 from . import views
+from pronouncePerfect import views as pronounce_views
 
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include ('pronouncePerfect.urls')),
+    path('metrics', pronounce_views.metrics, name='metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
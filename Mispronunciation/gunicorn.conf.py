@@ -0,0 +1,34 @@
+# Gunicorn settings: gunicorn -c gunicorn.conf.py Mispronunciation.wsgi
+# Each worker gets its share of the CPUs for torch (settings.ASR_THREADING); set the values
+# recommended by 'manage.py calibrate_topology' here and in settings.py.
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = 120
+# GUNICORN_PRELOAD=1 loads settings.ASR_PRELOAD_LANGUAGES in the master before forking, so the
+# workers share the model weights copy-on-write instead of loading a copy each
+preload_app = os.environ.get('GUNICORN_PRELOAD') == '1'
+if preload_app:
+    os.environ['ASR_PRELOAD_FOR_FORK'] = '1'
+
+# The topology splits the CPUs between this many workers
+os.environ['WEB_CONCURRENCY'] = str(workers)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Mispronunciation.settings')
+
+
+def pre_fork(server, worker):
+    # Runs in the arbiter: give the new worker the lowest index no live worker holds
+    taken = {getattr(other, 'topology_index', None) for other in server.WORKERS.values()}
+    worker.topology_index = next(index for index in range(len(taken) + 1) if index not in taken)
+
+
+def post_fork(server, worker):
+    os.environ['ASR_WORKER_INDEX'] = str(worker.topology_index)
+    # With preload_app the app (and its first apply_topology) was set up before the fork
+    if server.cfg.preload_app:
+        from django.conf import settings
+        from pronouncePerfect.services.model_registry import model_registry
+        from pronouncePerfect.services.topology import apply_topology
+        apply_topology(worker.topology_index)
+        model_registry.warm_up(getattr(settings, 'ASR_PRELOAD_LANGUAGES', []))
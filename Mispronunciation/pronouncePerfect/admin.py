@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import PracticeSample
+from .models import PracticeSample, TranscriptionJob
 
 admin.site.register(PracticeSample)
+admin.site.register(TranscriptionJob)
 
 # Register your models here.
@@ -1,6 +1,25 @@
+import os
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PronounceperfectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pronouncePerfect'
+
+    def ready(self):
+        # Split the CPUs between the worker processes before any model runs. The master of a
+        # preloading server is not pinned: each forked worker pins itself (gunicorn.conf.py)
+        from .services.topology import apply_topology
+        apply_topology(pin=False if os.environ.get('ASR_PRELOAD_FOR_FORK') else None)
+
+        # Optionally load the ASR models at start-up so the first request does not pay for it
+        languages = getattr(settings, 'ASR_PRELOAD_LANGUAGES', [])
+        if languages:
+            from .services.model_registry import model_registry
+            if os.environ.get('ASR_PRELOAD_FOR_FORK'):
+                # Master process of a preloading server: the workers warm up after the fork
+                model_registry.preload(languages)
+            else:
+                model_registry.warm_up(languages)
@@ -0,0 +1,147 @@
+"""
+Live pronunciation feedback over a WebSocket (plain ASGI, routed from Mispronunciation/asgi.py).
+
+Protocol:
+    1. Connect to ws://<host>/ws/live-feedback/
+    2. Send a JSON text frame to start the session:
+           {"type": "start", "language": "np", "sample_id": 3}
+       or  {"type": "start", "language": "eng", "text": "expected sentence"}
+       Optional: "format": "f32le" (default) or "s16le".
+    3. Send binary frames of raw 16 kHz mono PCM while the user reads.
+    4. Send {"type": "stop"} when the recording ends.
+
+The server answers with JSON text frames:
+    {"type": "ready"}
+    {"type": "partial", "transcription": ..., "result": [[word, status], ...]}
+    {"type": "final", "transcription": ..., "result": [[word, status], ...]}
+    {"type": "error", "error": ...}
+"""
+import json
+import logging
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from pronouncePerfect.models import PracticeSample
+from pronouncePerfect.services.text_analysis import compare_transcription
+
+logger = logging.getLogger(__name__)
+
+LIVE_FEEDBACK_PATH = '/ws/live-feedback/'
+
+PCM_FORMATS = {
+    'f32le': (np.dtype('<f4'), 1.0),
+    's16le': (np.dtype('<i2'), 1 / 32768),
+}
+
+
+def expected_prefix(text, transcription):
+    """
+    The part of the expected text the user has plausibly read so far: as many words
+    as the partial transcription has, plus one, so unread words are not flagged.
+    """
+    words = text.split()
+    return ' '.join(words[:len(transcription.split()) + 1])
+
+
+class LiveFeedbackSession:
+    def __init__(self, language, text, pcm_format):
+        # Imported here so the ASGI application starts without torch; the first session loads it
+        from pronouncePerfect.services.streaming import StreamingTranscriber
+
+        self.language = language
+        self.text = text
+        self.dtype, self.scale = PCM_FORMATS[pcm_format]
+        self.transcriber = StreamingTranscriber(language,
+                                                chunk_length_s=settings.LIVE_CHUNK_LENGTH_S,
+                                                stride_length_s=settings.LIVE_STRIDE_LENGTH_S,
+                                                expected_text=text)
+        self.max_samples = int(settings.LIVE_MAX_SECONDS * 16000)
+        self.received_samples = 0
+
+    def feed(self, data):
+        """Returns a partial feedback message once a window completes, else None."""
+        samples = np.frombuffer(data, dtype=self.dtype).astype(np.float32) * self.scale
+        self.received_samples += len(samples)
+        if self.received_samples > self.max_samples:
+            raise ValueError(f"Recording exceeds {settings.LIVE_MAX_SECONDS} seconds")
+        transcription = self.transcriber.feed(samples)
+        if transcription is None:
+            return None
+        result = compare_transcription(transcription, expected_prefix(self.text, transcription), self.language)
+        return {'type': 'partial', 'transcription': transcription, 'result': result}
+
+    def finish(self):
+        transcription = self.transcriber.finish()
+        result = compare_transcription(transcription, self.text, self.language)
+        return {'type': 'final', 'transcription': transcription, 'result': result}
+
+
+def _start_session(message):
+    language = message.get('language')
+    text = (message.get('text') or '').strip()
+    if message.get('sample_id') is not None:
+        sample = PracticeSample.objects.get(pk=message['sample_id'])
+        text, language = sample.text, language or sample.language
+    if not text:
+        raise ValueError("Missing text or sample_id")
+    pcm_format = message.get('format', 'f32le')
+    if pcm_format not in PCM_FORMATS:
+        raise ValueError(f"Unsupported audio format: {pcm_format}")
+    return LiveFeedbackSession(language, text, pcm_format)
+
+
+async def live_feedback(scope, receive, send):
+    """ASGI application for one live feedback WebSocket connection."""
+    session = None
+
+    async def send_json(payload):
+        await send({'type': 'websocket.send', 'text': json.dumps(payload, ensure_ascii=False)})
+
+    while True:
+        event = await receive()
+
+        if event['type'] == 'websocket.connect':
+            await send({'type': 'websocket.accept'})
+
+        elif event['type'] == 'websocket.disconnect':
+            return
+
+        elif event['type'] == 'websocket.receive':
+            try:
+                if event.get('bytes') is not None:
+                    if session is None:
+                        raise ValueError("Send a start message before audio")
+                    feedback = await sync_to_async(session.feed, thread_sensitive=False)(event['bytes'])
+                    if feedback is not None:
+                        await send_json(feedback)
+                    continue
+
+                message = json.loads(event.get('text') or '{}')
+                if message.get('type') == 'start':
+                    session = await sync_to_async(_start_session)(message)
+                    await send_json({'type': 'ready'})
+                elif message.get('type') == 'stop':
+                    if session is None:
+                        raise ValueError("No active session")
+                    await send_json(await sync_to_async(session.finish, thread_sensitive=False)())
+                    await send({'type': 'websocket.close', 'code': 1000})
+                    return
+                else:
+                    raise ValueError(f"Unknown message type: {message.get('type')}")
+
+            except Exception as e:
+                logger.exception(f"Live feedback error: {e}")
+                await send_json({'type': 'error', 'error': str(e)})
+                await send({'type': 'websocket.close', 'code': 1011})
+                return
+
+
+async def websocket_application(scope, receive, send):
+    """Routes WebSocket connections by path."""
+    if scope['path'] == LIVE_FEEDBACK_PATH:
+        await live_feedback(scope, receive, send)
+        return
+    await receive()  # websocket.connect
+    await send({'type': 'websocket.close', 'code': 4404})
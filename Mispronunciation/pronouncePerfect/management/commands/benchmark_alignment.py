@@ -0,0 +1,91 @@
+import difflib
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from pronouncePerfect.models import PracticeSample
+from pronouncePerfect.services.text_analysis import compare_texts
+from pronouncePerfect.services.word_alignment import align_words, alignment_cost
+
+FALLBACK_WORDS = ("the quick brown fox jumps over a lazy dog while she sells sea shells by the "
+                  "shore and peter piper picked a peck of pickled peppers").split()
+
+
+def difflib_compare(transcription_words, input_words):
+    """The comparison compare_texts used to do: SequenceMatcher opcodes plus a ±2 word scan."""
+    output = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, input_words, transcription_words).get_opcodes():
+        if tag != "insert":
+            output.extend((input_words[k], "correct" if tag == "equal" else "incorrect") for k in range(i1, i2))
+    for i, (word, status) in enumerate(output):
+        if status == "incorrect" and word in transcription_words[max(0, i - 2):i + 3]:
+            output[i] = (word, "correct")
+    return output
+
+
+class Command(BaseCommand):
+    help = ("Times the banded word alignment used by compare_texts against the previous "
+            "difflib-based comparison on long passages with misread, skipped and extra words, "
+            "and reports how many words each one marks as they were actually read.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=1000, help="Words per passage.")
+        parser.add_argument('--error-rates', default='0.05,0.2,0.4',
+                            help="Comma-separated fractions of words to corrupt.")
+        parser.add_argument('--band', type=int, default=None, help="Alignment band (default: settings).")
+        parser.add_argument('--repeats', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [word.lower() for sample in PracticeSample.objects.filter(language='eng')
+                      for word in sample.text.split() if word.isalpha()] or FALLBACK_WORDS
+
+        self.stdout.write(f"{options['words']}-word passages")
+        self.stdout.write(f"{'errors':>7} {'difflib':>10} {'banded':>10} {'compare_texts':>14} {'edit cost':>10} "
+                          f"{'difflib ok':>11} {'banded ok':>10}")
+        for rate in (float(r) for r in options['error_rates'].split(',')):
+            expected = [rng.choice(vocabulary) for _ in range(options['words'])]
+            spoken, truth = self._corrupt(expected, rate, vocabulary, rng)
+            expected_text, spoken_text = ' '.join(expected), ' '.join(spoken)
+
+            timings = {}
+            for name, function in (
+                ('difflib', lambda: difflib_compare(spoken, expected)),
+                ('banded', lambda: align_words(expected, spoken, band=options['band'])),
+                ('compare_texts', lambda: compare_texts(spoken_text, expected_text, 'eng')),
+            ):
+                timings[name] = min(timeit.repeat(function, number=1, repeat=options['repeats']))
+            cost = alignment_cost(align_words(expected, spoken, band=options['band']))
+            agreement = {name: sum((status == "correct") == read for (_, status), read in zip(result, truth)) / len(truth)
+                         for name, result in (('difflib', difflib_compare(spoken, expected)),
+                                              ('banded', compare_texts(spoken_text, expected_text, 'eng')))}
+            self.stdout.write(f"{rate:>7.0%} {timings['difflib'] * 1000:>7.1f} ms {timings['banded'] * 1000:>7.1f} ms "
+                              f"{timings['compare_texts'] * 1000:>11.1f} ms {cost:>10.1f} "
+                              f"{agreement['difflib']:>11.1%} {agreement['banded']:>10.1%}")
+
+    @staticmethod
+    def _corrupt(words, rate, vocabulary, rng):
+        """
+        Misreads (one letter changed or another word), skips and inserts words at `rate`.
+        Returns: (spoken words, whether each expected word was read as written)
+        """
+        spoken, truth = [], []
+        for word in words:
+            if rng.random() >= rate:
+                spoken.append(word)
+                truth.append(True)
+                continue
+            kind = rng.random()
+            truth.append(kind >= 0.85)
+            if kind < 0.5:
+                position = rng.randrange(len(word))
+                spoken.append(word[:position] + rng.choice('aeiourst') + word[position + 1:])
+            elif kind < 0.7:
+                spoken.append(rng.choice(vocabulary))
+            elif kind < 0.85:
+                continue
+            else:
+                spoken.extend([word, rng.choice(vocabulary)])
+        return spoken, truth
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from pronouncePerfect.services.audio_processing import transcribe_waveforms
+from pronouncePerfect.services.batching import BatchScheduler, percentile
+
+
+class Command(BaseCommand):
+    help = "Compares per-request transcription with the micro-batching scheduler under concurrent load."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', default='eng', choices=['eng', 'np'])
+        parser.add_argument('--requests', type=int, default=32, help="Total number of requests.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Number of concurrent clients.")
+        parser.add_argument('--min-seconds', type=float, default=2.0, help="Shortest synthetic clip.")
+        parser.add_argument('--max-seconds', type=float, default=6.0, help="Longest synthetic clip.")
+        parser.add_argument('--max-batch-size', type=int, default=8)
+        parser.add_argument('--max-wait-ms', type=float, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        durations = rng.uniform(options['min_seconds'], options['max_seconds'], options['requests'])
+        waveforms = [(rng.standard_normal(int(d * 16000)) * 0.1).astype(np.float32) for d in durations]
+        language = options['language']
+
+        # Load the model before timing anything
+        transcribe_waveforms([waveforms[0]], language)
+
+        def single(waveform):
+            return transcribe_waveforms([waveform], language)[0]
+
+        scheduler = BatchScheduler(transcribe_waveforms,
+                                   max_batch_size=options['max_batch_size'],
+                                   max_wait_ms=options['max_wait_ms'])
+
+        def batched(waveform):
+            return scheduler.transcribe(waveform, language)
+
+        audio_seconds = float(durations.sum())
+        for name, call in (('per-request', single), ('batched', batched)):
+            result = self._run(call, waveforms, options['concurrency'])
+            self.stdout.write(
+                f"{name:>12}: {result['throughput']:.2f} req/s, "
+                f"{audio_seconds / result['elapsed']:.1f} audio-s/s, "
+                f"p50 {result['p50'] * 1000:.0f} ms, p95 {result['p95'] * 1000:.0f} ms"
+            )
+        stats = scheduler.stats()
+        self.stdout.write(f"batched: {stats['batches']} batches, avg size {stats['avg_batch_size']}")
+
+    def _run(self, call, waveforms, concurrency):
+        latencies = []
+
+        def timed(waveform):
+            start = time.perf_counter()
+            call(waveform)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, waveforms))
+        elapsed = time.perf_counter() - start
+        return {
+            'elapsed': elapsed,
+            'throughput': len(waveforms) / elapsed,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+        }
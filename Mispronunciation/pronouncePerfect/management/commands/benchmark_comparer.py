@@ -0,0 +1,83 @@
+import contextlib
+import io
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pronouncePerfect.models import PracticeSample
+from pronouncePerfect.services.normalize_transcription import (
+    NepaliRules, NepaliTextComparer, are_equivalent_uncached, forms_equivalent, generate_schwa_variations,
+    get_rules, schwa_variation_set,
+)
+
+WORDS = ['नेपाल', 'सरकार', 'विद्यालय', 'शिक्षक', 'कमल', 'पहिलो', 'हुन्छ', 'गर्छु', 'जान्छ', 'बस्नुहोस्',
+         'किताब', 'घर', 'बाटो', 'खेत', 'गाउँ', 'शहर', 'विषय', 'समाचार', 'बजार', 'मान्छे', 'पानी', 'खाना',
+         'राम्रो', 'छ', 'मौसम', 'आज', 'भोलि', 'हिजो', 'काम', 'गर्नुहोस्', 'छौ', 'पढ्छु', 'लेख्छौ']
+
+
+class Command(BaseCommand):
+    help = "Times NepaliTextComparer equivalence checks with and without the per-word caches and token index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=300, help="Words per paragraph.")
+        parser.add_argument('--paragraphs', type=int, default=20)
+        parser.add_argument('--error-rate', type=float, default=0.4,
+                            help="Fraction of words replaced by a variant or a different word.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = WORDS + [word for sample in PracticeSample.objects.filter(language='np')
+                              for word in sample.text.split()]
+        pairs = [self._paragraph_pair(rng, vocabulary, options) for _ in range(options['paragraphs'])]
+
+        rules = get_rules()
+        comparer = NepaliTextComparer(rules)
+        tokenized = [(comparer.tokenize(user_input.lower()), comparer.tokenize(transcription.lower()))
+                     for transcription, user_input in pairs]
+
+        # The ±3 window checks compare_texts runs for every token, without early exit
+        checks = [(word, trans_tokens, range(max(0, i - 3), min(len(trans_tokens), i + 4)))
+                  for input_tokens, trans_tokens in tokenized
+                  for i, word in enumerate(input_tokens)]
+        self.stdout.write(f"{len(pairs)} paragraph(s), {sum(len(window) for _, _, window in checks)} word pairs")
+
+        start = time.perf_counter()
+        reference = [[are_equivalent_uncached(word, trans[j], rules) for j in window] for word, trans, window in checks]
+        uncached = time.perf_counter() - start
+
+        schwa_variation_set.cache_clear()
+        rules = NepaliRules.from_file(rules.source)  # fresh instance, empty word cache
+        start = time.perf_counter()
+        indexed = []
+        for input_tokens, trans_tokens in tokenized:
+            trans_forms = [rules.word_forms(token) for token in trans_tokens]
+            for i, word in enumerate(input_tokens):
+                forms = rules.word_forms(word)
+                indexed.append([forms_equivalent(forms, trans_forms[j])
+                                for j in range(max(0, i - 3), min(len(trans_tokens), i + 4))])
+        cached = time.perf_counter() - start
+
+        if indexed != reference:
+            raise CommandError("Indexed equivalence checks differ from the reference implementation")
+        self.stdout.write(f"{'uncached':>12}: {uncached * 1000:8.2f} ms")
+        self.stdout.write(f"{'indexed':>12}: {cached * 1000:8.2f} ms  ({uncached / cached:.1f}x faster, cold caches)")
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # compare_texts prints its matches
+            for transcription, user_input in pairs:
+                comparer.compare_texts(transcription, user_input)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"compare_texts: {elapsed / len(pairs) * 1000:.2f} ms per paragraph (incl. tokenization)")
+
+    def _paragraph_pair(self, rng, vocabulary, options):
+        reference = [rng.choice(vocabulary) for _ in range(options['words'])]
+        spoken = []
+        for word in reference:
+            if rng.random() < options['error_rate']:
+                variants = (generate_schwa_variations(word)[1:] + sorted(get_rules().honorific_forms(word))
+                            + [word.replace('श', 'स'), rng.choice(vocabulary)])
+                word = rng.choice(variants)
+            spoken.append(word)
+        return ' '.join(spoken), ' '.join(reference)
@@ -0,0 +1,94 @@
+import os
+import time
+
+import numpy as np
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from pronouncePerfect.services.audio_processing import (
+    beam_search_decode, compute_logits, decode_audio_path, postprocess_transcription,
+)
+from pronouncePerfect.services.ctc_decoder import build_decoder, decoder_settings
+from pronouncePerfect.services.text_analysis import word_errors
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.webm', '.m4a', '.flac', '.ogg')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares greedy CTC decoding with prefix beam search (with and without the practice-text "
+        "LM and expected-sentence biasing) on the same logits, and prints the decoding cost per "
+        "audio-second. With --data-dir (audio files plus same-named .txt transcripts) it also "
+        "prints WER; otherwise it decodes synthetic noise."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', default='eng', choices=['eng', 'np'])
+        parser.add_argument('--data-dir', help="Recordings with .txt transcripts.")
+        parser.add_argument('--beam-widths', default='4,8,16', help="Comma-separated beam widths.")
+        parser.add_argument('--seconds', type=float, default=10.0, help="Length of the synthetic clip.")
+        parser.add_argument('--repeats', type=int, default=3)
+
+    def handle(self, *args, **options):
+        language = options['language']
+        samples = self._load_samples(options['data_dir']) if options['data_dir'] else [
+            ((np.random.default_rng(0).standard_normal(int(options['seconds'] * 16000)) * 0.1).astype(np.float32), None)
+        ]
+        audio_seconds = sum(len(waveform) for waveform, _ in samples) / 16000
+
+        # The forward pass is the same for every decoder: run it once
+        clips = []
+        for waveform, reference in samples:
+            processor, _, (logits,) = compute_logits([waveform], language)
+            clips.append((logits, torch.log_softmax(logits.float(), dim=-1).numpy(), reference))
+        self.stdout.write(f"{len(samples)} clip(s), {audio_seconds:.1f}s of audio, "
+                          f"{sum(len(c[1]) for c in clips)} frames")
+
+        def greedy(logits, log_probs, reference):
+            return postprocess_transcription(processor.decode(torch.argmax(logits, dim=-1)), language)
+
+        configurations = [('greedy', greedy)]
+        base = {**decoder_settings(language), 'TYPE': 'beam'}
+        for width in (int(w) for w in options['beam_widths'].split(',')):
+            for name, overrides in (('beam', {'LM_ORDER': 0, 'HOTWORD_BONUS': 0}),
+                                    ('beam+lm', {'HOTWORD_BONUS': 0}),
+                                    ('beam+lm+bias', {})):
+                decoder = build_decoder(language, processor.tokenizer, {**base, 'BEAM_WIDTH': width, **overrides})
+                configurations.append((f"{name} w={width}", self._beam(decoder, processor, language)))
+
+        self.stdout.write(f"{'decoder':>18} {'ms/audio-s':>11} {'WER':>7}")
+        for name, decode in configurations:
+            timings, edits, words = [], 0, 0
+            for logits, log_probs, reference in clips:
+                for _ in range(options['repeats']):
+                    start = time.perf_counter()
+                    hypothesis = decode(logits, log_probs, reference)
+                    timings.append(time.perf_counter() - start)
+                if reference is not None:
+                    clip_edits, clip_words = word_errors(reference, hypothesis)
+                    edits, words = edits + clip_edits, words + clip_words
+            cost = sum(timings) / options['repeats'] / audio_seconds
+            wer = f"{edits / words:7.3f}" if words else f"{'-':>7}"
+            self.stdout.write(f"{name:>18} {cost * 1000:>11.2f} {wer}")
+
+    @staticmethod
+    def _beam(decoder, processor, language):
+        def decode(logits, log_probs, reference):
+            return beam_search_decode(decoder, processor, log_probs, language, reference)
+        return decode
+
+    def _load_samples(self, data_dir):
+        if not os.path.isdir(data_dir):
+            raise CommandError(f"Not a directory: {data_dir}")
+        samples = []
+        for name in sorted(os.listdir(data_dir)):
+            stem, ext = os.path.splitext(name)
+            transcript_path = os.path.join(data_dir, stem + '.txt')
+            if ext.lower() not in AUDIO_EXTENSIONS or not os.path.exists(transcript_path):
+                continue
+            with open(transcript_path, encoding='utf-8') as f:
+                reference = f.read().strip().lower()
+            samples.append((decode_audio_path(os.path.join(data_dir, name)), reference))
+        if not samples:
+            raise CommandError(f"No audio files with matching .txt transcripts in {data_dir}")
+        return samples
@@ -0,0 +1,53 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pronouncePerfect.models import PracticeSample
+from pronouncePerfect.services.normalize_transcription import (
+    compiled_normalizer, normalize_nepali_text, normalize_nepali_text_sequential,
+)
+
+# Words that exercise every rule group, mixed into the generated paragraphs
+RULE_WORDS = ['छान्', 'गार्न', 'ठीक', 'दीन', 'पूर्ण', 'शुरू', 'हुंदै', 'मैँ', 'तिमीं', 'अत', 'प्राय',
+              'विशेषत', 'सरकार', 'विषय', 'वा', 'क्ष', 'ज्ञ', 'व', 'नेपाल', 'बिद्यालय', '2024', 'हो!']
+
+
+class Command(BaseCommand):
+    help = "Compares the compiled Nepali normalizer with the sequential reference on long paragraphs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=2000, help="Words per paragraph.")
+        parser.add_argument('--paragraphs', type=int, default=20)
+        parser.add_argument('--repeats', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = RULE_WORDS + [word for sample in PracticeSample.objects.filter(language='np')
+                                   for word in sample.text.split()]
+        paragraphs = [' '.join(rng.choice(vocabulary) for _ in range(options['words']))
+                      for _ in range(options['paragraphs'])]
+
+        for paragraph in paragraphs:
+            if normalize_nepali_text(paragraph) != normalize_nepali_text_sequential(paragraph):
+                raise CommandError("Compiled normalizer output differs from the sequential implementation")
+
+        characters = sum(len(p) for p in paragraphs)
+        self.stdout.write(f"{len(paragraphs)} paragraph(s), {characters} characters, outputs identical")
+
+        def cold():
+            compiled_normalizer.normalize_word.cache_clear()
+            return [normalize_nepali_text(p) for p in paragraphs]
+
+        results = {}
+        for name, function in (
+            ('sequential', lambda: [normalize_nepali_text_sequential(p) for p in paragraphs]),
+            ('compiled', cold),  # empty word cache at the start of every run
+            ('warm cache', lambda: [normalize_nepali_text(p) for p in paragraphs]),
+        ):
+            best = min(timeit.repeat(function, number=1, repeat=options['repeats']))
+            results[name] = best
+            self.stdout.write(f"{name:>12}: {best * 1000:8.2f} ms  ({characters / best / 1e6:.1f} M chars/s)")
+        for name in ('compiled', 'warm cache'):
+            self.stdout.write(f"{name:>12}: {results['sequential'] / results[name]:.2f}x faster")
@@ -0,0 +1,284 @@
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+import torch
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from pronouncePerfect.services.audio_processing import decode_audio_bytes, process_audio_file
+from pronouncePerfect.services.batching import percentile
+from pronouncePerfect.services.metrics import collect_timings
+from pronouncePerfect.services.normalize_transcription import NepaliTextComparer
+from pronouncePerfect.services.text_analysis import compare_texts
+
+from .benchmark_alignment import FALLBACK_WORDS
+from .benchmark_comparer import WORDS as NEPALI_WORDS
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.webm', '.m4a', '.flac', '.ogg')
+
+# ffmpeg output arguments per synthesized format, at the rates browsers and encoders commonly use
+ENCODINGS = {
+    'wav': None,  # written with soundfile at 44.1 kHz
+    'mp3': ['-ar', '44100', '-f', 'mp3'],
+    'webm': ['-ar', '48000', '-c:a', 'libopus', '-f', 'webm'],
+}
+
+# Metrics compared against a baseline, and whether higher is worse
+TRACKED = {'p50_ms': True, 'p95_ms': True, 'throughput_rps': False}
+
+
+class RssSampler:
+    """Samples the resident set size of this process in a background thread; keeps the peak."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start_bytes = self.peak_bytes = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, rss_bytes())
+
+
+def rss_bytes():
+    """Current resident set size (/proc on Linux, else the lifetime peak from getrusage)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the audio-to-feedback pipeline offline: process_audio_file on synthesized (or "
+        "--data-dir) recordings of several lengths and formats, compare_texts and "
+        "NepaliTextComparer.compare_texts, each at the given concurrency levels. Reports p50/p95/p99 "
+        "latency, throughput, CPU time, peak RSS and the per-stage breakdown. --save-baseline writes "
+        "the results as JSON; --baseline compares against such a file and fails on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', default='eng', choices=['eng', 'np'],
+                            help="Model used for process_audio_file.")
+        parser.add_argument('--data-dir', help="Use these recordings instead of synthesized audio.")
+        parser.add_argument('--durations', default='2,10', help="Comma-separated synthetic clip lengths (s).")
+        parser.add_argument('--formats', default='wav,mp3,webm', help="Comma-separated synthetic formats.")
+        parser.add_argument('--concurrency', default='1,4', help="Comma-separated concurrency levels.")
+        parser.add_argument('--requests', type=int, default=8, help="Requests per scenario.")
+        parser.add_argument('--words', type=int, default=200, help="Words per compared passage.")
+        parser.add_argument('--only', default='audio,compare,nepali',
+                            help="Comma-separated workloads to run (audio, compare, nepali).")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--save-baseline', help="Write the results to this JSON file.")
+        parser.add_argument('--baseline', help="Compare with the results in this JSON file.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed relative slowdown before a metric counts as a regression.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        workloads = set(options['only'].split(','))
+        results = {}
+
+        if 'audio' in workloads:
+            clips = self._load_clips(options['data_dir']) if options['data_dir'] else self._synthesize_clips(options)
+            language = options['language']
+            # Load the model outside the timed runs and keep repeated clips out of the cache
+            process_audio_file(SimpleUploadedFile(clips[0][0], clips[0][1]), language)
+            with override_settings(TRANSCRIPTION_CACHE={**getattr(settings, 'TRANSCRIPTION_CACHE', {}), 'ENABLED': False}):
+                for name, data, duration in clips:
+                    for level in levels:
+                        def call(_, name=name, data=data):
+                            return process_audio_file(SimpleUploadedFile(name, data), language)
+                        results[f"process_audio_file {name} c={level}"] = self._run(
+                            call, [None] * options['requests'], level, audio_seconds=duration)
+
+        if 'compare' in workloads:
+            pairs = [self._passage_pair(rng, FALLBACK_WORDS, options['words']) for _ in range(options['requests'])]
+            for level in levels:
+                results[f"compare_texts c={level}"] = self._run(
+                    lambda pair: compare_texts(pair[0], pair[1], 'eng'), pairs, level)
+
+        if 'nepali' in workloads:
+            comparer = NepaliTextComparer()
+            pairs = [self._passage_pair(rng, NEPALI_WORDS, options['words']) for _ in range(options['requests'])]
+            for level in levels:
+                results[f"nepali_compare c={level}"] = self._run(
+                    lambda pair: comparer.compare_texts(pair[0], pair[1]), pairs, level)
+
+        self._report(results)
+        report = {'environment': self._environment(), 'options': {
+            key: options[key] for key in ('language', 'durations', 'formats', 'concurrency', 'requests', 'words', 'seed')
+        }, 'results': results}
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+        if options['baseline']:
+            self._compare(options['baseline'], report, options['tolerance'])
+
+    def _run(self, call, inputs, concurrency, audio_seconds=None):
+        """Runs call(input) for every input on `concurrency` threads and summarizes the run."""
+        def timed(item):
+            with collect_timings() as timings:
+                start = time.perf_counter()
+                call(item)
+                return time.perf_counter() - start, timings
+
+        cpu_start = time.process_time()
+        with RssSampler() as rss:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(timed, inputs))
+            elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+
+        latencies = [latency for latency, _ in outcomes]
+        stages = {}
+        for _, timings in outcomes:
+            for stage, seconds in timings.items():
+                stages.setdefault(stage, []).append(seconds)
+        result = {
+            'requests': len(inputs),
+            'concurrency': concurrency,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'throughput_rps': round(len(inputs) / elapsed, 2),
+            'cpu_s': round(cpu, 3),
+            'cpu_cores_used': round(cpu / elapsed, 2),
+            'peak_rss_mb': round(rss.peak_bytes / 2 ** 20, 1),
+            'rss_growth_mb': round((rss.peak_bytes - rss.start_bytes) / 2 ** 20, 1),
+            'stages_ms': {stage: {'p50': round(percentile(values, 50) * 1000, 2),
+                                  'p95': round(percentile(values, 95) * 1000, 2)}
+                          for stage, values in sorted(stages.items())},
+        }
+        if audio_seconds is not None:
+            result['audio_seconds_per_s'] = round(audio_seconds * len(inputs) / elapsed, 2)
+        return result
+
+    def _report(self, results):
+        self.stdout.write(f"{'scenario':<40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} "
+                          f"{'cpu s':>7} {'cores':>6} {'peak MB':>8}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<40} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+                              f"{result['throughput_rps']:>8.2f} {result['cpu_s']:>7.2f} "
+                              f"{result['cpu_cores_used']:>6.2f} {result['peak_rss_mb']:>8.1f}")
+            if result['stages_ms']:
+                self.stdout.write("    " + ", ".join(f"{stage} {values['p50']:.1f}/{values['p95']:.1f}"
+                                                      for stage, values in result['stages_ms'].items())
+                                  + " (p50/p95 ms)")
+
+    def _compare(self, path, report, tolerance):
+        with open(path) as f:
+            saved = json.load(f)
+        for key, value in saved['options'].items():
+            if report['options'].get(key) != value:
+                self.stderr.write(f"Warning: baseline was recorded with {key}={value!r}, this run uses "
+                                  f"{report['options'].get(key)!r}")
+        baseline = saved['results']
+        regressions = []
+        for name, result in report['results'].items():
+            if name not in baseline:
+                continue
+            for metric, higher_is_worse in TRACKED.items():
+                before, after = baseline[name][metric], result[metric]
+                if not before:
+                    continue
+                change = (after - before) / before
+                if (change if higher_is_worse else -change) > tolerance:
+                    regressions.append(f"{name}: {metric} {before} -> {after} ({change:+.0%})")
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+        self.stdout.write(f"No regressions beyond {tolerance:.0%} against {path}")
+
+    @staticmethod
+    def _environment():
+        return {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'torch': torch.__version__,
+            'torch_threads': torch.get_num_threads(),
+            'numpy': np.__version__,
+        }
+
+    def _synthesize_clips(self, options):
+        """Deterministic speech-like audio (harmonic tones with syllable-rate envelopes and noise)."""
+        rng = np.random.default_rng(options['seed'])
+        clips = []
+        for duration in (float(d) for d in options['durations'].split(',')):
+            t = np.arange(int(duration * 44100)) / 44100
+            pitch = 120 + 40 * np.sin(2 * np.pi * 0.5 * t)
+            phase = 2 * np.pi * np.cumsum(pitch) / 44100
+            voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+            envelope = np.clip(np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)), 0, None)
+            waveform = (0.3 * voiced * envelope + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+            for audio_format in options['formats'].split(','):
+                data = self._encode(waveform, audio_format)
+                if data is not None:
+                    clips.append((f"{duration:g}s.{audio_format}", data, duration))
+        if not clips:
+            raise CommandError("No clips could be synthesized")
+        return clips
+
+    def _encode(self, waveform, audio_format):
+        if audio_format not in ENCODINGS:
+            raise CommandError(f"Unknown format: {audio_format} (choose from {', '.join(ENCODINGS)})")
+        if ENCODINGS[audio_format] is None:
+            buffer = io.BytesIO()
+            sf.write(buffer, waveform, 44100, format='WAV')
+            return buffer.getvalue()
+        command = [settings.FFMPEG_BINARY, '-nostdin', '-hide_banner', '-loglevel', 'error',
+                   '-f', 'f32le', '-ar', '44100', '-ac', '1', '-i', 'pipe:0', *ENCODINGS[audio_format], 'pipe:1']
+        try:
+            return subprocess.run(command, input=waveform.tobytes(), capture_output=True, check=True).stdout
+        except (FileNotFoundError, subprocess.CalledProcessError) as e:
+            self.stderr.write(f"Skipping {audio_format}: could not encode with ffmpeg ({e})")
+            return None
+
+    @staticmethod
+    def _load_clips(data_dir):
+        if not os.path.isdir(data_dir):
+            raise CommandError(f"Not a directory: {data_dir}")
+        clips = []
+        for name in sorted(os.listdir(data_dir)):
+            if os.path.splitext(name)[1].lower() not in AUDIO_EXTENSIONS:
+                continue
+            with open(os.path.join(data_dir, name), 'rb') as f:
+                data = f.read()
+            clips.append((name, data, len(decode_audio_bytes(data)) / 16000))
+        if not clips:
+            raise CommandError(f"No audio files in {data_dir}")
+        return clips
+
+    @staticmethod
+    def _passage_pair(rng, vocabulary, words, error_rate=0.2):
+        """(transcription, expected text): the expected passage with some words skipped or swapped."""
+        expected = [rng.choice(vocabulary) for _ in range(words)]
+        spoken = [rng.choice(vocabulary) if rng.random() < error_rate else word
+                  for word in expected if rng.random() >= error_rate / 4]
+        return ' '.join(spoken), ' '.join(expected)
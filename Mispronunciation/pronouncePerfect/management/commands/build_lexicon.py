@@ -0,0 +1,39 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pronouncePerfect.services.lexicon import CompiledLexicon, write_lexicon
+from pronouncePerfect.services.segment_nepali_text import read_word_list
+
+
+class Command(BaseCommand):
+    help = (
+        "Compiles a Nepali word list (one word per line, optionally '<word>\\t<count>') into the "
+        "memory-mapped lexicon format used by segment_nepali_text."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', default=settings.NEPALI_LEXICON_FILE)
+        parser.add_argument('--output', default=settings.NEPALI_LEXICON_COMPILED)
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['input']):
+            raise CommandError(f"Word list not found: {options['input']}")
+
+        start = time.perf_counter()
+        counts = read_word_list(options['input'])
+        count = write_lexicon(counts, options['output'])
+        elapsed = time.perf_counter() - start
+
+        lexicon = CompiledLexicon(options['output'])
+        missing = [word for word in counts if word and word not in lexicon]
+        lexicon.close()
+        if missing:
+            raise CommandError(f"{len(missing)} word(s) missing from the compiled lexicon, e.g. {missing[0]}")
+
+        size_kb = os.path.getsize(options['output']) / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {count} words to {options['output']} ({size_kb:.1f} KB) in {elapsed:.2f}s"
+        ))
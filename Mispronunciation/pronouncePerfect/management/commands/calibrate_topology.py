@@ -0,0 +1,151 @@
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+# Worker processes are spawned: keep module-level imports free of Django models and torch state
+
+
+def _calibration_worker(index, workers, threads, pin, language, clip_seconds, duration, barrier, results):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Mispronunciation.settings')
+    os.environ['ASR_WORKER_INDEX'] = str(index)
+    import django
+    django.setup()
+    from pronouncePerfect.services.audio_processing import transcribe_waveforms
+    from pronouncePerfect.services.topology import apply_topology
+
+    try:
+        apply_topology(index, workers, threads, pin=pin)
+        clip = (np.random.default_rng(index).standard_normal(int(clip_seconds * 16000)) * 0.1).astype(np.float32)
+        transcribe_waveforms([clip], language)  # load the model and warm up
+    except Exception as e:
+        barrier.abort()
+        results.put((index, None, str(e)))
+        return
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        results.put((index, None, "another worker failed to start"))
+        return
+
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        transcribe_waveforms([clip], language)
+        latencies.append(time.perf_counter() - start)
+    results.put((index, latencies, None))
+
+
+class Command(BaseCommand):
+    help = (
+        "Sweeps worker-process x torch-thread combinations on this host: every worker runs the "
+        "transcription path back to back for --seconds, and the aggregate throughput and latency "
+        "percentiles of each combination are compared. Prints the best configuration for "
+        "settings.ASR_THREADING and Gunicorn's worker count."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', default='eng', choices=['eng', 'np'])
+        parser.add_argument('--workers', help="Comma-separated worker counts (default: powers of two up to the CPU count).")
+        parser.add_argument('--threads', help="Comma-separated intra-op thread counts (default: powers of two up to the CPU count).")
+        parser.add_argument('--oversubscribe', action='store_true',
+                            help="Also try combinations using more threads in total than there are CPUs.")
+        parser.add_argument('--pin', action='store_true', help="Pin each worker to its own block of CPUs.")
+        parser.add_argument('--seconds', type=float, default=10.0, help="Measured time per combination.")
+        parser.add_argument('--clip-seconds', type=float, default=5.0, help="Length of the transcribed clip.")
+        parser.add_argument('--max-p95-ms', type=float, help="Only recommend combinations within this p95 latency.")
+        parser.add_argument('--json', help="Also write all measurements to this file.")
+
+    def handle(self, *args, **options):
+        from pronouncePerfect.services.batching import percentile
+        from pronouncePerfect.services.topology import usable_cpus
+
+        cpus = len(usable_cpus())
+        default = [n for n in (1, 2, 4, 8, 16, 32, 64) if n < cpus] + [cpus]
+        worker_counts = [int(n) for n in options['workers'].split(',')] if options['workers'] else default
+        thread_counts = [int(n) for n in options['threads'].split(',')] if options['threads'] else default
+        combinations = [(w, t) for w in worker_counts for t in thread_counts
+                        if options['oversubscribe'] or w * t <= cpus]
+        if not combinations:
+            raise CommandError(f"No combination fits in {cpus} CPU(s); pass --oversubscribe")
+        self.stdout.write(f"{cpus} usable CPU(s), {len(combinations)} combination(s), "
+                          f"{options['seconds']:g}s each on {options['clip_seconds']:g}s clips")
+        self.stdout.write(f"{'workers':>7} {'threads':>7} {'req/s':>8} {'audio-s/s':>10} "
+                          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+        measurements = []
+        for workers, threads in combinations:
+            latencies = self._measure(workers, threads, options)
+            measurement = {
+                'workers': workers,
+                'threads': threads,
+                'throughput_rps': round(len(latencies) / options['seconds'], 2),
+                'audio_seconds_per_s': round(len(latencies) * options['clip_seconds'] / options['seconds'], 2),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            }
+            measurements.append(measurement)
+            self.stdout.write(f"{workers:>7} {threads:>7} {measurement['throughput_rps']:>8.2f} "
+                              f"{measurement['audio_seconds_per_s']:>10.2f} {measurement['p50_ms']:>8.1f} "
+                              f"{measurement['p95_ms']:>8.1f} {measurement['p99_ms']:>8.1f}")
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump({'cpus': cpus, 'pin': options['pin'], 'measurements': measurements}, f, indent=2)
+
+        eligible = [m for m in measurements if options['max_p95_ms'] is None or m['p95_ms'] <= options['max_p95_ms']]
+        if not eligible:
+            raise CommandError(f"No combination stays within a p95 of {options['max_p95_ms']} ms")
+        best = max(eligible, key=lambda m: (m['throughput_rps'], -m['p95_ms']))
+        self.stdout.write(self.style.SUCCESS(
+            f"\nBest: {best['workers']} worker(s) x {best['threads']} thread(s), {best['throughput_rps']} req/s, "
+            f"p95 {best['p95_ms']} ms"))
+        self.stdout.write(
+            "settings.py:\n"
+            "ASR_THREADING = {\n"
+            f"    'WORKERS': {best['workers']},\n"
+            f"    'INTRA_OP_THREADS': {best['threads']},\n"
+            "    'INTER_OP_THREADS': 1,\n"
+            f"    'PIN_CPUS': {options['pin']},\n"
+            "}\n"
+            f"gunicorn: WEB_CONCURRENCY={best['workers']}"
+        )
+
+    def _measure(self, workers, threads, options):
+        """Runs `workers` spawned processes at once and returns all their latencies."""
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        processes = [context.Process(target=_calibration_worker, args=(
+            index, workers, threads, options['pin'], options['language'], options['clip_seconds'],
+            options['seconds'], barrier, results)) for index in range(workers)]
+        for process in processes:
+            process.start()
+
+        latencies, errors = [], []
+        try:
+            for _ in processes:
+                # Model loading happens before the measured time; allow for it
+                index, worker_latencies, error = results.get(timeout=options['seconds'] + 300)
+                if error:
+                    errors.append(f"worker {index}: {error}")
+                else:
+                    latencies.extend(worker_latencies)
+        except queue.Empty:
+            errors.append("timed out waiting for the workers")
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        if errors:
+            raise CommandError(f"Calibration run with {workers} worker(s) x {threads} thread(s) failed: "
+                               + "; ".join(errors))
+        return latencies
@@ -0,0 +1,37 @@
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from pronouncePerfect.services.inference_backends import (
+    OnnxBackend, TorchBackend, export_onnx_model, max_logit_difference, onnx_model_path,
+)
+from pronouncePerfect.services.model_registry import MODEL_DIR_SETTINGS, get_model_path, load_model
+
+
+class Command(BaseCommand):
+    help = "Exports the Wav2Vec2 checkpoints to ONNX (model.onnx next to each checkpoint) and checks parity."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', nargs='+', default=list(MODEL_DIR_SETTINGS), choices=list(MODEL_DIR_SETTINGS))
+        parser.add_argument('--opset', type=int, default=17)
+        parser.add_argument('--tolerance', type=float, default=1e-3,
+                            help="Maximum absolute logit difference accepted in the parity check.")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        waveforms = [(rng.standard_normal(n) * 0.1).astype(np.float32) for n in (16000, 40000)]
+
+        for language in options['language']:
+            model_path = get_model_path(language)
+            # Always export from PyTorch, even for a language already served by ONNX Runtime
+            loaded = load_model(language, quantized=False, backend='torch')
+            output_path = onnx_model_path(model_path)
+            self.stdout.write(f"Exporting '{language}' model to {output_path}")
+            export_onnx_model(loaded.model, output_path, opset=options['opset'])
+
+            onnx_backend = OnnxBackend(output_path, loaded.model.config)
+            difference, same_tokens = max_logit_difference(TorchBackend(loaded.model), onnx_backend,
+                                                           waveforms, loaded.processor)
+            self.stdout.write(f"  max |logit difference| {difference:.2e}, same argmax: {same_tokens}")
+            if difference > options['tolerance'] or not same_tokens:
+                raise CommandError(f"ONNX output for '{language}' does not match PyTorch")
+        self.stdout.write(self.style.SUCCESS("Export finished"))
@@ -0,0 +1,124 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from pronouncePerfect.services.weight_sharing import memory_breakdown
+
+MODES = ('private', 'preload', 'mmap', 'preload+mmap')
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows the shared vs private memory of processes (Linux /proc smaps_rollup). Pass --pids "
+        "or --children-of <gunicorn master pid> to inspect a running server, or --simulate N to "
+        "fork N workers that each run the model under the given weight sharing --mode(s): "
+        "private (each worker loads its own copy), preload (loaded before the fork), mmap "
+        "(memory-mapped safetensors weights) or preload+mmap."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pids', type=int, nargs='+', help="Processes to report on.")
+        parser.add_argument('--children-of', type=int, help="Report on the children of this process.")
+        parser.add_argument('--simulate', type=int, metavar='WORKERS', help="Fork this many model workers.")
+        parser.add_argument('--mode', default=','.join(MODES), help="Comma-separated modes for --simulate.")
+        parser.add_argument('--language', default='eng', choices=['eng', 'np'])
+
+    def handle(self, *args, **options):
+        if memory_breakdown() is None:
+            raise CommandError("/proc/<pid>/smaps_rollup is not available on this system")
+        if options['simulate']:
+            for mode in options['mode'].split(','):
+                if mode not in MODES:
+                    raise CommandError(f"Unknown mode {mode!r} (choose from {', '.join(MODES)})")
+                self._run_isolated(mode, options['simulate'], options['language'])
+            return
+
+        pids = list(options['pids'] or [])
+        if options['children_of']:
+            pids += self._children(options['children_of'])
+        if not pids:
+            raise CommandError("Pass --pids, --children-of or --simulate")
+        self._report({pid: memory_breakdown(pid) for pid in pids})
+
+    def _report(self, breakdowns, title=None):
+        if title:
+            self.stdout.write(title)
+        self.stdout.write(f"{'pid':>8} {'rss MB':>9} {'pss MB':>9} {'shared MB':>10} {'private MB':>11}")
+        for pid, memory in breakdowns.items():
+            if memory is None:
+                self.stdout.write(f"{pid:>8} {'(gone)':>9}")
+                continue
+            self.stdout.write(f"{pid:>8} {memory['rss']:>9.1f} {memory['pss']:>9.1f} {memory['shared']:>10.1f} "
+                              f"{memory['private']:>11.1f}")
+        present = [memory for memory in breakdowns.values() if memory]
+        if present:
+            self.stdout.write(f"{'total':>8} {sum(m['rss'] for m in present):>9.1f} {sum(m['pss'] for m in present):>9.1f} "
+                              f"{'':>10} {sum(m['private'] for m in present):>11.1f}")
+
+    @staticmethod
+    def _children(pid):
+        children = []
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children += [int(child) for child in f.read().split()]
+        return children
+
+    def _run_isolated(self, mode, workers, language):
+        """Runs one mode in a forked supervisor so every mode starts from the same state."""
+        sys.stdout.flush()
+        self.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._simulate(mode, workers, language)
+            except BaseException as e:
+                self.stderr.write(f"{mode}: {e}")
+                code = 1
+            finally:
+                self.stdout.flush()
+                os._exit(code)
+        os.waitpid(pid, 0)
+
+    def _simulate(self, mode, workers, language):
+        import torch
+        from pronouncePerfect.services.model_registry import ModelRegistry
+
+        with override_settings(ASR_MMAP_WEIGHTS='mmap' in mode):
+            registry = ModelRegistry()
+            if mode.startswith('preload'):
+                registry.preload([language])
+
+            children = []
+            for _ in range(workers):
+                ready_read, ready_write = os.pipe()
+                exit_read, exit_write = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(ready_read)
+                    os.close(exit_write)
+                    try:
+                        loaded = registry.get(language)
+                        loaded.backend.logits(torch.zeros(1, 16000))  # as a worker would after warm-up
+                    finally:
+                        os.write(ready_write, b'1')
+                        os.read(exit_read, 1)  # stay alive until measured
+                        os._exit(0)
+                os.close(ready_write)
+                os.close(exit_read)
+                children.append((pid, ready_read, exit_write))
+
+            for _, ready_read, _ in children:
+                os.read(ready_read, 1)
+            breakdowns = {os.getpid(): memory_breakdown()}
+            breakdowns.update({pid: memory_breakdown(pid) for pid, _, _ in children})
+            for pid, ready_read, exit_write in children:
+                os.write(exit_write, b'1')
+                os.waitpid(pid, 0)
+
+        workers_memory = [breakdowns[pid] for pid, _, _ in children]
+        self._report(breakdowns, title=f"\n{mode}: parent, then {workers} worker(s)")
+        self.stdout.write(f"avg private per worker: {sum(m['private'] for m in workers_memory) / workers:.1f} MB, "
+                          f"avg shared: {sum(m['shared'] for m in workers_memory) / workers:.1f} MB")
@@ -0,0 +1,119 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pronouncePerfect.services.audio_processing import decode_audio_path, transcribe_waveforms
+from pronouncePerfect.services.model_registry import load_model
+from pronouncePerfect.services.text_analysis import word_errors
+from pronouncePerfect.services.weight_sharing import memory_breakdown
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.webm', '.m4a', '.flac', '.ogg')
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the fp32 and dynamic int8 variants of a model over a local set of recordings "
+        "and prints WER, latency, weight size and process RSS for both. Both variants run on "
+        "the PyTorch backend whatever ASR_BACKENDS says, each in its own forked process so "
+        "the RSS of one does not include the other. Each audio file in --data-dir needs a "
+        "transcript with the same name and a .txt extension."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', default='eng', choices=['eng', 'np'])
+        parser.add_argument('--data-dir', required=True)
+        parser.add_argument('--repeats', type=int, default=1, help="Timed runs per file.")
+
+    def handle(self, *args, **options):
+        samples = self._load_samples(options['data_dir'])
+        language = options['language']
+        self.stdout.write(f"{len(samples)} recording(s), {sum(len(w) for w, _ in samples) / 16000:.1f}s of audio")
+
+        fp32, int8 = (self._run_isolated(language, quantized, samples, options['repeats'])
+                      for quantized in (False, True))
+
+        self.stdout.write(f"{'':>10} {'WER':>8} {'latency':>12} {'RTF':>8} {'weights':>10} {'RSS':>10}")
+        for name, report in (('fp32', fp32), ('int8', int8)):
+            rss = f"{report['rss_mb']:>7.1f} MB" if report['rss_mb'] is not None else f"{'-':>10}"
+            self.stdout.write(
+                f"{name:>10} {report['wer']:>8.3f} {report['latency'] * 1000:>9.0f} ms "
+                f"{report['rtf']:>8.3f} {report['weights_mb']:>7.1f} MB {rss}"
+            )
+        rss_ratio = f"{int8['rss_mb'] / fp32['rss_mb']:>9.2f}x" if fp32['rss_mb'] else ''
+        self.stdout.write(
+            f"{'delta':>10} {int8['wer'] - fp32['wer']:>+8.3f} "
+            f"{fp32['latency'] / int8['latency']:>10.2f}x {'':>8} "
+            f"{int8['weights_mb'] / fp32['weights_mb']:>9.2f}x {rss_ratio}"
+        )
+
+    def _run_isolated(self, language, quantized, samples, repeats):
+        """Evaluates one variant in a forked child (where fork exists) and returns its report."""
+        if not hasattr(os, 'fork'):
+            return self._evaluate(language, quantized, samples, repeats)
+        sys.stdout.flush()
+        self.stdout.flush()
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            code = 0
+            try:
+                report = self._evaluate(language, quantized, samples, repeats)
+            except BaseException as e:
+                report, code = {'error': str(e)}, 1
+            finally:
+                with os.fdopen(write_end, 'w') as f:
+                    json.dump(report, f)
+                os._exit(code)
+        os.close(write_end)
+        with os.fdopen(read_end) as f:
+            report = json.load(f)
+        os.waitpid(pid, 0)
+        if 'error' in report:
+            raise CommandError(f"{'int8' if quantized else 'fp32'} run failed: {report['error']}")
+        return report
+
+    def _load_samples(self, data_dir):
+        if not os.path.isdir(data_dir):
+            raise CommandError(f"Not a directory: {data_dir}")
+        samples = []
+        for name in sorted(os.listdir(data_dir)):
+            stem, ext = os.path.splitext(name)
+            transcript_path = os.path.join(data_dir, stem + '.txt')
+            if ext.lower() not in AUDIO_EXTENSIONS or not os.path.exists(transcript_path):
+                continue
+            with open(transcript_path, encoding='utf-8') as f:
+                reference = f.read().strip().lower()
+            samples.append((decode_audio_path(os.path.join(data_dir, name)), reference))
+        if not samples:
+            raise CommandError(f"No audio files with matching .txt transcripts in {data_dir}")
+        return samples
+
+    def _evaluate(self, language, quantized, samples, repeats):
+        # Quantization only exists on the torch backend; compare it even where ONNX serves
+        loaded = load_model(language, quantized=quantized, backend='torch')
+        model_pair = (loaded.processor, loaded.backend)
+        transcribe_waveforms([samples[0][0]], language, model_pair)  # warm-up
+
+        edits, words, elapsed = 0, 0, 0.0
+        for waveform, reference in samples:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                hypothesis = transcribe_waveforms([waveform], language, model_pair)[0]
+                elapsed += time.perf_counter() - start
+            sample_edits, sample_words = word_errors(reference, hypothesis)
+            edits, words = edits + sample_edits, words + sample_words
+
+        audio_seconds = sum(len(waveform) for waveform, _ in samples) / 16000
+        runs = len(samples) * repeats
+        memory = memory_breakdown()
+        return {
+            'wer': edits / words if words else float(edits > 0),
+            'latency': elapsed / runs,
+            'rtf': elapsed / (audio_seconds * repeats),
+            'weights_mb': loaded.memory_bytes / (1024 * 1024),
+            'rss_mb': memory['rss'] if memory else None,
+        }
@@ -0,0 +1,70 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pronouncePerfect.models import PracticeSample
+from pronouncePerfect.services.batch_scoring import BatchItem, score_batch
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.webm', '.m4a', '.flac', '.ogg')
+
+
+class Command(BaseCommand):
+    help = (
+        "Scores many recordings against their expected text(s) with batched inference and "
+        "prints one JSON line per recording as it completes, then a summary line with the "
+        "aggregate throughput. The expected text is --text, the PracticeSample --sample-id, or "
+        "else a .txt file with the same name next to each recording."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Audio files or directories of audio files.")
+        parser.add_argument('--language', default='eng', choices=['eng', 'np'])
+        parser.add_argument('--text', help="Expected text of every recording.")
+        parser.add_argument('--sample-id', type=int, help="PracticeSample whose text every recording reads.")
+        parser.add_argument('--batch-size', type=int, help="Clips per forward pass (default: settings).")
+        parser.add_argument('--decode-workers', type=int, help="Audio decoding threads (default: settings).")
+
+    def handle(self, *args, **options):
+        text = options['text']
+        if options['sample_id'] is not None:
+            try:
+                text = PracticeSample.objects.get(pk=options['sample_id']).text
+            except PracticeSample.DoesNotExist:
+                raise CommandError(f"No PracticeSample with id {options['sample_id']}")
+
+        items = [BatchItem(path, path, text if text is not None else self._transcript(path))
+                 for path in self._audio_paths(options['paths'])]
+        if not items:
+            raise CommandError("No audio files found")
+
+        for record in score_batch(items, options['language'], options['batch_size'], options['decode_workers']):
+            self.stdout.write(json.dumps(record, ensure_ascii=False))
+            self.stdout.flush()
+
+        summary = record['summary']
+        self.stderr.write(
+            f"{summary['files']} file(s), {summary['failed']} failed, {summary['audio_seconds']:.1f}s of audio "
+            f"in {summary['elapsed']:.2f}s: {summary['files_per_s']} files/s, "
+            f"{summary['audio_seconds_per_s']} audio-s/s"
+        )
+
+    @staticmethod
+    def _audio_paths(paths):
+        for path in paths:
+            if os.path.isdir(path):
+                for name in sorted(os.listdir(path)):
+                    if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                        yield os.path.join(path, name)
+            elif os.path.isfile(path):
+                yield path
+            else:
+                raise CommandError(f"No such file or directory: {path}")
+
+    @staticmethod
+    def _transcript(path):
+        transcript_path = os.path.splitext(path)[0] + '.txt'
+        if not os.path.exists(transcript_path):
+            return ''
+        with open(transcript_path, encoding='utf-8') as f:
+            return f.read().strip()
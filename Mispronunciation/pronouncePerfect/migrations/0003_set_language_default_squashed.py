@@ -0,0 +1,28 @@
+# Replaces 0003_set_language_default, which updates PracticeSample.language before 0004 adds
+# the field and so fails on a fresh database. Databases that applied 0003 record this
+# migration as applied too; fresh databases run it instead of 0003.
+
+from django.db import migrations
+
+
+def set_existing_languages_to_english(apps, schema_editor):
+    PracticeSample = apps.get_model('pronouncePerfect', 'PracticeSample')
+    if not any(field.name == 'language' for field in PracticeSample._meta.get_fields()):
+        # The field only arrives in 0004, whose default covers the existing rows
+        return
+    PracticeSample.objects.all().update(language='en')
+
+
+class Migration(migrations.Migration):
+
+    replaces = [
+        ('pronouncePerfect', '0003_set_language_default'),
+    ]
+
+    dependencies = [
+        ('pronouncePerfect', '0002_practicesample'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_existing_languages_to_english, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:20
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pronouncePerfect', '0004_practicesample_language'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptionJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('language', models.CharField(choices=[('eng', 'English'), ('np', 'Nepali')], max_length=3)),
+                ('text', models.TextField(blank=True, help_text='Expected text; empty for transcription-only jobs')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('transcription', models.TextField(blank=True)),
+                ('result', models.JSONField(blank=True, help_text='Word-level comparison result', null=True)),
+                ('error', models.TextField(blank=True)),
+                ('timings', models.JSONField(default=dict, help_text='Seconds spent in each stage (upload, queue_wait, decode, transcription, comparison)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Transcription Job',
+                'verbose_name_plural': 'Transcription Jobs',
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 class AudioFile(models.Model):
@@ -52,4 +54,47 @@ class PracticeSample(models.Model):
 
     class Meta:
         verbose_name = "Practice Sample"
-        verbose_name_plural = "Practice Samples"
\ No newline at end of file
+        verbose_name_plural = "Practice Samples"
+
+class TranscriptionJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    language = models.CharField(
+        max_length=3,
+        choices=PracticeSample.LANGUAGE_CHOICES,
+    )
+    text = models.TextField(
+        blank=True,
+        help_text="Expected text; empty for transcription-only jobs",
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='queued',
+    )
+    transcription = models.TextField(blank=True)
+    result = models.JSONField(
+        blank=True,
+        null=True,
+        help_text="Word-level comparison result",
+    )
+    error = models.TextField(blank=True)
+    timings = models.JSONField(
+        default=dict,
+        help_text="Seconds spent in each stage (upload, queue_wait, decode, transcription, comparison)",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
+
+    class Meta:
+        verbose_name = "Transcription Job"
+        verbose_name_plural = "Transcription Jobs"
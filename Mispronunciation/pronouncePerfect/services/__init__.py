@@ -1,4 +1,21 @@
 # Allows importing modules from services/
-from .audio_processing import process_audio_file
-from .text_analysis import compare_texts
-from .normalize_transcription import NepaliTextComparer
+# The names below are resolved on first access: audio_processing pulls in torch,
+# transformers and librosa, which only inference should pay for.
+import importlib
+
+_LAZY_EXPORTS = {
+    'process_audio_file': '.audio_processing',
+    'compare_texts': '.text_analysis',
+    'compare_transcription': '.text_analysis',
+    'NepaliTextComparer': '.normalize_transcription',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
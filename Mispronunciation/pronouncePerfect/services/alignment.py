@@ -0,0 +1,208 @@
+"""
+Scoring from the CTC log-probabilities of the transcription pass (transcribe_with_emissions),
+without running the model again:
+
+- forced alignment of the expected text (Viterbi over the CTC trellis), giving each
+  character and word a start/end time and a confidence;
+- posterior confidences of the tokens and words of the transcription, on the forced
+  alignment of the decoded text.
+"""
+import re
+import unicodedata
+
+import numpy as np
+
+from .audio_processing import decode_audio, transcribe_with_emissions
+from .metrics import span
+from .text_analysis import apply_confidence_threshold, compare_transcription
+
+
+def ctc_viterbi(log_probs, targets, blank_id):
+    """
+    Most likely CTC path that emits exactly `targets`.
+
+    The trellis has 2L+1 states (blank, t1, blank, t2, ..., blank); each frame is one
+    vectorized step over all states: stay, advance one state, or skip a blank between
+    two different labels.
+
+    Args: log_probs (frames, vocab) array, targets (sequence of token ids), blank_id (int)
+    Returns: np.ndarray with the state of every frame (target k is state 2k+1),
+             or None if the targets do not fit into the frames.
+    """
+    n_frames = len(log_probs)
+    labels = np.full(2 * len(targets) + 1, blank_id, dtype=np.int64)
+    labels[1::2] = targets
+    n_states = len(labels)
+    if n_frames == 0:
+        return None
+
+    emissions = np.asarray(log_probs, dtype=np.float64)[:, labels]  # (frames, states)
+    can_skip = np.zeros(n_states, dtype=bool)
+    can_skip[3::2] = labels[3::2] != labels[1:-2:2]
+
+    alpha = np.full(n_states, -np.inf)
+    alpha[:2] = emissions[0, :2]
+    back = np.zeros((n_frames, n_states), dtype=np.int8)  # states moved back by: 0, 1 or 2
+    candidates = np.full((3, n_states), -np.inf)
+    states = np.arange(n_states)
+    for t in range(1, n_frames):
+        candidates[0] = alpha
+        candidates[1, 1:] = alpha[:-1]
+        candidates[2, 2:] = np.where(can_skip[2:], alpha[:-2], -np.inf)
+        choice = candidates.argmax(axis=0)
+        alpha = candidates[choice, states] + emissions[t]
+        back[t] = choice
+
+    final = n_states - 1 if n_states == 1 or alpha[-1] >= alpha[-2] else n_states - 2
+    if not np.isfinite(alpha[final]):
+        return None
+
+    path = np.empty(n_frames, dtype=np.int64)
+    path[-1] = final
+    for t in range(n_frames - 1, 0, -1):
+        path[t - 1] = path[t] - back[t, path[t]]
+    return path
+
+
+def text_to_targets(text, tokenizer):
+    """
+    Maps the characters of `text` to the tokenizer's CTC vocabulary. Spaces become the
+    word delimiter token; characters the vocabulary does not know (punctuation, ...)
+    are left out of the alignment.
+    Returns: (target token ids, target index per character of `text` or None)
+    """
+    vocab = tokenizer.get_vocab()
+    delimiter_id = vocab.get(tokenizer.word_delimiter_token)
+    targets, char_targets = [], []
+    for char in text:
+        if char.isspace():
+            if targets and delimiter_id is not None and targets[-1] != delimiter_id:
+                targets.append(delimiter_id)
+            char_targets.append(None)
+            continue
+        token_id = vocab.get(char, vocab.get(char.lower(), vocab.get(char.upper())))
+        if token_id is None:
+            char_targets.append(None)
+        else:
+            char_targets.append(len(targets))
+            targets.append(token_id)
+    if targets and targets[-1] == delimiter_id:
+        targets.pop()
+    return targets, char_targets
+
+
+def _span(start_frame, end_frame, log_prob_sum, frames, frame_duration, offset):
+    # frame_duration/offset turn frame indices into seconds in the original recording
+    return {
+        'start': round(offset + start_frame * frame_duration, 3),
+        'end': round(offset + end_frame * frame_duration, 3),
+        'confidence': round(float(np.exp(log_prob_sum / frames)), 4),
+    }
+
+
+def align_text(log_probs, text, tokenizer, frame_duration, offset=0.0):
+    """
+    Forced-aligns `text` to CTC log-probabilities.
+
+    A character's confidence is its frame-averaged posterior, exp(mean log p) over the
+    frames aligned to it; a word's is the same over all frames of its characters.
+    Args: log_probs (frames, vocab), text (str), tokenizer (Wav2Vec2CTCTokenizer),
+          frame_duration (seconds per frame), offset (time of frame 0 in seconds)
+    Returns: dict with 'chars' and 'words' (each entry has start/end in seconds and
+             confidence; None for characters that could not be aligned) and 'aligned'
+             (False when the text does not fit into the audio).
+    """
+    text = unicodedata.normalize('NFC', text)
+    targets, char_targets = text_to_targets(text, tokenizer)
+    path = ctc_viterbi(log_probs, targets, tokenizer.pad_token_id) if targets else None
+
+    spans = [None] * len(targets)
+    if path is not None:
+        frames = np.flatnonzero(path % 2 == 1)
+        target_index = path[frames] // 2
+        frame_log_probs = np.asarray(log_probs)[frames, np.asarray(targets)[target_index]]
+        sums = np.bincount(target_index, weights=frame_log_probs, minlength=len(targets))
+        counts = np.bincount(target_index, minlength=len(targets))
+        # Frames of one target are contiguous on a CTC path
+        first = frames[np.searchsorted(target_index, np.arange(len(targets)))]
+        last = frames[np.searchsorted(target_index, np.arange(len(targets)), side='right') - 1]
+        spans = list(zip(first.tolist(), (last + 1).tolist(), sums.tolist(), counts.tolist()))
+
+    def entry(key, value, char_spans):
+        item = {key: value, 'start': None, 'end': None, 'confidence': None}
+        if char_spans:
+            item.update(_span(char_spans[0][0], char_spans[-1][1], sum(span[2] for span in char_spans),
+                              sum(span[3] for span in char_spans), frame_duration, offset))
+        return item
+
+    def char_spans(start, end):
+        return [spans[char_targets[i]] for i in range(start, end)
+                if char_targets[i] is not None and spans[char_targets[i]] is not None]
+
+    chars = [entry('char', text[i], char_spans(i, i + 1)) for i in range(len(text)) if not text[i].isspace()]
+    words = [entry('word', match.group(), char_spans(match.start(), match.end()))
+             for match in re.finditer(r'\S+', text)]
+    return {'aligned': path is not None, 'chars': chars, 'words': words}
+
+
+def transcription_confidences(log_probs, transcription, tokenizer, frame_duration, offset=0.0):
+    """
+    Posterior confidence of the tokens and words of `transcription`, from its forced
+    alignment: the frames scored are those of the decoded text whichever decoder produced
+    it, not those of the argmax path (which a beam search with a language model may not follow).
+    Returns: {'tokens': [...], 'words': [...]}, entries with start/end (s) and confidence
+             (None when the transcription does not fit into the frames)
+    """
+    alignment = align_text(log_probs, transcription, tokenizer, frame_duration, offset)
+    tokens = [{'token': entry.pop('char'), **entry} for entry in alignment['chars']]
+    words = [{**entry, 'word': entry['word'].lower()} for entry in alignment['words']]
+    return {'tokens': tokens, 'words': words}
+
+
+def expected_word_confidences(emissions, words):
+    """
+    Confidence of each expected word from forced alignment against `emissions`
+    (None for words with no alignable characters, e.g. punctuation).
+    """
+    alignment = align_text(emissions.log_probs, " ".join(words), emissions.processor.tokenizer,
+                           emissions.frame_duration, emissions.offset)
+    return [entry['confidence'] for entry in alignment['words']]
+
+
+def analyze_waveform(waveform, language, text="", align=False, confidence=False, threshold=None):
+    """
+    Transcribes a 16 kHz mono waveform once and derives everything else from the same
+    log-probabilities.
+    Args: text: expected text to compare against (optional),
+          align: add the forced alignment of `text`,
+          confidence: add token/word confidences of the transcription,
+          threshold: decide each expected word by its aligned confidence instead of
+                     string equality (see apply_confidence_threshold)
+    Returns: dict with 'transcription' and, as requested, 'result', 'alignment', 'confidence'
+    """
+    emissions = transcribe_with_emissions(waveform, language, text or None)
+    tokenizer = emissions.processor.tokenizer
+    response = {"transcription": emissions.transcription}
+
+    if confidence:
+        with span("alignment"):
+            response["confidence"] = transcription_confidences(emissions.log_probs, emissions.transcription,
+                                                               tokenizer, emissions.frame_duration,
+                                                               emissions.offset)
+    if text:
+        result = compare_transcription(emissions.transcription, text, language)
+        if threshold is not None:
+            with span("alignment"):
+                confidences = expected_word_confidences(emissions, [word for word, _ in result])
+            result = apply_confidence_threshold(result, confidences, threshold)
+        response["result"] = result
+        if align:
+            with span("alignment"):
+                response["alignment"] = align_text(emissions.log_probs, text, tokenizer,
+                                                   emissions.frame_duration, emissions.offset)
+    return response
+
+
+def analyze_audio_file(audio_file, language, text="", **options):
+    """analyze_waveform for an uploaded file."""
+    return analyze_waveform(decode_audio(audio_file), language, text, **options)
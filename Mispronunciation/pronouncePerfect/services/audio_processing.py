@@ -1,135 +1,363 @@
+import io
 import os
-import librosa
+import re
+import subprocess
+import tempfile
+from collections import namedtuple
+import numpy as np
 import torch
 import soundfile as sf
-import re
 from django.conf import settings
-from pydub import AudioSegment
-from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
-from django.http import JsonResponse
+
+from .model_registry import MODEL_DIR_SETTINGS, model_registry
+from .batching import batching_enabled, get_batch_scheduler
+from .transcription_cache import cache_settings, transcription_cache
+from .ctc_decoder import get_decoder, uses_expected_text
+from .metrics import span
 
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load ASR model & processor globally
+# Load ASR model & processor (cached process-wide by the model registry)
 def select_model(language):
     """
-    Selects and loads a Wav2Vec2 model and processor based on the given language.
+    Returns the Wav2Vec2 processor and inference backend for the given language.
+    Models are loaded from disk once per process and reused afterwards.
     Args: language (str): The language code ('eng' or 'np').
-    Returns: A tuple containing the processor and model, or None if an error occurs.
+    Returns: A tuple containing the processor and backend, or None if an error occurs.
     """
-    try:
-        if language == 'eng':
-            model_path = settings.MODEL_DIR
-            print('english selected')
-        elif language == 'np':
-            model_path = settings.NEP_MODEL_DIR
-            print('nepali selected')
-        else:
-            logger.warning(f"Model language '{language}' not defined. Setting to default (None).")
-            return None  # Return None for invalid language
+    if language not in MODEL_DIR_SETTINGS:
+        logger.warning(f"Model language '{language}' not defined. Setting to default (None).")
+        return None  # Return None for invalid language
 
-        processor = Wav2Vec2Processor.from_pretrained(model_path)
-        model = Wav2Vec2ForCTC.from_pretrained(model_path)
-        return processor, model
+    try:
+        loaded = model_registry.get(language)
+        return loaded.processor, loaded.backend
 
     except FileNotFoundError:
-        logger.error(f"Model files not found at {model_path}.")
+        logger.error(f"Model files not found for language '{language}'.")
         return None
     except Exception as e:
         logger.exception(f"An unexpected error occurred while loading the model: {e}")
         return None
 
-# ----- Handles  audio file storage, optional .wav conversion, audio transcription. |---------------
-def process_audio_file(audio_file, language):
-    file_path = save_audio_file(audio_file)
+# ----- Decodes the upload in memory and transcribes it (cached by audio content). |---------------
+def process_audio_file(audio_file, language, expected_text=None):
+    """
+    Args: expected_text: the sentence the speaker was asked to read; biases the beam search
+          decoder towards its words when settings.ASR_DECODER asks for that, else ignored.
+    """
+    waveform = decode_audio(audio_file)
+    if not uses_expected_text(language):
+        expected_text = None
 
-    if not file_path.lower().endswith(".wav"):
-        print(f"File is not WAV, converting: {file_path}")
-        file_path = convert_to_wav(file_path)
+    if not cache_settings()['ENABLED']:
+        return transcribe_decoded(waveform, language, expected_text)
 
-    transcription = transcribe_audio(file_path, language)
-    os.remove(file_path)  # Cleanup
+    cache_key = transcription_cache.key(waveform, language, expected_text)
+    transcription = transcription_cache.get(cache_key)
+    if transcription is not None:
+        logger.info("Transcription served from cache")
+        return transcription
 
-    if os.path.exists(file_path):
-        os.remove(file_path)  # Cleanup
+    transcription = transcribe_decoded(waveform, language, expected_text)
+    transcription_cache.set(cache_key, transcription)
     return transcription
 
-# ------ Save uploaded audio file to media directory |----------------
-def save_audio_file(audio_file):
+# ----- Trims silence and transcribes a decoded waveform |---------------
+def transcribe_decoded(waveform, language, expected_text=None):
+    vad = settings.ASR_VAD
+    if vad['ENABLED'] and vad['SPLIT']:
+        segments, removed = split_on_silence(waveform, vad['THRESHOLD_DB'], vad['FRAME_MS'],
+                                             vad['PADDING_MS'], vad['MIN_SILENCE_MS'])
+        logger.info(f"VAD removed {removed:.2f}s of silence, {len(segments)} segment(s) left")
+        transcriptions = (transcribe_audio(segment, language, expected_text) for segment in segments)
+        return " ".join(t for t in transcriptions if t)
+
+    if vad['ENABLED']:
+        waveform, removed = trim_silence(waveform, vad['THRESHOLD_DB'], vad['FRAME_MS'], vad['PADDING_MS'])
+        logger.info(f"VAD removed {removed:.2f}s of leading/trailing silence")
+    return transcribe_audio(waveform, language, expected_text)
+
+# ------ Decode uploaded audio to a 16 kHz mono float32 waveform |----------------
+def decode_audio(audio_file):
+    """
+    Decodes an uploaded file without writing it to MEDIA_ROOT.
+    Small uploads are decoded straight from memory. Uploads Django already spooled
+    to a temporary file, or larger than AUDIO_SPOOL_THRESHOLD_BYTES, are decoded
+    from a temporary file instead of being held in memory as a whole.
+    Returns: np.ndarray (float32, mono, 16 kHz)
+    """
+    if hasattr(audio_file, "temporary_file_path"):
+        return decode_audio_path(audio_file.temporary_file_path())
+
+    if audio_file.size is not None and audio_file.size > settings.AUDIO_SPOOL_THRESHOLD_BYTES:
+        file_path = spool_audio_file(audio_file)
+        try:
+            return decode_audio_path(file_path)
+        finally:
+            os.remove(file_path)  # Cleanup
+
+    return decode_audio_bytes(b"".join(audio_file.chunks()))
+
+def decode_audio_bytes(data):
+    """Decodes encoded audio bytes (wav/flac/ogg via libsndfile, anything else via an ffmpeg pipe)."""
     try:
-        unique_name = f"temp_{audio_file.name}.wav" if audio_file.name else "temp_audio.wav"
-        file_path = os.path.join(settings.MEDIA_ROOT, unique_name)
-
-        print(f"Saving uploaded file: {file_path}")
-        with open(file_path, "wb+") as temp_file:
-            for chunk in audio_file.chunks():
-                temp_file.write(chunk)
-        
-        return file_path
-    except Exception as e:
-        print(f"Error while saving audio: {e}")
-        return JsonResponse({"error": str(e)}, status=500)
-
-# ------ Convert audio to WAV and resample to 16 kHz
-def convert_to_wav(input_path):
-    output_path = input_path.replace(".webm", ".wav").replace(".mp3", ".wav").replace(".m4a", ".wav")
-    try:  
-        print(f"Converting {input_path} to WAV format...")
-
-        # Try loading as WAV first to avoid unnecessary conversion
-        if input_path.lower().endswith('.wav'):
-            return input_path  # No conversion needed if already WAV
-   
-        audio = AudioSegment.from_file(input_path, format="webm")
-        logger.info(f"Audio loaded successfully: {audio.frame_rate} Hz, {audio.channels} channels")
-        audio = audio.set_frame_rate(16000).set_channels(1)
-        audio.export(output_path, format="wav")
-        return output_path
-    except Exception as e:
-        print(f"Error converting file: {e}")
-        raise RuntimeError(f"Conversion failed: {e}")
+        with span("audio_decode"):
+            waveform, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        return _ffmpeg_decode(["-i", "pipe:0"], data)
+    return _to_mono_16k(waveform, sample_rate)
+
+def decode_audio_path(file_path):
+    try:
+        with span("audio_decode"):
+            waveform, sample_rate = sf.read(file_path, dtype="float32", always_2d=True)
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        return _ffmpeg_decode(["-i", file_path])
+    return _to_mono_16k(waveform, sample_rate)
+
+def _to_mono_16k(waveform, sample_rate):
+    waveform = waveform.mean(axis=1) if waveform.shape[1] > 1 else waveform[:, 0]
+    if sample_rate != 16000:
+        import librosa  # slow to import; 16 kHz input never needs it
+
+        with span("resample"):
+            waveform = librosa.resample(waveform, orig_sr=sample_rate, target_sr=16000)
+    return np.ascontiguousarray(waveform, dtype=np.float32)
+
+def _ffmpeg_decode(input_args, data=None):
+    """Pipes audio through ffmpeg, reading raw 16 kHz mono float32 PCM from its stdout."""
+    command = [settings.FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error",
+               *input_args, "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", "16000", "pipe:1"]
+    try:
+        with span("audio_decode"):
+            result = subprocess.run(command, input=data, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError(f"ffmpeg not found ({settings.FFMPEG_BINARY}); it is required to decode this format")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Decoding failed: {e.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32).copy()
+
+# ------ Spool a large upload to a temporary file (outside MEDIA_ROOT) |----------------
+def spool_audio_file(audio_file):
+    suffix = os.path.splitext(audio_file.name or "")[1]
+    with span("upload"), tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+        for chunk in audio_file.chunks():
+            temp_file.write(chunk)
+    return temp_file.name
+
+# ----- Voice activity detection (energy based) --------------------
+def speech_mask(waveform, threshold_db=-40, frame_ms=30, padding_ms=200):
+    """
+    Marks frames that contain speech.
+    A frame is speech when its energy is within `threshold_db` of the loudest frame;
+    the mask is then widened by `padding_ms` on each side so word onsets and
+    trailing consonants are kept.
+    Returns: (boolean mask per frame, frame length in samples)
+    """
+    frame_length = max(1, int(16000 * frame_ms / 1000))
+    n_frames = -(-len(waveform) // frame_length)
+    frames = np.zeros(n_frames * frame_length, dtype=np.float32)
+    frames[:len(waveform)] = waveform
+    energy = np.square(frames.reshape(n_frames, frame_length)).mean(axis=1)
+
+    peak = energy.max(initial=0.0)
+    if peak < 1e-10:  # digital silence
+        return np.zeros(n_frames, dtype=bool), frame_length
+    mask = 10 * np.log10(energy / peak + 1e-12) > threshold_db
+
+    padding = int(padding_ms / frame_ms)
+    if padding:
+        mask = np.convolve(mask, np.ones(2 * padding + 1), mode="same") > 0
+    return mask, frame_length
+
+def trim_silence(waveform, threshold_db=-40, frame_ms=30, padding_ms=200):
+    """
+    Cuts leading and trailing silence.
+    Returns: (trimmed waveform, seconds removed)
+    """
+    start, end = speech_bounds(waveform, threshold_db, frame_ms, padding_ms)
+    trimmed = waveform[start:end]
+    return trimmed, (len(waveform) - len(trimmed)) / 16000
+
+def speech_bounds(waveform, threshold_db=-40, frame_ms=30, padding_ms=200):
+    """
+    Returns: (start, end) sample indices of the span trim_silence keeps
+    (the whole waveform when no speech is found).
+    """
+    mask, frame_length = speech_mask(waveform, threshold_db, frame_ms, padding_ms)
+    speech = np.flatnonzero(mask)
+    if len(speech) == 0:
+        return 0, len(waveform)
+    return int(speech[0]) * frame_length, min(len(waveform), (int(speech[-1]) + 1) * frame_length)
+
+def split_on_silence(waveform, threshold_db=-40, frame_ms=30, padding_ms=200, min_silence_ms=700):
+    """
+    Splits a waveform into speech segments at pauses of at least `min_silence_ms`.
+    Shorter pauses stay inside their segment.
+    Returns: (list of segments, seconds removed)
+    """
+    mask, frame_length = speech_mask(waveform, threshold_db, frame_ms, padding_ms)
+    if not mask.any():
+        return [waveform], 0.0
+
+    # Run boundaries of the mask: starts of speech and starts of silence
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+
+    # Merge speech runs separated by pauses shorter than min_silence_ms
+    min_gap = max(1, int(min_silence_ms / frame_ms))
+    keep = np.concatenate([[True], starts[1:] - ends[:-1] >= min_gap])
+    segment_starts = starts[keep]
+    segment_ends = np.maximum.reduceat(ends, np.flatnonzero(keep))
+
+    segments = [waveform[start * frame_length:end * frame_length]
+                for start, end in zip(segment_starts, segment_ends)]
+    removed = (len(waveform) - sum(len(segment) for segment in segments)) / 16000
+    return segments, removed
 
 # ----- generate transcription --------------------
-def transcribe_audio(file_path, language):
+def transcribe_audio(waveform, language, expected_text=None):
     """
-    Transcribes an audio file using Wav2Vec2.
+    Transcribes a 16 kHz mono waveform using Wav2Vec2.
+    A transcription biased towards `expected_text` is specific to the request, so it
+    skips the batch scheduler.
     """
+    if not uses_expected_text(language):
+        expected_text = None
     try:
-        print(f"Loading and resampling audio: {file_path}")
-        # Ensure file_path ends with .wav for librosa
-        if not file_path.lower().endswith('.wav'):
-            raise ValueError(f"Expected WAV file, got: {file_path}")
-
-       # Load with librosa, explicitly specifying format if needed
-        waveform, sample_rate = librosa.load(file_path, sr=16000, mono=True)
-        if sample_rate != 16000:
-            print(f"Resampling to 16kHz...")
-            waveform, _ = librosa.resample(waveform, sample_rate, 16000)
-
-        # Write to ensure correct format, overwriting if needed
-        sf.write(file_path, waveform, 16000, format='WAV')
-
-        processor, model= select_model(language)
-
-        print(f"Processing audio with Wav2Vec2...")
-        input_values = processor(waveform, sampling_rate=16000, return_tensors="pt").input_values
-        logits = model(input_values).logits
-        predicted_ids = torch.argmax(logits, dim=-1)
-        transcription = processor.decode(predicted_ids[0])
-        if language == 'np':
-            transcription=clean_transcription(transcription)
+        if len(waveform) > settings.ASR_CHUNK_LENGTH_S * 16000:
+            # Long recordings are transcribed window by window to bound memory
+            from .streaming import transcribe_long_audio
+            transcription = transcribe_long_audio(waveform, language, expected_text=expected_text)
+        elif batching_enabled() and expected_text is None:
+            # The forward pass runs on the scheduler's thread: time the wait for it here
+            with span("batched_forward"):
+                transcription = get_batch_scheduler().transcribe(waveform, language)
+        else:
+            transcription = transcribe_waveforms([waveform], language, expected_text=expected_text)[0]
 
         print(f"Transcription generated: {transcription}")
 
-        return transcription.lower()
+        return transcription
 
     except Exception as e:
         print(f"Error during transcription: {e}")
         raise RuntimeError(f"Transcription failed: {e}")
 
 
+def transcribe_waveforms(waveforms, language, model_pair=None, expected_text=None):
+    """
+    Runs one (batched) Wav2Vec2 forward pass over 16 kHz mono waveforms.
+    Shorter clips are zero-padded and masked; each result is decoded from its own frames
+    only. Group norm checkpoints take no mask, so they batch only clips of equal length.
+    Args: waveforms (list of np.ndarray), language (str): 'eng' or 'np',
+          model_pair: optional (processor, backend) to use instead of the cached model,
+          expected_text: sentence to bias the beam search decoder towards (optional).
+    Returns: list of transcriptions, in the order of `waveforms`.
+    """
+    processor, _, clip_logits = compute_logits(waveforms, language, model_pair)
+    return [decode_logits(processor, logits, language, expected_text) for logits in clip_logits]
+
+
+def compute_logits(waveforms, language, model_pair=None):
+    """
+    The forward pass behind transcribe_waveforms.
+    Returns: (processor, backend, list of (frames, vocab) logits tensors, one per waveform,
+              trimmed to the frames of that waveform)
+    """
+    selected = model_pair or select_model(language)
+    if selected is None:
+        raise ValueError(f"No model available for language '{language}'")
+    processor, backend = selected
+    if backend.config.feat_extract_norm != "layer" and len({len(waveform) for waveform in waveforms}) > 1:
+        # Checkpoints using group norm in the feature extractor were trained without
+        # attention masks: zero padding would enter the normalization statistics and make a
+        # clip's transcription depend on the clips batched with it. Only clips of the same
+        # length share a forward pass.
+        by_length = {}
+        for index, waveform in enumerate(waveforms):
+            by_length.setdefault(len(waveform), []).append(index)
+        clip_logits = [None] * len(waveforms)
+        for indices in by_length.values():
+            _, _, logits = compute_logits([waveforms[index] for index in indices], language, selected)
+            for index, clip in zip(indices, logits):
+                clip_logits[index] = clip
+        return processor, backend, clip_logits
+
+    logger.debug(f"Processing {len(waveforms)} audio clip(s) with Wav2Vec2")
+    with span("forward"):
+        inputs = processor(waveforms, sampling_rate=16000, return_tensors="pt",
+                           padding=True, return_attention_mask=True)
+        # Group norm checkpoints get here with equal-length clips only: no padding to mask
+        attention_mask = inputs.attention_mask if backend.config.feat_extract_norm == "layer" else None
+        logits = backend.logits(inputs.input_values, attention_mask)
+    frame_lengths = backend.output_lengths(inputs.attention_mask.sum(-1))
+    return processor, backend, [clip[:length] for clip, length in zip(logits, frame_lengths.tolist())]
+
+
+def decode_logits(processor, logits, language, expected_text=None):
+    """
+    CTC decoding of one clip's (frames, vocab) logits: greedy argmax, or prefix beam
+    search when settings.ASR_DECODER selects it for the language (see ctc_decoder.py).
+    """
+    decoder = get_decoder(language, processor.tokenizer)
+    if decoder is None:
+        with span("ctc_decode"):
+            return postprocess_transcription(processor.decode(torch.argmax(logits, dim=-1)), language)
+    log_probs = torch.log_softmax(logits.float(), dim=-1).numpy()
+    return beam_search_decode(decoder, processor, log_probs, language, expected_text)
+
+
+def beam_search_decode(decoder, processor, log_probs, language, expected_text=None):
+    """Decodes (frames, vocab) log-probabilities with a ctc_decoder.BeamSearchDecoder."""
+    with span("ctc_decode"):
+        token_ids = decoder.decode(log_probs, expected_text)
+        return postprocess_transcription(processor.decode(token_ids, group_tokens=False), language)
+
+
+# Transcription plus the CTC log-probabilities it was decoded from. `offset` is where
+# frame 0 starts in the original recording (seconds of leading silence trimmed by VAD).
+CtcEmissions = namedtuple('CtcEmissions', ['transcription', 'log_probs', 'processor', 'frame_duration', 'offset'])
+
+
+def transcribe_with_emissions(waveform, language, expected_text=None):
+    """
+    Transcribes a 16 kHz mono waveform like transcribe_decoded, but also keeps the
+    per-frame log-probabilities for alignment and confidence scoring, so those need no
+    second forward pass. Leading/trailing silence is trimmed (never split) so frame
+    times map back to the recording; the cache and batching are bypassed.
+    Returns: CtcEmissions with log_probs as a (frames, vocab) float32 array
+    """
+    vad = settings.ASR_VAD
+    offset = 0.0
+    if vad['ENABLED']:
+        start, end = speech_bounds(waveform, vad['THRESHOLD_DB'], vad['FRAME_MS'], vad['PADDING_MS'])
+        waveform, offset = waveform[start:end], start / 16000
+
+    if len(waveform) > settings.ASR_CHUNK_LENGTH_S * 16000:
+        from .streaming import StreamingTranscriber
+        transcriber = StreamingTranscriber(language, keep_log_probs=True, expected_text=expected_text)
+        transcriber.feed(waveform)
+        transcription = transcriber.finish()
+        processor, backend, log_probs = transcriber.processor, transcriber.backend, transcriber.log_probs()
+    else:
+        processor, backend, (logits,) = compute_logits([waveform], language)
+        transcription = decode_logits(processor, logits, language, expected_text)
+        log_probs = torch.log_softmax(logits.float(), dim=-1).numpy()
+
+    frame_duration = backend.config.inputs_to_logits_ratio / 16000
+    return CtcEmissions(transcription, log_probs, processor, frame_duration, offset)
+
+
+def postprocess_transcription(transcription, language):
+    if language == 'np':
+        transcription = clean_transcription(transcription)
+    return transcription.lower()
+
+
 def clean_transcription(raw_transcription):
         # Remove all [PAD] tokens
         cleaned = raw_transcription.replace("[PAD]", "")
@@ -0,0 +1,178 @@
+"""
+Scoring a whole class's recordings in one call.
+
+`score_batch()` decodes the uploads in a thread pool while the calling thread runs the
+model: decoded clips are collected into batches of BATCH_SIZE (or whatever is ready
+when no decode is outstanding), transcribed in one forward pass and compared with
+their expected texts. Results are yielded as soon as their batch is done, followed by
+a summary with the aggregate throughput, so views can stream them as JSON lines.
+"""
+import os
+import time
+import logging
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .audio_processing import (
+    compute_logits, decode_audio, decode_audio_path, decode_logits, transcribe_decoded, trim_silence,
+)
+from .ctc_decoder import uses_expected_text
+from .text_analysis import compare_transcription
+from .transcription_cache import cache_settings, transcription_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SCORING = {
+    'DECODE_WORKERS': 4,
+    'BATCH_SIZE': 8,
+    'MAX_FILES': 100,
+}
+
+
+def batch_scoring_settings():
+    return {**DEFAULT_BATCH_SCORING, **getattr(settings, 'BATCH_SCORING', {})}
+
+
+# One recording to score: `audio` is an uploaded file or a path, `text` the expected text
+BatchItem = namedtuple('BatchItem', ['name', 'audio', 'text'])
+
+
+def _decode(item):
+    start = time.perf_counter()
+    if isinstance(item.audio, (str, os.PathLike)):
+        waveform = decode_audio_path(item.audio)
+    else:
+        waveform = decode_audio(item.audio)
+    return waveform, time.perf_counter() - start
+
+
+def _record(item, **fields):
+    record = {'name': item.name, 'transcription': None, 'result': None, 'error': None}
+    record.update(fields)
+    return record
+
+
+def score_batch(items, language, batch_size=None, decode_workers=None):
+    """
+    Transcribes and scores many recordings.
+
+    Args:
+        items (list): BatchItem per recording
+        language (str): 'eng' or 'np'
+        batch_size (int): Clips per forward pass (default: settings.BATCH_SCORING)
+        decode_workers (int): Audio decoding threads (default: settings.BATCH_SCORING)
+
+    Yields:
+        dict: One record per recording in completion order (name, transcription, result,
+        error, duration, timings), then {'summary': {...}} with the aggregate throughput.
+    """
+    config = batch_scoring_settings()
+    batch_size = max(1, int(batch_size or config['BATCH_SIZE']))
+    decode_workers = max(1, int(decode_workers or config['DECODE_WORKERS']))
+    vad = settings.ASR_VAD
+    use_cache = cache_settings()['ENABLED']
+    started = time.perf_counter()
+    totals = {'decode': 0.0, 'inference': 0.0, 'comparison': 0.0}
+    counts = {'files': 0, 'failed': 0, 'cached': 0, 'batches': 0, 'audio_seconds': 0.0}
+
+    def finish(item, duration, transcription, timings):
+        start = time.perf_counter()
+        result = compare_transcription(transcription, item.text, language) if item.text else None
+        timings['comparison'] = time.perf_counter() - start
+        totals['comparison'] += timings['comparison']
+        counts['files'] += 1
+        return _record(item, transcription=transcription, result=result,
+                       duration=round(duration, 3),
+                       timings={stage: round(seconds, 4) for stage, seconds in timings.items()})
+
+    def fail(item, error):
+        logger.warning(f"Batch scoring failed for {item.name}: {error}")
+        counts['files'] += 1
+        counts['failed'] += 1
+        return _record(item, error=str(error))
+
+    def run_batch(batch):
+        """batch: (item, waveform, duration, timings, cache_key) tuples; yields their records."""
+        counts['batches'] += 1
+        start = time.perf_counter()
+        try:
+            processor, _, clip_logits = compute_logits([entry[1] for entry in batch], language)
+            transcriptions = [
+                decode_logits(processor, logits, language, item.text if uses_expected_text(language) else None)
+                for (item, *_), logits in zip(batch, clip_logits)
+            ]
+        except Exception as e:
+            for item, *_ in batch:
+                yield fail(item, e)
+            return
+        # The forward pass is shared: each clip is charged its share of it
+        elapsed = time.perf_counter() - start
+        totals['inference'] += elapsed
+        for (item, _, duration, timings, cache_key), transcription in zip(batch, transcriptions):
+            timings['inference'] = elapsed / len(batch)
+            if cache_key is not None:
+                transcription_cache.set(cache_key, transcription)
+            yield finish(item, duration, transcription, timings)
+
+    pending = []
+    with ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix='batch-decode') as pool:
+        futures = {pool.submit(_decode, item): item for item in items}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = futures.pop(future)
+                try:
+                    waveform, decode_time = future.result()
+                except Exception as e:
+                    yield fail(item, e)
+                    continue
+                totals['decode'] += decode_time
+                duration = len(waveform) / 16000
+                counts['audio_seconds'] += duration
+                timings = {'decode': decode_time}
+                expected_text = item.text if uses_expected_text(language) else None
+
+                cache_key = None
+                if use_cache:
+                    cache_key = transcription_cache.key(waveform, language, expected_text)
+                    transcription = transcription_cache.get(cache_key)
+                    if transcription is not None:
+                        counts['cached'] += 1
+                        yield finish(item, duration, transcription, timings)
+                        continue
+
+                if (vad['ENABLED'] and vad['SPLIT']) or len(waveform) > settings.ASR_CHUNK_LENGTH_S * 16000:
+                    # Split or windowed recordings do not fit a single batched forward pass
+                    start = time.perf_counter()
+                    try:
+                        transcription = transcribe_decoded(waveform, language, expected_text)
+                    except Exception as e:
+                        yield fail(item, e)
+                        continue
+                    timings['inference'] = time.perf_counter() - start
+                    totals['inference'] += timings['inference']
+                    if cache_key is not None:
+                        transcription_cache.set(cache_key, transcription)
+                    yield finish(item, duration, transcription, timings)
+                    continue
+
+                clip = trim_silence(waveform, vad['THRESHOLD_DB'], vad['FRAME_MS'], vad['PADDING_MS'])[0] \
+                    if vad['ENABLED'] else waveform
+                pending.append((item, clip, duration, timings, cache_key))
+
+            # Run full batches right away, and whatever is ready once no decode is outstanding
+            while len(pending) >= batch_size or (pending and not futures):
+                batch, pending = pending[:batch_size], pending[batch_size:]
+                yield from run_batch(batch)
+
+    elapsed = time.perf_counter() - started
+    yield {'summary': {
+        **counts,
+        'audio_seconds': round(counts['audio_seconds'], 2),
+        'elapsed': round(elapsed, 3),
+        'files_per_s': round(counts['files'] / elapsed, 2) if elapsed else None,
+        'audio_seconds_per_s': round(counts['audio_seconds'] / elapsed, 2) if elapsed else None,
+        'stage_totals': {stage: round(seconds, 3) for stage, seconds in totals.items()},
+    }}
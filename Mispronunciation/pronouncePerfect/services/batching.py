@@ -0,0 +1,182 @@
+import threading
+import queue
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCHING = {
+    'ENABLED': False,
+    'MAX_BATCH_SIZE': 8,
+    'MAX_WAIT_MS': 20,
+}
+
+
+def batching_settings():
+    return {**DEFAULT_BATCHING, **getattr(settings, 'ASR_BATCHING', {})}
+
+
+def batching_enabled():
+    return bool(batching_settings()['ENABLED'])
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class BatchMetrics:
+    """Throughput and latency counters of a BatchScheduler."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.inference_time = 0.0
+        self._latencies = deque(maxlen=window)  # submit -> result, per request
+        self._queue_waits = deque(maxlen=window)  # submit -> start of forward pass
+
+    def record_batch(self, size, inference_time, queue_waits, latencies, failed=False):
+        with self._lock:
+            self.requests += size
+            self.batches += 1
+            self.errors += size if failed else 0
+            self.inference_time += inference_time
+            self._queue_waits.extend(queue_waits)
+            self._latencies.extend(latencies)
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            queue_waits = list(self._queue_waits)
+            elapsed = time.perf_counter() - self.started_at
+            return {
+                'requests': self.requests,
+                'batches': self.batches,
+                'errors': self.errors,
+                'avg_batch_size': round(self.requests / self.batches, 2) if self.batches else 0.0,
+                'throughput_rps': round(self.requests / elapsed, 2) if elapsed else 0.0,
+                'inference_time_s': round(self.inference_time, 3),
+                'latency_ms': {
+                    'p50': round(percentile(latencies, 50) * 1000, 1),
+                    'p95': round(percentile(latencies, 95) * 1000, 1),
+                    'max': round(max(latencies, default=0.0) * 1000, 1),
+                },
+                'queue_wait_ms': {
+                    'p50': round(percentile(queue_waits, 50) * 1000, 1),
+                    'p95': round(percentile(queue_waits, 95) * 1000, 1),
+                },
+            }
+
+
+class _Request:
+    __slots__ = ('waveform', 'future', 'submitted_at')
+
+    def __init__(self, waveform):
+        self.waveform = waveform
+        self.future = Future()
+        self.submitted_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """
+    Groups concurrent transcription requests into batched forward passes.
+    Requests are queued per language; a worker thread per language takes the first
+    waiting request, keeps collecting until `max_batch_size` requests are queued or
+    `max_wait_ms` has passed, runs `infer_fn(waveforms, language)` once for the whole
+    batch and resolves each request's future with its own result.
+    """
+
+    def __init__(self, infer_fn, max_batch_size=8, max_wait_ms=20):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000)
+        self.metrics = BatchMetrics()
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def _queue_for(self, language):
+        with self._lock:
+            pending = self._queues.get(language)
+            if pending is None:
+                pending = self._queues[language] = queue.Queue()
+                worker = threading.Thread(target=self._run, args=(language, pending),
+                                          name=f"asr-batcher-{language}", daemon=True)
+                worker.start()
+            return pending
+
+    def submit(self, waveform, language):
+        """Queues one waveform and returns a Future resolving to its transcription."""
+        request = _Request(waveform)
+        self._queue_for(language).put(request)
+        return request.future
+
+    def transcribe(self, waveform, language, timeout=None):
+        return self.submit(waveform, language).result(timeout=timeout)
+
+    def _collect(self, pending):
+        batch = [pending.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, language, pending):
+        while True:
+            batch = self._collect(pending)
+            started = time.perf_counter()
+            queue_waits = [started - request.submitted_at for request in batch]
+            failed = False
+            try:
+                results = self.infer_fn([request.waveform for request in batch], language)
+                for request, result in zip(batch, results):
+                    request.future.set_result(result)
+            except Exception as e:
+                logger.exception(f"Batched transcription failed for '{language}': {e}")
+                failed = True
+                for request in batch:
+                    request.future.set_exception(e)
+            finished = time.perf_counter()
+            latencies = [finished - request.submitted_at for request in batch]
+            self.metrics.record_batch(len(batch), finished - started, queue_waits, latencies, failed)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queued': {language: q.qsize() for language, q in self._queues.items()},
+            **self.metrics.stats(),
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_batch_scheduler():
+    """Returns the process-wide scheduler in front of `transcribe_waveforms`."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from .audio_processing import transcribe_waveforms
+                config = batching_settings()
+                _scheduler = BatchScheduler(transcribe_waveforms,
+                                            max_batch_size=config['MAX_BATCH_SIZE'],
+                                            max_wait_ms=config['MAX_WAIT_MS'])
+    return _scheduler
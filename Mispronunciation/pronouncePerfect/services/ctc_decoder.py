@@ -0,0 +1,245 @@
+"""
+CTC decoding beyond greedy argmax: a prefix beam search over the per-frame
+log-probabilities, optionally scoring every completed word with a word n-gram model
+built from the PracticeSample texts and a bonus for the words of the expected sentence.
+
+Which decoder a language uses is set in settings.ASR_DECODER; greedy stays the default.
+"""
+import functools
+import math
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+DEFAULT_DECODER = {
+    'TYPE': 'greedy',
+    'BEAM_WIDTH': 8,
+    'PRUNE_LOG_PROB': -8.0,
+    'LM_ORDER': 2,
+    'LM_WEIGHT': 0.5,
+    'WORD_BONUS': 1.0,
+    'HOTWORD_BONUS': 2.0,
+}
+
+_SENTENCE_END = re.compile(r'[.!?।\n]+')
+_START = '<s>'
+
+
+def decoder_settings(language):
+    return {**DEFAULT_DECODER, **getattr(settings, 'ASR_DECODER', {}).get(language, {})}
+
+
+def uses_expected_text(language):
+    """Whether the decoder for `language` is biased towards the expected sentence."""
+    options = decoder_settings(language)
+    return options['TYPE'] == 'beam' and options['HOTWORD_BONUS'] != 0
+
+
+class NgramLM:
+    """
+    Word n-gram model with stupid backoff (Brants et al., 2007): the relative frequency of
+    the longest seen n-gram, times 0.4 per backoff step. Sized for a few hundred practice
+    texts, not for general language modelling. Scores are natural logs.
+    """
+
+    BACKOFF = math.log(0.4)
+
+    def __init__(self, sentences, order=2, cache_size=65536):
+        self.order = max(1, int(order))
+        self.counts = Counter()
+        for words in sentences:
+            padded = (_START,) + tuple(words)
+            for n in range(1, self.order + 1):
+                for i in range(len(padded) - n + 1):
+                    self.counts[padded[i:i + n]] += 1
+        self.total = sum(count for gram, count in self.counts.items() if len(gram) == 1 and gram != (_START,))
+        self.vocab_size = sum(1 for gram in self.counts if len(gram) == 1 and gram != (_START,))
+        self._cached_score = functools.lru_cache(maxsize=cache_size)(self._score)
+
+    def score(self, context, word):
+        """log P(word | context), context being the tuple of preceding words of the sentence."""
+        return self._cached_score(context[max(0, len(context) - self.order + 1):], word)
+
+    def _score(self, context, word):
+        context = ((_START,) + context)[-(self.order - 1):] if self.order > 1 else ()
+        penalty = 0.0
+        for start in range(len(context) + 1):
+            history = context[start:]
+            count = self.counts.get(history + (word,))
+            if count:
+                denominator = self.counts[history] if history else self.total
+                return penalty + math.log(count / denominator)
+            penalty += self.BACKOFF
+        # Unseen word: as if it had been seen once more than never
+        return penalty + math.log(1 / (self.total + self.vocab_size + 1))
+
+
+class BeamSearchDecoder:
+    """
+    CTC prefix beam search (Hannun et al., 2014).
+
+    Every frame extends all kept prefixes at once: the blank/repeat bookkeeping and the
+    scores of all (prefix, token) extensions are NumPy array operations; only the best
+    `beam_width` extensions are merged into new prefixes. Tokens with a log-probability
+    below `prune_log_prob` in a frame are not expanded, so frames the model is sure are
+    blank cost a couple of vector operations.
+
+    Completed words are scored with lm_weight * log P_lm(word | previous words) +
+    word_bonus, plus hotword_bonus for words of the expected sentence.
+    """
+
+    def __init__(self, tokenizer, beam_width=8, prune_log_prob=-8.0, lm=None, lm_weight=0.5,
+                 word_bonus=0.0, hotword_bonus=0.0):
+        vocab = tokenizer.get_vocab()
+        self.blank_id = tokenizer.pad_token_id
+        self.delimiter_id = vocab.get(tokenizer.word_delimiter_token, -1)
+        self.tokens = tokenizer.convert_ids_to_tokens(list(range(len(vocab))))
+        self.characters = {token for token in vocab if len(token) == 1 and token != tokenizer.word_delimiter_token}
+        self.beam_width = max(1, int(beam_width))
+        self.prune_log_prob = prune_log_prob
+        self.lm = lm
+        self.lm_weight = lm_weight
+        self.word_bonus = word_bonus
+        self.hotword_bonus = hotword_bonus
+
+    def words(self, text):
+        """Splits text into words the decoder can produce (lowercase, vocabulary characters only)."""
+        words = (''.join(char for char in word if char in self.characters) for word in text.lower().split())
+        return [word for word in words if word]
+
+    def word_score(self, context, word, hotwords):
+        score = self.word_bonus
+        if self.lm is not None:
+            score += self.lm_weight * self.lm.score(context, word)
+        if word in hotwords:
+            score += self.hotword_bonus
+        return score
+
+    def decode(self, log_probs, expected_text=None):
+        """
+        Args: log_probs: (frames, vocab) log-softmax output of one clip,
+              expected_text: sentence whose words get hotword_bonus (optional)
+        Returns: list of token ids of the best prefix (blanks removed, repeats not merged)
+        """
+        log_probs = np.asarray(log_probs, dtype=np.float64)
+        hotwords = frozenset(self.words(expected_text)) if expected_text and self.hotword_bonus else frozenset()
+        blank, delimiter = self.blank_id, self.delimiter_id
+
+        prefixes = [()]
+        words = [()]          # completed words of each prefix
+        current = ['']        # partial word at the end of each prefix
+        bonus = np.zeros(1)   # sum of word scores of each prefix
+        last = np.full(1, -1)
+        pb, pnb = np.zeros(1), np.full(1, -np.inf)
+
+        for frame in log_probs:
+            total = np.logaddexp(pb, pnb)
+            stay_pb = total + frame[blank]
+            stay_pnb = np.where(last >= 0, pnb + frame[np.maximum(last, 0)], -np.inf)
+            candidates = np.flatnonzero(frame >= min(self.prune_log_prob, frame.max()))
+            candidates = candidates[candidates != blank]
+            if not len(candidates):
+                pb, pnb = stay_pb, stay_pnb
+                continue
+
+            # (beams, candidates) extensions; a repeated token only extends after a blank
+            extended = np.where(candidates[None, :] == last[:, None], pb[:, None], total[:, None]) + frame[candidates]
+            scores = extended + bonus[:, None]
+            delimiter_column = np.flatnonzero(candidates == delimiter)
+            if len(delimiter_column):
+                column = delimiter_column[0]
+                # A delimiter at the start or after another delimiter adds no word: count it as silence
+                redundant = (last == -1) | (last == delimiter)
+                stay_pb[redundant] = np.logaddexp(stay_pb[redundant], extended[redundant, column])
+                scores[redundant, column] = -np.inf
+                for i in np.flatnonzero(~redundant):
+                    scores[i, column] += self.word_score(words[i], current[i], hotwords)
+
+            count = min(self.beam_width, scores.size)
+            best = np.argpartition(-scores, count - 1, axis=None)[:count]
+
+            beams = {}
+            for i, prefix in enumerate(prefixes):
+                if stay_pb[i] > -np.inf or stay_pnb[i] > -np.inf:
+                    beams[prefix] = [stay_pb[i], stay_pnb[i], words[i], current[i], bonus[i], last[i]]
+            for flat in best:
+                i, j = divmod(int(flat), len(candidates))
+                if scores[i, j] == -np.inf:
+                    continue
+                token = int(candidates[j])
+                prefix = prefixes[i] + (token,)
+                beam = beams.get(prefix)
+                if beam is not None:
+                    beam[1] = np.logaddexp(beam[1], extended[i, j])
+                elif token == delimiter:
+                    beams[prefix] = [-np.inf, extended[i, j], words[i] + (current[i],), '', scores[i, j] - extended[i, j], token]
+                else:
+                    beams[prefix] = [-np.inf, extended[i, j], words[i], current[i] + self.tokens[token], bonus[i], token]
+
+            ranked = sorted(beams.items(), key=lambda item: np.logaddexp(item[1][0], item[1][1]) + item[1][4],
+                            reverse=True)[:self.beam_width]
+            prefixes = [prefix for prefix, _ in ranked]
+            pb, pnb, words, current, bonus, last = (list(column) for column in zip(*(beam for _, beam in ranked)))
+            pb, pnb, bonus, last = np.array(pb), np.array(pnb), np.array(bonus), np.array(last)
+
+        # The last word has no delimiter after it; "ab|" and "ab" are the same text
+        final = {}
+        for i, prefix in enumerate(prefixes):
+            if prefix and prefix[-1] == delimiter:
+                prefix, score = prefix[:-1], np.logaddexp(pb[i], pnb[i]) + bonus[i]
+            else:
+                score = np.logaddexp(pb[i], pnb[i]) + bonus[i] + (
+                    self.word_score(words[i], current[i], hotwords) if current[i] else 0.0)
+            final[prefix] = np.logaddexp(final[prefix], score) if prefix in final else score
+        return list(max(final, key=final.get))
+
+
+def practice_sentences(language):
+    """Sentences of the PracticeSample texts of `language`."""
+    from pronouncePerfect.models import PracticeSample
+
+    sentences = []
+    for text in PracticeSample.objects.filter(language=language).values_list('text', flat=True):
+        sentences.extend(sentence for sentence in _SENTENCE_END.split(text) if sentence.strip())
+    return sentences
+
+
+_decoders = {}
+_decoders_lock = threading.Lock()
+
+
+def build_decoder(language, tokenizer, options=None):
+    """Builds the beam search decoder described by `options` (default: settings.ASR_DECODER)."""
+    options = options or decoder_settings(language)
+    decoder = BeamSearchDecoder(tokenizer, options['BEAM_WIDTH'], options['PRUNE_LOG_PROB'],
+                                lm_weight=options['LM_WEIGHT'], word_bonus=options['WORD_BONUS'],
+                                hotword_bonus=options['HOTWORD_BONUS'])
+    if options['LM_ORDER'] > 0:
+        decoder.lm = NgramLM((decoder.words(sentence) for sentence in practice_sentences(language)),
+                             order=options['LM_ORDER'])
+    return decoder
+
+
+def get_decoder(language, tokenizer):
+    """
+    The beam search decoder for `language`, or None when it is decoded greedily.
+    Built once per process and tokenizer (the LM reads the practice texts at that point).
+    """
+    if decoder_settings(language)['TYPE'] != 'beam':
+        return None
+    cached = _decoders.get(language)
+    if cached is None or cached[0] is not tokenizer:
+        with _decoders_lock:
+            cached = _decoders.get(language)
+            if cached is None or cached[0] is not tokenizer:
+                cached = _decoders[language] = (tokenizer, build_decoder(language, tokenizer))
+    return cached[1]
+
+
+def clear_decoders():
+    """Drops the built decoders, e.g. after the practice texts changed."""
+    with _decoders_lock:
+        _decoders.clear()
@@ -0,0 +1,133 @@
+import os
+import logging
+
+import numpy as np
+import torch
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ONNX_FILENAME = 'model.onnx'
+
+
+def model_memory_bytes(model):
+    """Bytes taken by a model's weights, including packed int8 weights of quantized layers."""
+    total = 0
+    for value in model.state_dict().values():
+        tensors = value if isinstance(value, tuple) else (value,)
+        total += sum(t.numel() * t.element_size() for t in tensors if isinstance(t, torch.Tensor))
+    return total
+
+
+class TorchBackend:
+    """Eager PyTorch inference (fp32 or dynamically quantized)."""
+
+    name = 'torch'
+
+    def __init__(self, model):
+        self.model = model
+        self.config = model.config
+
+    def logits(self, input_values, attention_mask=None):
+        with torch.inference_mode():
+            return self.model(input_values, attention_mask=attention_mask).logits
+
+    def output_lengths(self, input_lengths):
+        """Number of logit frames produced for inputs of `input_lengths` samples."""
+        return self.model._get_feat_extract_output_lengths(input_lengths)
+
+    def memory_bytes(self):
+        return model_memory_bytes(self.model)
+
+
+class OnnxBackend:
+    """ONNX Runtime inference on the CPU execution provider."""
+
+    name = 'onnx'
+
+    def __init__(self, onnx_path, config, intra_op_threads=0, inter_op_threads=0):
+        import onnxruntime  # optional dependency, only needed for this backend
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.onnx_path = onnx_path
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.config = config
+
+    def logits(self, input_values, attention_mask=None):
+        feeds = {'input_values': input_values.numpy().astype(np.float32)}
+        if 'attention_mask' in self.input_names:
+            if attention_mask is None:
+                attention_mask = torch.ones(input_values.shape, dtype=torch.long)
+            feeds['attention_mask'] = attention_mask.numpy().astype(np.int64)
+        logits, = self.session.run(['logits'], feeds)
+        return torch.from_numpy(logits)
+
+    def output_lengths(self, input_lengths):
+        # Same arithmetic as Wav2Vec2's feature encoder (1D convolutions, no padding)
+        for kernel, stride in zip(self.config.conv_kernel, self.config.conv_stride):
+            input_lengths = torch.div(input_lengths - kernel, stride, rounding_mode='floor') + 1
+        return input_lengths
+
+    def memory_bytes(self):
+        return os.path.getsize(self.onnx_path)
+
+
+def onnx_model_path(model_path):
+    return os.path.join(model_path, ONNX_FILENAME)
+
+
+def export_onnx_model(model, output_path, opset=17):
+    """
+    Exports a Wav2Vec2ForCTC model to ONNX with dynamic batch and length axes.
+    An attention_mask input is only exported for models that use it
+    (feature extractors with layer norm).
+    """
+    model.eval()
+    use_attention_mask = model.config.feat_extract_norm == 'layer'
+    dummy_input = torch.zeros(1, 16000)
+    inputs = (dummy_input, torch.ones(1, 16000, dtype=torch.long)) if use_attention_mask else (dummy_input,)
+    input_names = ['input_values', 'attention_mask'] if use_attention_mask else ['input_values']
+    dynamic_axes = {name: {0: 'batch', 1: 'samples'} for name in input_names}
+    dynamic_axes['logits'] = {0: 'batch', 1: 'frames'}
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, input_values, attention_mask=None):
+            return self.wrapped(input_values, attention_mask=attention_mask).logits
+
+    # The wrapper must be in eval mode too: the exporter restores the wrapper's
+    # training flag afterwards, which would otherwise switch `model` to training.
+    with torch.no_grad():
+        torch.onnx.export(LogitsOnly(model).eval(), inputs, output_path,
+                          input_names=input_names, output_names=['logits'],
+                          dynamic_axes=dynamic_axes, opset_version=opset, dynamo=False)
+    return output_path
+
+
+def max_logit_difference(backend_a, backend_b, waveforms, processor):
+    """Largest absolute logit difference and argmax agreement between two backends."""
+    inputs = processor(waveforms, sampling_rate=16000, return_tensors='pt',
+                       padding=True, return_attention_mask=True)
+    attention_mask = inputs.attention_mask if backend_a.config.feat_extract_norm == 'layer' else None
+    logits_a = backend_a.logits(inputs.input_values, attention_mask)
+    logits_b = backend_b.logits(inputs.input_values, attention_mask)
+    difference = (logits_a - logits_b).abs().max().item()
+    same_tokens = bool(torch.equal(logits_a.argmax(-1), logits_b.argmax(-1)))
+    return difference, same_tokens
+
+
+def create_onnx_backend(model_path, config):
+    path = onnx_model_path(model_path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found; run 'manage.py export_onnx' first")
+    # Without an explicit setting, follow the worker's share of the CPUs (see topology.py)
+    return OnnxBackend(path, config,
+                       intra_op_threads=settings.ONNX_INTRA_OP_THREADS or torch.get_num_threads(),
+                       inter_op_threads=settings.ONNX_INTER_OP_THREADS)
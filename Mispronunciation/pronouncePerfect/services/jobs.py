@@ -0,0 +1,234 @@
+"""
+Background transcription jobs.
+
+Views hand the uploaded audio to `job_queue.submit()`, which spools it to a temporary
+file, stores a TranscriptionJob row and runs decode + inference + comparison in a local
+worker pool (processes by default, so a busy model does not hold a web worker). Clients
+poll the job until it is done. The number of unfinished jobs per web process is capped;
+beyond that `submit()` raises QueueFull and the view answers 429.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import logging
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_SETTINGS = {
+    'EXECUTOR': 'process',
+    'WORKERS': 2,
+    'MAX_QUEUE_DEPTH': 16,
+    'MAX_WAIT_S': 30,
+}
+
+
+def job_settings():
+    return {**DEFAULT_JOB_SETTINGS, **getattr(settings, 'TRANSCRIPTION_JOBS', {})}
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _init_worker():
+    # Spawned worker processes start without Django configured
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Mispronunciation.settings')
+    import django
+    django.setup()
+
+
+def run_job(job_id, audio_path, language, text):
+    """Runs in the worker pool. Returns the job outcome and per-stage timings."""
+    from pronouncePerfect.models import TranscriptionJob
+    from .audio_processing import decode_audio_path, transcribe_decoded
+    from .text_analysis import compare_transcription
+
+    started_at = timezone.now()
+    TranscriptionJob.objects.filter(pk=job_id).update(status='running', started_at=started_at)
+    timings = {}
+
+    start = time.perf_counter()
+    waveform = decode_audio_path(audio_path)
+    timings['decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transcription = transcribe_decoded(waveform, language, text or None)
+    timings['transcription'] = time.perf_counter() - start
+
+    result = None
+    if text:
+        start = time.perf_counter()
+        result = compare_transcription(transcription, text, language)
+        timings['comparison'] = time.perf_counter() - start
+
+    return {
+        'transcription': transcription,
+        'result': result,
+        'timings': timings,
+        'started_at': started_at,
+    }
+
+
+class JobQueue:
+    def __init__(self):
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                config = job_settings()
+                if config['EXECUTOR'] == 'thread':
+                    self._executor = ThreadPoolExecutor(max_workers=config['WORKERS'],
+                                                        thread_name_prefix='transcription-job')
+                else:
+                    # spawn, not fork: forking a process that already runs torch threads can deadlock
+                    self._executor = ProcessPoolExecutor(max_workers=config['WORKERS'],
+                                                         mp_context=multiprocessing.get_context('spawn'),
+                                                         initializer=_init_worker)
+            return self._executor
+
+    def _submit(self, *args):
+        """
+        Submits run_job to the pool. A process pool whose worker died is broken for good,
+        so it is replaced once and the submission retried.
+        """
+        executor = self._get_executor()
+        try:
+            return executor.submit(run_job, *args)
+        except BrokenExecutor:
+            logger.warning("Transcription job pool is broken (a worker died); starting a new one")
+            with self._executor_lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            return self._get_executor().submit(run_job, *args)
+
+    @property
+    def depth(self):
+        return self._pending
+
+    def submit(self, audio_file, language, text=''):
+        """
+        Creates a job for an uploaded file and queues it.
+        Raises QueueFull when MAX_QUEUE_DEPTH jobs are already unfinished.
+        """
+        from pronouncePerfect.models import TranscriptionJob
+        from .audio_processing import spool_audio_file
+
+        with self._lock:
+            if self._pending >= job_settings()['MAX_QUEUE_DEPTH']:
+                raise QueueFull(f"{self._pending} jobs already queued")
+            self._pending += 1
+
+        audio_path = job = None
+        try:
+            # The worker reads the audio from disk: uploads are never held in memory or pickled
+            start = time.perf_counter()
+            audio_path = spool_audio_file(audio_file)
+            upload_time = time.perf_counter() - start
+
+            job = TranscriptionJob.objects.create(language=language, text=text,
+                                                  timings={'upload': upload_time})
+            future = self._submit(job.pk, audio_path, language, text)
+        except Exception as e:
+            with self._lock:
+                self._pending -= 1
+            if audio_path:
+                os.remove(audio_path)
+            if job is not None:
+                # Nothing will ever run it: do not leave pollers waiting on a queued job
+                TranscriptionJob.objects.filter(pk=job.pk).update(
+                    status='failed', error=f"Could not queue the job: {e}", finished_at=timezone.now())
+            raise
+
+        submitted_at = time.perf_counter()
+        # A future that is already done runs the callback right here, in the request thread
+        request_thread = threading.current_thread()
+        future.add_done_callback(lambda f: self._finish(
+            job.pk, f, submitted_at, audio_path, on_pool_thread=threading.current_thread() is not request_thread))
+        return job
+
+    def _finish(self, job_id, future, submitted_at, audio_path, on_pool_thread=True):
+        """Done callback (normally on a pool thread): stores the outcome, or marks the job failed."""
+        from pronouncePerfect.models import TranscriptionJob
+
+        with self._lock:
+            self._pending -= 1
+        try:
+            os.remove(audio_path)
+        except OSError:
+            pass
+        try:
+            self._save_outcome(job_id, future, submitted_at)
+        except Exception as e:
+            logger.exception(f"Could not store the outcome of transcription job {job_id}: {e}")
+            try:
+                TranscriptionJob.objects.filter(pk=job_id).update(
+                    status='failed', error=f"Could not store the result: {e}", finished_at=timezone.now())
+            except Exception:
+                logger.exception(f"Could not mark transcription job {job_id} as failed")
+        finally:
+            if on_pool_thread and not connection.in_atomic_block:
+                # Pool threads are not request threads: nothing else closes their connection
+                connection.close()
+
+    @staticmethod
+    def _save_outcome(job_id, future, submitted_at):
+        from pronouncePerfect.models import TranscriptionJob
+
+        job = TranscriptionJob.objects.get(pk=job_id)
+        job.finished_at = timezone.now()
+        try:
+            outcome = future.result()
+        except Exception as e:
+            logger.exception(f"Transcription job {job_id} failed: {e}")
+            job.status, job.error = 'failed', str(e)
+            job.timings['total'] = time.perf_counter() - submitted_at
+        else:
+            job.status = 'done'
+            job.transcription = outcome['transcription']
+            job.result = outcome['result']
+            job.started_at = outcome['started_at']
+            job.timings['queue_wait'] = (job.started_at - job.created_at).total_seconds()
+            job.timings.update(outcome['timings'])
+            job.timings['total'] = time.perf_counter() - submitted_at
+        job.save()
+
+
+def job_to_dict(job):
+    return {
+        'job_id': str(job.pk),
+        'status': job.status,
+        'language': job.language,
+        'transcription': job.transcription,
+        'result': job.result,
+        'error': job.error,
+        'timings': {stage: round(seconds, 4) for stage, seconds in job.timings.items()},
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def wait_for_job(job_id, timeout):
+    """Long-poll helper: returns the job once finished or after `timeout` seconds."""
+    from pronouncePerfect.models import TranscriptionJob
+
+    deadline = time.monotonic() + min(timeout, job_settings()['MAX_WAIT_S'])
+    while True:
+        job = TranscriptionJob.objects.get(pk=job_id)
+        if job.status in ('done', 'failed') or time.monotonic() >= deadline:
+            return job
+        time.sleep(0.25)
+
+
+job_queue = JobQueue()
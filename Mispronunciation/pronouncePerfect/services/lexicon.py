@@ -0,0 +1,127 @@
+"""
+Compiled Nepali lexicon: a sorted string table in one binary file. It is memory-mapped
+read-only, so opening it is instant and all worker processes share the same pages of the
+OS page cache instead of each building its own trie. Build it with 'manage.py build_lexicon'.
+
+Layout (little-endian, sections 8-byte aligned):
+    header   magic, word count, longest word (characters), unknown-cluster cost, section offsets
+    offsets  uint32[count + 1]   start of each word in the strings section
+    costs    float64[count]      -log(relative frequency) of each word
+    strings  UTF-8 words sorted bytewise, concatenated
+"""
+import math
+import mmap
+import os
+import sys
+from array import array
+import struct
+
+MAGIC = b'NPLEX\x00\x01\x00'
+HEADER = struct.Struct('<8sIIdQQQ')
+
+
+def _align(position):
+    return (position + 7) & ~7
+
+
+def is_compiled_lexicon(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_lexicon(counts, path):
+    """
+    Writes a compiled lexicon for a dict of word -> count. The file is replaced atomically,
+    so processes that still map the old file keep reading it.
+    Returns: number of words written
+    """
+    # Code point order is UTF-8 byte order
+    words = sorted(word for word in counts if word)
+    total = sum(counts[word] for word in words) or 1
+    costs = array('d', (-math.log(counts[word] / total) for word in words))
+    encoded = [word.encode('utf-8') for word in words]
+    offsets = array('I', [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    if sys.byteorder == 'big':
+        costs.byteswap()
+        offsets.byteswap()
+
+    offsets_pos = _align(HEADER.size)
+    costs_pos = _align(offsets_pos + len(offsets) * offsets.itemsize)
+    strings_pos = _align(costs_pos + len(costs) * costs.itemsize)
+    header = HEADER.pack(MAGIC, len(words), max((len(word) for word in words), default=0),
+                         max(costs, default=0.0) + 1.0, offsets_pos, costs_pos, strings_pos)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        for position, data in ((0, header), (offsets_pos, offsets.tobytes()), (costs_pos, costs.tobytes()),
+                               (strings_pos, b''.join(encoded))):
+            f.write(b'\0' * (position - f.tell()))
+            f.write(data)
+    os.replace(temporary_path, path)
+    return len(words)
+
+
+class CompiledLexicon:
+    """
+    Read-only view of a compiled lexicon file. Same interface as segment_nepali_text.WordTrie:
+    `prefixes()`, `in`, `len()`, `max_length` and `unknown_cost`.
+    """
+
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError("Compiled lexicons can only be mapped on little-endian machines")
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.size, self.max_length, self.unknown_cost,
+         offsets_pos, costs_pos, self._strings_pos) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled lexicon")
+        self.path = path
+        view = memoryview(self._mmap)
+        self._offsets = view[offsets_pos:offsets_pos + 4 * (self.size + 1)].cast('I')
+        self._costs = view[costs_pos:costs_pos + 8 * self.size].cast('d')
+
+    def __len__(self):
+        return self.size
+
+    def _word(self, index):
+        return self._mmap[self._strings_pos + self._offsets[index]:self._strings_pos + self._offsets[index + 1]]
+
+    def _lower_bound(self, key, lo, hi):
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __contains__(self, word):
+        key = word.encode('utf-8')
+        index = self._lower_bound(key, 0, self.size)
+        return index < self.size and self._word(index) == key
+
+    def words(self):
+        for index in range(self.size):
+            yield self._word(index).decode('utf-8')
+
+    def prefixes(self, text, start=0):
+        """Yields (end, cost) for every word equal to text[start:end]."""
+        lo, hi = 0, self.size
+        prefix = b''
+        for end in range(start, min(len(text), start + self.max_length)):
+            prefix += text[end].encode('utf-8')
+            # Words starting with `prefix` form one sorted range; 0xff never occurs in UTF-8
+            lo = self._lower_bound(prefix, lo, hi)
+            hi = self._lower_bound(prefix + b'\xff', lo, hi)
+            if lo == hi:
+                return
+            if self._word(lo) == prefix:
+                yield end + 1, self._costs[lo]
+
+    def close(self):
+        self._offsets.release()
+        self._costs.release()
+        self._mmap.close()
@@ -0,0 +1,190 @@
+"""
+Per-stage latency instrumentation.
+
+Code wraps each pipeline stage in `span(stage)`. Every span is recorded in a
+process-wide histogram, exported with the model/transcription cache counters and queue
+depths in the Prometheus text format by the /metrics view. While a request runs with the
+debug header (see TimingsMiddleware), its spans are also summed per stage and attached to
+the JSON response as `timings`.
+
+Stages: upload (spooling an upload to disk), audio_decode, resample, model_load, forward
+(the model's forward pass), batched_forward (waiting for the batch scheduler's forward
+pass), ctc_decode, comparison, alignment. Background jobs running in worker processes
+record their spans in those processes, not in the web process's /metrics.
+"""
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_METRICS = {
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+    'DEBUG_HEADER': 'X-Debug-Timings',
+}
+
+
+def metrics_settings():
+    return {**DEFAULT_METRICS, **getattr(settings, 'METRICS', {})}
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label value, as Prometheus expects it."""
+
+    def __init__(self, name, help_text, label, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, seconds):
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {value: list(series) for value, series in self._series.items()}
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for value, series in sorted(self.snapshot().items()):
+            label = f'{self.label}="{value}"'
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series[-2]}')
+            lines.append(f'{self.name}_sum{{{label}}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{label}}} {series[-2]}')
+        return lines
+
+
+stage_seconds = Histogram('pronounce_stage_seconds', "Time spent per pipeline stage.", 'stage',
+                          metrics_settings()['BUCKETS'])
+request_seconds = Histogram('pronounce_request_seconds', "Time to answer a request, per view.", 'view',
+                            metrics_settings()['BUCKETS'])
+
+# Per-stage totals of the request being served, when it asked for them
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+@contextmanager
+def span(stage):
+    """Times the enclosed block as one occurrence of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def record(stage, seconds):
+    """Records `seconds` spent in `stage` (for stages not timed with span())."""
+    stage_seconds.observe(stage, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def collect_timings():
+    """Sums the spans of the enclosed block per stage into the yielded dict."""
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def _gauge(name, help_text, kind, samples):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        label_text = '{' + ','.join(f'{key}="{val}"' for key, val in labels.items()) + '}' if labels else ''
+        lines.append(f"{name}{label_text} {value}")
+    return lines
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    from .batching import batching_enabled, get_batch_scheduler
+    from .jobs import job_queue
+    from .model_registry import model_registry
+    from .transcription_cache import transcription_cache
+
+    lines = stage_seconds.render() + request_seconds.render()
+
+    models = model_registry.stats()
+    lines += _gauge('pronounce_model_loads_total', "Models read from disk.", 'counter', [({}, models['loads'])])
+    lines += _gauge('pronounce_model_hits_total', "Requests served by an already loaded model.", 'counter',
+                    [({'language': language}, model['hits']) for language, model in models['models'].items()])
+    lines += _gauge('pronounce_model_load_seconds', "Time it took to load each model.", 'gauge',
+                    [({'language': language}, model['load_time_s']) for language, model in models['models'].items()])
+
+    cache = transcription_cache.stats()
+    lines += _gauge('pronounce_transcription_cache_hits_total', "Transcription cache hits.", 'counter',
+                    [({}, cache['hits'])])
+    lines += _gauge('pronounce_transcription_cache_misses_total', "Transcription cache misses.", 'counter',
+                    [({}, cache['misses'])])
+
+    lines += _gauge('pronounce_job_queue_depth', "Unfinished background jobs of this process.", 'gauge',
+                    [({}, job_queue.depth)])
+    if batching_enabled():
+        queued = get_batch_scheduler().stats()['queued']
+        lines += _gauge('pronounce_batch_queue_depth', "Requests waiting for a batched forward pass.", 'gauge',
+                        [({'language': language}, depth) for language, depth in queued.items()])
+    return '\n'.join(lines) + '\n'
+
+
+class TimingsMiddleware:
+    """
+    Records the duration of every request per view. With the debug header
+    (settings.METRICS['DEBUG_HEADER']) set, adds a `timings` object with the seconds spent
+    in each stage (and in total) to JSON object responses.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = metrics_settings()['DEBUG_HEADER']
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        if not request.headers.get(self.header):
+            response = self.get_response(request)
+            self._observe(request, time.perf_counter() - start)
+            return response
+
+        with collect_timings() as timings:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        self._observe(request, total)
+        if response.get('Content-Type', '').startswith('application/json') and not response.streaming:
+            try:
+                payload = json.loads(response.content)
+            except ValueError:
+                return response
+            if isinstance(payload, dict):
+                timings = {**{stage: round(seconds, 4) for stage, seconds in timings.items()}, 'total': round(total, 4)}
+                # Job responses already have their own 'timings'
+                payload['request_timings' if 'timings' in payload else 'timings'] = timings
+                response.content = json.dumps(payload)
+        return response
+
+    @staticmethod
+    def _observe(request, seconds):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.url_name:
+            request_seconds.observe(match.url_name, seconds)
@@ -0,0 +1,196 @@
+import threading
+import time
+import logging
+
+from django.conf import settings
+
+from .metrics import record
+from .topology import configure_torch
+
+# torch, transformers and the inference backends are imported where models are loaded or
+# run: the registry's counters are read by /metrics and /api/model-status/, which must not
+# load the ML stack
+
+logger = logging.getLogger(__name__)
+
+# Language code -> name of the settings attribute holding the model directory
+MODEL_DIR_SETTINGS = {
+    'eng': 'MODEL_DIR',
+    'np': 'NEP_MODEL_DIR',
+}
+
+
+def get_model_path(language):
+    """Returns the checkpoint directory configured for `language`."""
+    if language not in MODEL_DIR_SETTINGS:
+        raise ValueError(f"Model language '{language}' not defined.")
+    return getattr(settings, MODEL_DIR_SETTINGS[language])
+
+
+def backend_name(language):
+    """Inference backend configured for `language` in ASR_BACKENDS ('torch' by default)."""
+    return getattr(settings, 'ASR_BACKENDS', {}).get(language, 'torch')
+
+
+def quantize_model(model):
+    """Dynamic int8 quantization of the Linear layers (weights stored as int8, activations quantized on the fly)."""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class LoadedModel:
+    """A processor and inference backend held by the registry, with its usage counters."""
+
+    def __init__(self, language, processor, backend, load_time, quantized=False):
+        self.language = language
+        self.processor = processor
+        self.backend = backend
+        self.load_time = load_time
+        self.quantized = quantized
+        self.loaded_at = time.time()
+        self.hits = 0
+
+    @property
+    def model(self):
+        """The PyTorch model, or None when running on ONNX Runtime."""
+        return getattr(self.backend, 'model', None)
+
+    @property
+    def memory_bytes(self):
+        """Bytes taken by the model's weights and buffers."""
+        return self.backend.memory_bytes()
+
+    def stats(self):
+        return {
+            'load_time_s': round(self.load_time, 3),
+            'memory_mb': round(self.memory_bytes / (1024 * 1024), 1),
+            'backend': self.backend.name,
+            'quantized': self.quantized,
+            'hits': self.hits,
+            'loaded_at': self.loaded_at,
+        }
+
+
+def load_model(language, quantized=None, backend=None):
+    """
+    Reads the processor and model for `language` from disk and wraps the model in the
+    inference backend configured in ASR_BACKENDS ('torch' or 'onnx'), or in `backend`.
+    `quantized` defaults to whether the language is listed in ASR_QUANTIZED_LANGUAGES;
+    it only applies to the torch backend.
+    """
+    from transformers import Wav2Vec2Config, Wav2Vec2ForCTC, Wav2Vec2Processor
+
+    from .inference_backends import TorchBackend, create_onnx_backend
+    from .weight_sharing import map_model_weights
+
+    configure_torch()
+    backend = backend or backend_name(language)
+    if quantized is None:
+        quantized = backend == 'torch' and language in getattr(settings, 'ASR_QUANTIZED_LANGUAGES', [])
+    model_path = get_model_path(language)
+    logger.info(f"Loading '{language}' model from {model_path} ({backend}{', int8' if quantized else ''})")
+    start = time.perf_counter()
+    processor = Wav2Vec2Processor.from_pretrained(model_path)
+    if backend == 'onnx':
+        inference = create_onnx_backend(model_path, Wav2Vec2Config.from_pretrained(model_path))
+    else:
+        model = Wav2Vec2ForCTC.from_pretrained(model_path)
+        model.eval()
+        if quantized:
+            model = quantize_model(model)
+        elif getattr(settings, 'ASR_MMAP_WEIGHTS', False):
+            # Quantized weights are new tensors; only fp32 weights can point at the checkpoint
+            map_model_weights(model, model_path)
+        inference = TorchBackend(model)
+    load_time = time.perf_counter() - start
+    record('model_load', load_time)
+    logger.info(f"Loaded '{language}' model in {load_time:.2f}s")
+    return LoadedModel(language, processor, inference, load_time, quantized)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of Wav2Vec2 models keyed by language.
+    Each model is read from disk once, on first use (or at warm-up), and shared
+    by every request thread afterwards. Loading is guarded by a per-language
+    lock so concurrent first requests do not load the same checkpoint twice.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _load_lock(self, language):
+        with self._lock:
+            return self._load_locks.setdefault(language, threading.Lock())
+
+    def _get_or_load(self, language):
+        loaded = self._models.get(language)
+        if loaded is None:
+            with self._load_lock(language):
+                loaded = self._models.get(language)
+                if loaded is None:
+                    loaded = load_model(language)
+                    with self._lock:
+                        self.loads += 1
+                        self._models[language] = loaded
+        return loaded
+
+    def get(self, language):
+        """
+        Returns the LoadedModel for `language`, loading it on first use.
+        Raises ValueError for unknown languages and propagates loading errors.
+        """
+        loaded = self._get_or_load(language)
+        with self._lock:
+            loaded.hits += 1
+        return loaded
+
+    def is_loaded(self, language):
+        return language in self._models
+
+    def warm_up(self, languages):
+        """Loads the models for `languages` and runs one dummy forward pass each."""
+        import torch
+
+        for language in languages:
+            try:
+                loaded = self._get_or_load(language)
+                loaded.backend.logits(torch.zeros(1, 16000))
+            except Exception as e:
+                logger.exception(f"Warm-up failed for '{language}' model: {e}")
+
+    def preload(self, languages):
+        """
+        Loads the models for `languages` without running them, in a process about to fork
+        its workers: no torch thread pool is started, and the loaded objects are frozen so
+        the workers share their pages (see weight_sharing.py).
+        """
+        from .weight_sharing import freeze_for_fork
+
+        for language in languages:
+            try:
+                self._get_or_load(language)
+            except Exception as e:
+                logger.exception(f"Preloading failed for '{language}' model: {e}")
+        freeze_for_fork()
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        with self._lock:
+            models = dict(self._models)
+            loads = self.loads
+        return {
+            'loads': loads,
+            'hits': sum(loaded.hits for loaded in models.values()),
+            'models': {language: loaded.stats() for language, loaded in models.items()},
+        }
+
+
+model_registry = ModelRegistry()
@@ -1,10 +1,24 @@
 import re
-import difflib
 from indicnlp.tokenize import indic_tokenize
-from indicnlp.normalize import indic_normalize
 import unicodedata
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
 
-import re
+import numpy as np
+from django.conf import settings
+
+from .word_alignment import align_words, edit_distance_costs
+
+logger = logging.getLogger(__name__)
+
+# Bound for the per-word memoization caches used by the comparer
+WORD_CACHE_SIZE = 65536
 
 def generate_schwa_variations(word):
     """
@@ -41,16 +55,16 @@ def generate_schwa_variations(word):
     return variations
 
 
-def check_honorific_equivalence(word1, word2):
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def schwa_variation_set(word):
+    """Memoized, immutable form of generate_schwa_variations for membership tests"""
+    return frozenset(generate_schwa_variations(word))
+
+
+def check_honorific_equivalence(word1, word2, honorific_suffixes=None):
     """Check if two words are honorific equivalents using suffix patterns"""
-    # Common honorific suffix replacements
-    honorific_suffixes = {
-        'छु': ['छौं', 'छौ', 'छ'],
-        'छौ': ['छ', 'छन्', 'छौं'],
-        'न्छ': ['न्छौ', 'न्छन्', 'न्छु'],
-        'नुहोस्': ['', 'नु', 'न'],
-        # Add more common patterns
-    }
+    if honorific_suffixes is None:
+        honorific_suffixes = get_rules().honorific_suffixes
     
     # Check if any suffix replacement would make the words match
     for base_suffix, variants in honorific_suffixes.items():
@@ -67,26 +81,11 @@ def check_honorific_equivalence(word1, word2):
     
     return False
 
-# dictionary that maps Devanagari characters to their "phonetic representatives" based on similar sound classes.
-# This groups characters that sound similar (e.g., aspirated and unaspirated versions of the same consonant) into a single representative character.
-sound_classes = {
-    # Similar sounding sibilants
-    'श': 'स',
-    'ष': 'स',
-    'स': 'स', 
-
-     # Voiced labials 
-    'व': 'ब',
-    'ब': 'ब',   
-
-    # Aspirated vs. non-aspirated
-    'क': 'क', 
-    'ख': 'क',   
-    'ग': 'ग', 
-    'घ': 'ग'
-}
-def get_nepali_phonetic_code(word):
+
+def get_nepali_phonetic_code(word, sound_classes=None):
     """Generate a simplified phonetic code for Nepali words"""
+    if sound_classes is None:
+        sound_classes = get_rules().sound_classes
     # Replace characters with their phonetic equivalents
     phonetic = ''
     for char in word:
@@ -98,86 +97,269 @@ def are_potential_homophones(word1, word2):
     """Check if two words could be homophones based on phonetic similarity"""
     return get_nepali_phonetic_code(word1) == get_nepali_phonetic_code(word2)
 
-def normalize_aakar(text):
-    # Common patterns where short/long forms are interchanged
-    patterns = {
-        'छन्': ['छान्'],
-        'गर्न': ['गार्न'],
-        'भन्': ['भान्'],
-        # Add more patterns
-    }
-    
-    # Apply replacements
+
+# Everything are_equivalent needs to know about one word, computed once per word
+WordForms = namedtuple('WordForms', ['word', 'lower', 'schwa_variations', 'honorific_forms', 'listed_forms',
+                                     'phonetic_code'])
+
+
+def forms_equivalent(forms1, forms2):
+    """are_equivalent on precomputed WordForms: only hash/set lookups"""
+    return (forms1.lower == forms2.lower
+            or forms2.word in forms1.schwa_variations or forms1.word in forms2.schwa_variations
+            or forms2.word in forms1.honorific_forms or forms1.word in forms2.honorific_forms
+            or forms2.word in forms1.listed_forms
+            or forms1.phonetic_code == forms2.phonetic_code)
+
+
+def equivalence_mask(forms, first, second):
+    """
+    forms_equivalent(forms[first[k]], forms[second[k]]) for all k at once: the variant sets
+    are expanded once per word instead of once per pair.
+    """
+    first, second = np.asarray(first, dtype=np.int64), np.asarray(second, dtype=np.int64)
+    size = len(forms)
+    index = {item.word: i for i, item in enumerate(forms)}
+    variant_pairs = []
+    for i, item in enumerate(forms):
+        for variant in item.schwa_variations | item.honorific_forms | item.listed_forms:
+            j = index.get(variant)
+            if j is not None:
+                variant_pairs += [i * size + j, j * size + i]
+
+    def interned(values):
+        ids = {}
+        return np.array([ids.setdefault(value, len(ids)) for value in values], dtype=np.int64)
+
+    lower, code = interned(item.lower for item in forms), interned(item.phonetic_code for item in forms)
+    return (np.isin(first * size + second, variant_pairs)
+            | (lower[first] == lower[second]) | (code[first] == code[second]))
+
+
+def are_equivalent_uncached(word1, word2, rules=None):
+    """Reference implementation of NepaliTextComparer.are_equivalent (no caches, no index)"""
+    rules = rules or get_rules()
+    if word1.lower() == word2.lower():
+        return True
+    if word2 in generate_schwa_variations(word1) or word1 in generate_schwa_variations(word2):
+        return True
+    if check_honorific_equivalence(word1, word2, rules.honorific_suffixes):
+        return True
+    if word2 in rules.equivalence_map.get(word1, ()):
+        return True
+    return (get_nepali_phonetic_code(word1, rules.sound_classes)
+            == get_nepali_phonetic_code(word2, rules.sound_classes))
+
+
+# ----- Linguistic rule tables -----
+# The comparer's tables live in a versioned JSON file (pronouncePerfect/data/nepali_rules.json)
+# so they can be extended without code changes:
+#   schwa_variations, homophones, honorific_equivalents: word -> equivalent spellings; every
+#     word of an entry (key included) matches every other one
+#   honorific_suffixes: suffix -> suffixes it can be replaced with
+#   sound_classes: Devanagari character -> "phonetic representative" of its sound class
+#     (e.g. aspirated and unaspirated versions of the same consonant map to one character)
+
+RULES_FORMAT = 1
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'data', 'nepali_rules.json')
+RULE_TABLES = ('schwa_variations', 'homophones', 'honorific_equivalents', 'honorific_suffixes', 'sound_classes')
+
+
+def _freeze(table):
+    return MappingProxyType({key: tuple(values) for key, values in table.items()})
+
+
+class NepaliRules:
+    """
+    One immutable version of the rule tables. Per-word results are memoized on the
+    instance, so swapping in new tables never serves results computed from old ones.
+    """
+
+    def __init__(self, data, source=None):
+        if data.get('format') != RULES_FORMAT:
+            raise ValueError(f"Unsupported rules format {data.get('format')!r}, expected {RULES_FORMAT}")
+        missing = [name for name in RULE_TABLES if name not in data]
+        if missing:
+            raise ValueError(f"Missing rule tables: {', '.join(missing)}")
+        if any(len(char) != 1 for char in data['sound_classes']):
+            raise ValueError("sound_classes keys must be single characters")
+
+        self.version = str(data.get('version', ''))
+        self.source = source
+        self.schwa_variations = _freeze(data['schwa_variations'])
+        self.homophones = _freeze(data['homophones'])
+        self.honorific_equivalents = _freeze(data['honorific_equivalents'])
+        self.honorific_suffixes = _freeze(data['honorific_suffixes'])
+        self.sound_classes = MappingProxyType(dict(data['sound_classes']))
+        self._phonetic_table = str.maketrans(dict(self.sound_classes))
+
+        # Every listed word -> all words sharing a table entry with it (symmetric)
+        equivalence_map = {}
+        for base, variants in [*self.schwa_variations.items(),
+                               *self.homophones.items(),
+                               *self.honorific_equivalents.items()]:
+            group = {base, *variants}
+            for word in group:
+                equivalence_map.setdefault(word, set()).update(group)
+        self.equivalence_map = MappingProxyType({word: frozenset(group)
+                                                 for word, group in equivalence_map.items()})
+
+        self.word_forms = lru_cache(maxsize=WORD_CACHE_SIZE)(self._word_forms)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), source=str(path))
+
+    def phonetic_code(self, word):
+        """Same result as get_nepali_phonetic_code(word, self.sound_classes)"""
+        return word.translate(self._phonetic_table)
+
+    def honorific_forms(self, word):
+        """
+        All words reachable from `word` by one honorific suffix replacement.
+        check_honorific_equivalence(a, b) == (b in honorific_forms(a) or a in honorific_forms(b))
+        """
+        forms = set()
+        for base_suffix, variants in self.honorific_suffixes.items():
+            if word.endswith(base_suffix):
+                stem = word[:-len(base_suffix)]
+                forms.update(stem + variant for variant in variants)
+        return frozenset(forms)
+
+    def _word_forms(self, word):
+        return WordForms(word, word.lower(), schwa_variation_set(word), self.honorific_forms(word),
+                         self.equivalence_map.get(word, frozenset()), self.phonetic_code(word))
+
+
+_rules = None
+_rules_mtime = None
+_rules_checked_at = 0.0
+_rules_lock = threading.Lock()
+
+
+def rules_file():
+    return str(getattr(settings, 'NEPALI_RULES_FILE', DEFAULT_RULES_FILE))
+
+
+def get_rules():
+    """
+    The current rule tables. Every NEPALI_RULES_RELOAD_INTERVAL_S seconds the data file
+    is checked for changes and reloaded if it was modified.
+    """
+    rules = _rules
+    interval = getattr(settings, 'NEPALI_RULES_RELOAD_INTERVAL_S', 0)
+    if rules is None or (interval and time.monotonic() - _rules_checked_at >= interval):
+        rules = reload_rules(force=False)
+    return rules
+
+
+def reload_rules(force=True):
+    """
+    Loads the rule tables and swaps them in atomically; comparisons already running keep
+    the tables they started with. If the file is invalid the current tables stay in place.
+    """
+    global _rules, _rules_mtime, _rules_checked_at
+
+    with _rules_lock:
+        _rules_checked_at = time.monotonic()
+        path = rules_file()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if not force and _rules is not None and mtime == _rules_mtime:
+                return _rules
+            rules = NepaliRules.from_file(path)
+        except Exception as e:
+            if _rules is None:
+                raise
+            logger.error(f"Could not reload Nepali rules from {path}, keeping version {_rules.version}: {e}")
+            return _rules
+
+        _rules, _rules_mtime = rules, mtime
+        logger.info(f"Loaded Nepali rules version {rules.version} from {path}")
+        return rules
+
+
+# Common patterns where short/long forms are interchanged
+AAKAR_PATTERNS = {
+    'छन्': ['छान्'],
+    'गर्न': ['गार्न'],
+    'भन्': ['भान्'],
+    # Add more patterns
+}
+
+# Words commonly mistranscribed with incorrect i/ī length
+IKAR_REPLACEMENTS = {
+    'ठिक': ['ठीक'],
+    'दिन': ['दीन'],
+    'शिक्षा': ['शीक्षा'],
+    # Add more based on common errors
+}
+
+# Words commonly mistranscribed with incorrect u/ū length
+UKAR_REPLACEMENTS = {
+    'पुर्ण': ['पूर्ण'],
+    'सुचना': ['सूचना'],
+    'शुरु': ['शुरू'],
+    # Add more based on common errors
+}
+
+# Standardize nasal marks (अनुस्वार ं vs चन्द्रबिन्दु ँ); often confused in transcription
+NASAL_PATTERNS = {
+    'हुँदै': ['हुंदै'],
+    'मैं': ['मैँ'],
+    'तिमीँ': ['तिमीं'],
+    # Add more patterns
+}
+
+# Standardize visarga use (ः); often incorrectly transcribed or omitted
+VISARGA_PATTERNS = {
+    'अतः': ['अत'],
+    'प्रायः': ['प्राय'],
+    'विशेषतः': ['विशेषत'],
+    # Add more patterns
+}
+
+# Context-aware consonant rules, applied in order
+CONSONANT_RULES = [
+    # Rule 1: 'व' → 'ब' when followed by a vowel sign
+    (re.compile(r'व([ा-ौ])'), r'ब\1'),
+    # Rule 2: 'ष' or 'स' → 'श' at word start or between consonants
+    (re.compile(r'(\b|[क-ह])स([क-ह]|\b)'), r'\1श\2'),
+    (re.compile(r'(\b|[क-ह])ष([क-ह]|\b)'), r'\1श\2'),
+    # Rule 3: 'क्ष' → 'छ्य' in isolation
+    (re.compile(r'\bक्ष\b'), r'छ्य'),
+    # Rule 4: 'ज्ञ' → 'ग्य' in isolation
+    (re.compile(r'\bज्ञ\b'), r'ग्य'),
+    # Additional simple replacement: 'व' → 'ब' as a whole word (fallback if not caught by vowel rule)
+    (re.compile(r'\bव\b'), r'ब'),
+]
+
+DIGIT_MAP = {'0': '०', '1': '१', '2': '२', '3': '३', '4': '४',
+             '5': '५', '6': '६', '7': '७', '8': '८', '9': '९'}
+
+
+def _replace_variants(text, patterns):
     for standard, variants in patterns.items():
         for variant in variants:
             text = text.replace(variant, standard)
-    
     return text
 
+def normalize_aakar(text):
+    return _replace_variants(text, AAKAR_PATTERNS)
+
 def normalize_ikar(text):
-    # Words commonly mistranscribed with incorrect i/ī length
-    replacements = {
-        'ठिक': ['ठीक'],
-        'दिन': ['दीन'],
-        'शिक्षा': ['शीक्षा'],
-        # Add more based on common errors
-    }
-    
-    for standard, variants in replacements.items():
-        for variant in variants:
-            text = text.replace(variant, standard)
-    
-    return text
+    return _replace_variants(text, IKAR_REPLACEMENTS)
 
 def normalize_ukar(text):
-    # Words commonly mistranscribed with incorrect u/ū length
-    replacements = {
-        'पुर्ण': ['पूर्ण'],
-        'सुचना': ['सूचना'],
-        'शुरु': ['शुरू'],
-        # Add more based on common errors
-    }
-    
-    for standard, variants in replacements.items():
-        for variant in variants:
-            text = text.replace(variant, standard)
-    
-    return text
+    return _replace_variants(text, UKAR_REPLACEMENTS)
 
 def normalize_nasal_marks(text):
-    # Standardize nasal marks (अनुस्वार ं vs चन्द्रबिन्दु ँ)
-    # Often these are confused in transcription
-    
-    # Define common patterns
-    patterns = {
-        'हुँदै': ['हुंदै'],
-        'मैं': ['मैँ'],
-        'तिमीँ': ['तिमीं'],
-        # Add more patterns
-    }
-    
-    for standard, variants in patterns.items():
-        for variant in variants:
-            text = text.replace(variant, standard)
-    
-    return text
+    return _replace_variants(text, NASAL_PATTERNS)
 
 def normalize_visarga(text):
-    # Standardize visarga use (ः)
-    # Often incorrectly transcribed or omitted
-    
-    patterns = {
-        'अतः': ['अत'],
-        'प्रायः': ['प्राय'],
-        'विशेषतः': ['विशेषत'],
-        # Add more patterns
-    }
-    
-    for standard, variants in patterns.items():
-        for variant in variants:
-            text = text.replace(variant, standard)
-    
-    return text
+    return _replace_variants(text, VISARGA_PATTERNS)
 
 def normalize_consonant_confusions(text):
     """
@@ -186,40 +368,20 @@ def normalize_consonant_confusions(text):
     Args:    text (str): Input text in Devanagari script
     Returns: str: Normalized text
     """
-    # Define replacement rules with context
-    rules = [
-        # Rule 1: 'व' → 'ब' when followed by a vowel sign
-        (r'व([ा-ौ])', r'ब\1'),
-        # Rule 2: 'ष' or 'स' → 'श' at word start or between consonants
-        (r'(\b|[क-ह])स([क-ह]|\b)', r'\1श\2'),
-        (r'(\b|[क-ह])ष([क-ह]|\b)', r'\1श\2'),
-        # Rule 3: 'क्ष' → 'छ्य' in isolation
-        (r'\bक्ष\b', r'छ्य'),
-        # Rule 4: 'ज्ञ' → 'ग्य' in isolation
-        (r'\bज्ञ\b', r'ग्य'),
-    ]
-    
-    # Additional simple replacements (no context needed)
-    simple_replacements = {
-        'व': 'ब',  # Fallback if not caught by vowel rule
-    }
-    # Apply context-aware rules
-    for pattern, replacement in rules:
-        text = re.sub(pattern, replacement, text)
-    # Apply simple replacements (optional, could be context-limited)
-    for variant, standard in simple_replacements.items():
-        text = re.sub(r'\b' + variant + r'\b', standard, text)
+    for pattern, replacement in CONSONANT_RULES:
+        text = pattern.sub(replacement, text)
     return text
 
-def normalize_nepali_text(text):
-        """Comprehensive Nepali text normalization"""
+def normalize_nepali_text_sequential(text):
+        """
+        Comprehensive Nepali text normalization, one pass per rule group.
+        Reference implementation for CompiledNepaliNormalizer (same output, slower).
+        """
         # Apply Unicode normalization first
         text = unicodedata.normalize('NFC', text)
         
         # Apply digit normalization
-        digit_map = {'0': '०', '1': '१', '2': '२', '3': '३', '4': '४', 
-                    '5': '५', '6': '६', '7': '७', '8': '८', '9': '९'}
-        for latin, devanagari in digit_map.items():
+        for latin, devanagari in DIGIT_MAP.items():
             text = text.replace(latin, devanagari)
         
         # Apply punctuation normalization
@@ -241,41 +403,109 @@ def normalize_nepali_text(text):
         text = normalize_consonant_confusions(text)
         
         return text.strip()
+
+
+def _overlaps(a, b):
+    """True if an occurrence of `a` and an occurrence of `b` can share characters."""
+    if a in b or b in a:
+        return True
+    return any(a.endswith(b[:k]) or b.endswith(a[:k]) for k in range(1, min(len(a), len(b))))
+
+
+class CompiledNepaliNormalizer:
+    """
+    Nepali normalization compiled once from the rule tables; same output as
+    normalize_nepali_text_sequential.
+
+    No rule can match across whitespace and `\\b` treats a space like the edge of
+    the string, so the text is split once and each distinct word is normalized on
+    its own and memoized. Per word:
+
+    - digits and '!' go through a single str.translate table;
+    - the variant → standard replacements are merged into alternation regexes.
+      Rules are grouped into stages such that, within a stage, no variant can
+      overlap another variant or an earlier rule's output, which makes one leftmost
+      scan equivalent to applying the rules one after another. With the current
+      tables only the visarga rules need a second stage;
+    - the context-aware consonant rules consume their neighbouring characters, so
+      merging them would change results; they stay as separate precompiled passes.
+    """
+
+    def __init__(self, replacement_tables, consonant_rules, digit_map, cache_size=65536):
+        self.table = str.maketrans({**digit_map, '!': '।'})
+        self.consonant_rules = list(consonant_rules)
+
+        rules = [(variant, standard)
+                 for table in replacement_tables
+                 for standard, variants in table.items()
+                 for variant in variants if variant]
+        self.stages = []
+        stage = []
+        for variant, standard in rules:
+            if any(_overlaps(variant, v) or _overlaps(variant, o) for v, o in stage):
+                self.stages.append(stage)
+                stage = []
+            stage.append((variant, standard))
+        if stage:
+            self.stages.append(stage)
+        self._compiled = [(re.compile('|'.join(re.escape(variant) for variant, _ in stage)), dict(stage))
+                          for stage in self.stages]
+
+        self.normalize_word = lru_cache(maxsize=cache_size)(self._normalize_word)
+
+    def _normalize_word(self, word):
+        word = word.translate(self.table)
+        for pattern, replacements in self._compiled:
+            word = pattern.sub(lambda match: replacements[match.group()], word)
+        for pattern, replacement in self.consonant_rules:
+            word = pattern.sub(replacement, word)
+        return word
+
+    def __call__(self, text):
+        text = unicodedata.normalize('NFC', text)
+        return ' '.join([self.normalize_word(word) for word in text.split()])
+
+
+compiled_normalizer = CompiledNepaliNormalizer(
+    [AAKAR_PATTERNS, IKAR_REPLACEMENTS, UKAR_REPLACEMENTS, NASAL_PATTERNS, VISARGA_PATTERNS],
+    CONSONANT_RULES,
+    DIGIT_MAP,
+)
+
+
+def normalize_nepali_text(text):
+    """Comprehensive Nepali text normalization (precompiled, see CompiledNepaliNormalizer)"""
+    return compiled_normalizer(text)
+
+
 class NepaliTextComparer:
-    def __init__(self):
-        # Initialize normalizer for Nepali
-        self.normalizer = indic_normalize.IndicNormalizerFactory().get_normalizer("ne")
-        
-        # Common pronunciation variations (schwa deletion patterns)
-        self.schwa_variations = {
-            # Examples of common schwa deletion patterns
-            'कमल': ['कमल', 'कम्ल'],
-            'पहिलो': ['पहिलो', 'पहिल्'],
-            # Add more common variations as needed
-        }
-        
-        # Common homophones
-        self.homophones = {
-            'छ': ['छ', 'च'],
-            'बाट': ['बाट', 'बात'],
-            # Add more homophones
-        }
-        
-        # Common honorific equivalents
-        self.honorific_equivalents = {
-            'हुन्छ': ['हुन्छ', 'हुन्छन्', 'हुन्छौ'],
-            'गर्छु': ['गर्छु', 'गर्छौं', 'गर्छौ'],
-            # Add more honorific variations
-        }
-        
-        # Build a reverse lookup for all variations
-        self.equivalence_map = {}
-        for base, variants in [*self.schwa_variations.items(), 
-                               *self.homophones.items(), 
-                               *self.honorific_equivalents.items()]:
-            for variant in variants:
-                self.equivalence_map[variant] = variants
+    def __init__(self, rules=None):
+        # Rule tables pinned to this comparer; None follows the shared, hot-reloaded tables
+        self._rules = rules
+    
+    @property
+    def rules(self):
+        return self._rules or get_rules()
+    
+    # Common pronunciation variations (schwa deletion patterns)
+    @property
+    def schwa_variations(self):
+        return self.rules.schwa_variations
     
+    # Common homophones
+    @property
+    def homophones(self):
+        return self.rules.homophones
+    
+    # Common honorific equivalents
+    @property
+    def honorific_equivalents(self):
+        return self.rules.honorific_equivalents
+    
+    # Reverse lookup for all variations
+    @property
+    def equivalence_map(self):
+        return self.rules.equivalence_map
     
     def tokenize(self, text):
         """Enhanced tokenization for Nepali"""
@@ -298,75 +528,49 @@ class NepaliTextComparer:
         return refined_tokens
     
     def are_equivalent(self, word1, word2):
-        """Check if two words are equivalent using systematic approaches"""
-        if word1.lower() == word2.lower():
-            return True
-            
-        # Check for schwa deletion variations
-        if word2 in generate_schwa_variations(word1) or word1 in generate_schwa_variations(word2):
-            return True
-            
-        # Check for honorific equivalents
-        if check_honorific_equivalence(word1, word2):
-            return True
-            
-        # Check for potential homophones
-        if are_potential_homophones(word1, word2):
-            return True
-            
-        return False
+        """
+        Check if two words are equivalent using systematic approaches: case, schwa
+        deletion variations, honorific equivalents, the rule file's word tables and
+        potential homophones.
+        """
+        rules = self.rules
+        return forms_equivalent(rules.word_forms(word1), rules.word_forms(word2))
     
     def compare_texts(self, transcription, user_input):
         """
         Compare model transcription with user input, accounting for
         Nepali-specific linguistic variations
         """
-        print("Comparing:", transcription, user_input)
+        logger.debug(f"Comparing: {transcription!r} with {user_input!r}")
+        # One set of rule tables for the whole comparison, even if they are reloaded meanwhile
+        rules = self.rules
         # Tokenize
         trans_tokens = self.tokenize(transcription.lower())
         input_tokens = self.tokenize(user_input.lower())
         original_input_tokens = self.tokenize(user_input)  # Keep original case
         
-        # Initial comparison using SequenceMatcher
-        matcher = difflib.SequenceMatcher(None, input_tokens, trans_tokens)
-        
+        # Align with linguistic knowledge: equivalent words match, other pairs cost the
+        # distance between their phonetic codes (see word_alignment.py)
+        def substitution_cost(words, first, second):
+            forms = [rules.word_forms(word) for word in words]
+            costs = edit_distance_costs([item.phonetic_code for item in forms], first, second)
+            costs[equivalence_mask(forms, first, second)] = 0.0
+            return costs
+
         output = []
-        
-        # Process opcodes
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            if tag == "equal":
-                for k in range(i1, i2):
-                    output.append((original_input_tokens[k], "correct"))
-            elif tag in ["replace", "delete"]:
-                for k in range(i1, i2):
-                    output.append((original_input_tokens[k], "incorrect"))
-            elif tag == "insert":
-                pass  # Ignore extra words in transcription
-        
-        # Enhanced checking with linguistic knowledge
-        for i, (word, status) in enumerate(output):
-            # Skip already correct words
-            if status == "correct":
-                continue
-                
-            # Check punctuation
-            if word in "।॥,.?!":
-                output[i] = (word, "correct")
-                continue
-                
-            # Check for word equivalence within ±2 positions
-            search_range = min(3, len(trans_tokens))
-            position_range = range(max(0, i - search_range), 
-                                min(len(trans_tokens), i + search_range + 1))
-            
-            for j in position_range:
-                if j < len(trans_tokens) and self.are_equivalent(word.lower(), trans_tokens[j]):
-                    print('equivalent',output[i],"--", word.lower(), "--", trans_tokens[j])
-                    output[i] = (word, "correct")
-                    break
-        
+        for step in align_words(input_tokens, trans_tokens, cost=substitution_cost):
+            if step.tag == "insert":
+                continue  # Ignore extra words in transcription
+            word = original_input_tokens[step.ref_index]
+            if step.tag == "equal" or word in "।॥,.?!":
+                output.append((word, "correct"))
+            else:
+                output.append((word, "incorrect"))
+
         return output
 
+# Process-wide comparer: it holds no per-request state, and the rule tables it reads are immutable
+nepali_comparer = NepaliTextComparer()
+
 # Example usage:
-# comparer = NepaliTextComparer()
-# result = comparer.compare_texts("आज मौसम राम्रो छ।", "आज मौसम रामरो छ")
\ No newline at end of file
+# result = nepali_comparer.compare_texts("आज मौसम राम्रो छ।", "आज मौसम रामरो छ")
\ No newline at end of file
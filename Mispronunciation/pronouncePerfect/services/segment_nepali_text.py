@@ -1,15 +1,135 @@
-import re
-from typing import Set, List
+import math
+import os
+import threading
+import unicodedata
+from typing import Iterable, List, Optional, Set
 
-def segment_nepali_text(text: str, common_words: Set[str], min_word_length: int = 2) -> List[str]:
+from django.conf import settings
+
+from .lexicon import CompiledLexicon, is_compiled_lexicon
+
+DEFAULT_LEXICON_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    'data', 'nepali_words.txt')
+
+# Key the trie stores a word's cost under; never a character of a word
+_END = ''
+
+
+class WordTrie:
+    """
+    In-memory trie over a word list. Each word carries a cost, -log(relative frequency),
+    used by the segmenter; without counts all words cost the same.
+    """
+
+    def __init__(self, words: Iterable = ()):
+        counts = words.items() if hasattr(words, 'items') else ((word, 1) for word in words)
+        counts = {word: count for word, count in counts if word}
+        total = sum(counts.values()) or 1
+
+        self.root = {}
+        self.max_length = 0
+        for word, count in counts.items():
+            node = self.root
+            for char in word:
+                node = node.setdefault(char, {})
+            node[_END] = -math.log(count / total)
+            self.max_length = max(self.max_length, len(word))
+        self.size = len(counts)
+        # An unknown character cluster costs more than the rarest known word
+        self.unknown_cost = max((-math.log(count / total) for count in counts.values()), default=0.0) + 1.0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, word):
+        node = self.root
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return False
+        return _END in node
+
+    def prefixes(self, text, start=0):
+        """Yields (end, cost) for every word equal to text[start:end]."""
+        node = self.root
+        for end in range(start, len(text)):
+            node = node.get(text[end])
+            if node is None:
+                return
+            cost = node.get(_END)
+            if cost is not None:
+                yield end + 1, cost
+
+
+def read_word_list(path):
+    """
+    Reads a word list: one word per line, optionally followed by a tab and a frequency
+    count. Blank lines and lines starting with '#' are skipped.
+    Returns: dict of word -> count
+    """
+    counts = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            word, _, count = line.partition('\t')
+            word = word.strip()
+            counts[word] = counts.get(word, 0) + (int(count) if count else 1)
+    return counts
+
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+def load_lexicon(path):
+    """Maps a compiled lexicon (see lexicon.py) or reads a plain word list into a WordTrie."""
+    if is_compiled_lexicon(path):
+        return CompiledLexicon(path)
+    return WordTrie(read_word_list(path))
+
+
+def get_lexicon():
+    """
+    The shared lexicon, loaded once per process: settings.NEPALI_LEXICON_COMPILED if that
+    file exists, otherwise the plain word list in settings.NEPALI_LEXICON_FILE.
+    """
+    global _lexicon
+    if _lexicon is None:
+        with _lexicon_lock:
+            if _lexicon is None:
+                compiled = getattr(settings, 'NEPALI_LEXICON_COMPILED', None)
+                if compiled and os.path.exists(compiled):
+                    _lexicon = load_lexicon(compiled)
+                else:
+                    _lexicon = load_lexicon(getattr(settings, 'NEPALI_LEXICON_FILE', DEFAULT_LEXICON_FILE))
+    return _lexicon
+
+
+def _is_combining(char):
+    # Vowel signs, halant, anusvara/chandrabindu/visarga, nukta: never start a word
+    return unicodedata.category(char) in ('Mn', 'Mc')
+
+
+def segment_nepali_text(text: str, common_words: Optional[Set[str]] = None, min_word_length: int = 2) -> List[str]:
     """
     Segment a Nepali text string into meaningful words using a dictionary-based approach.
-    
+
+    Picks the lowest-cost split (Viterbi over character positions): known words cost
+    -log(frequency), unknown character clusters cost more than any known word, and no
+    boundary is placed before a vowel sign, halant or other combining mark.
+    Runs in O(len(text) * longest word).
+
     Args:
         text (str): Input text to segment (e.g., "मौसमपानीपरेकोछ").
-        common_words (Set[str]): Set of known Nepali words for matching.
-        min_word_length (int): Minimum length for a word to be considered valid (default: 2).
-    
+        common_words: Known Nepali words for matching: a set, a dict of word -> frequency, or
+            a prebuilt lexicon with a `prefixes(text, start)` method (WordTrie, CompiledLexicon).
+            Sets and dicts are turned into a trie on every call; pass a lexicon for large lists.
+            Defaults to the shared lexicon (see get_lexicon).
+        min_word_length (int): Unknown stretches shorter than this are attached to the
+            previous word (default: 2).
+
     Returns:
         List[str]: List of segmented words.
     """
@@ -18,95 +138,55 @@ def segment_nepali_text(text: str, common_words: Set[str], min_word_length: int
     if not text:
         return []
 
-    # Initialize result list and tracking variables
+    if common_words is None:
+        lexicon = get_lexicon()
+    elif hasattr(common_words, 'prefixes'):
+        lexicon = common_words
+    else:
+        lexicon = WordTrie(common_words)
+
+    n = len(text)
+    boundary = [True] + [not _is_combining(char) for char in text[1:]] + [True]
+    best = [math.inf] * (n + 1)
+    back = [None] * (n + 1)  # back[end] = (start, is a known word)
+    best[0] = 0.0
+
+    for start in range(n):
+        if not boundary[start] or best[start] == math.inf:
+            continue
+        base = best[start]
+        for end, cost in lexicon.prefixes(text, start):
+            if boundary[end] and base + cost < best[end]:
+                best[end], back[end] = base + cost, (start, True)
+        # Unknown: consume one character cluster
+        end = start + 1
+        while not boundary[end]:
+            end += 1
+        if base + lexicon.unknown_cost < best[end]:
+            best[end], back[end] = base + lexicon.unknown_cost, (start, False)
+
+    pieces = []
+    end = n
+    while end > 0:
+        start, known = back[end]
+        pieces.append((text[start:end], known))
+        end = start
+    pieces.reverse()
+
+    # Join runs of unknown clusters into one word
     words = []
-    current = text
-    position = 0
-
-    # Define character classes for smarter fallback
-    consonants = set('कखगघङचछजझञटठडढणतथदधनपफबभमयरलवशषसह')
-    vowel_signs = set('ािीुूृेैोौ')
-    halant = '्'
-
-    while current:
-        matched = False
-        # Try longest match first from common_words
-        for word in sorted(common_words, key=len, reverse=True):
-            if current.startswith(word):
-                words.append(word)
-                current = current[len(word):]
-                position += len(word)
-                matched = True
-                break
-        
-        if not matched:
-            # Fallback: Look ahead to find a plausible boundary
-            if len(current) <= min_word_length:
-                # If remaining text is too short, append it as is
-                words.append(current)
-                break
-            
-            # Attempt to find a boundary based on linguistic rules
-            for i in range(1, min(len(current), max(map(len, common_words)) + 1)):
-                candidate = current[:i]
-                remaining = current[i:]
-                
-                # Check if candidate ends with a consonant and remaining starts logically
-                if (candidate[-1] in consonants and 
-                    (not remaining or remaining[0] in consonants or remaining[0] in vowel_signs)):
-                    # Potential word boundary (e.g., consonant-consonant or consonant-vowel)
-                    words.append(candidate)
-                    current = remaining
-                    position += i
-                    matched = True
-                    break
-                
-                # Check if candidate is a standalone word
-                if candidate in common_words:
-                    words.append(candidate)
-                    current = remaining
-                    position += i
-                    matched = True
-                    break
-            
-            if not matched:
-                # Last resort: Take one character and move forward
-                words.append(current[0])
-                current = current[1:]
-                position += 1
-
-    # Post-process: Merge small fragments with previous words if invalid
+    for piece, known in pieces:
+        if not known and words and not words[-1][1]:
+            words[-1] = (words[-1][0] + piece, False)
+        else:
+            words.append((piece, known))
+
+    # Post-process: attach short unknown fragments to the previous word
     final_words = []
-    i = 0
-    while i < len(words):
-        if (len(words[i]) < min_word_length and 
-            i > 0 and 
-            words[i] not in common_words and 
-            all(c in vowel_signs or c == halant for c in words[i])):
-            # Merge short vowel/halant fragments with previous word
-            final_words[-1] += words[i]
+    for word, known in words:
+        if not known and final_words and len(word) < min_word_length:
+            final_words[-1] += word
         else:
-            final_words.append(words[i])
-        i += 1
+            final_words.append(word)
 
     return final_words
-
-# Expanded common words list (add more as needed)
-nepali_words = {
-    "मौसम", "पानी", "परेको", "छ", "सम", "हो", "गर्छ", "तिमी",
-    "हुन्छ", "गर्न", "के", "यो", "त्यो", "हामी", "उनी", "भयो",
-    "सक्छ", "थियो", "र", "मा", "को", "ले", "बाट", "संग"
-}
-
-# Test cases
-test_cases = [
-    "मौसमपानीपरेकोछ",      # "मौसम पानी परेको छ"
-    "मौसम्पानीपरेकोछ",     # Variant with extra 'म्'
-    "हामीगर्छौं",           # "हामी गर्छौं"
-    "तिमीकेहो",             # "तिमी के हो"
-    "मौ सम्पानीपरेको छ"     # Your original example
-]
-
-for transcription in test_cases:
-    segmented = segment_nepali_text(transcription.replace(" ", ""), nepali_words)
-    print(f"Input: {transcription} → Segmented: {segmented}")
\ No newline at end of file
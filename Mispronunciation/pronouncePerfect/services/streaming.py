@@ -0,0 +1,169 @@
+import logging
+
+import numpy as np
+import torch
+from django.conf import settings
+
+from .audio_processing import beam_search_decode, select_model, postprocess_transcription
+from .ctc_decoder import get_decoder
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+class StreamingTranscriber:
+    """
+    Incremental CTC transcription over overlapping windows.
+
+    Audio is fed in arbitrary pieces with `feed()`. Every time a full window of
+    `chunk_length_s` seconds is buffered it is run through the model on its own;
+    `stride_length_s` seconds at each edge of the window only serve as context and
+    their frames are dropped, so consecutive windows overlap by twice the stride
+    and the kept frames tile the recording exactly once. Only the argmax token ids
+    of the kept frames are accumulated, so memory stays bounded by one window no
+    matter how long the recording is. With `keep_log_probs` the log-probabilities of
+    the kept frames are collected as well (for alignment and confidence scoring).
+    When settings.ASR_DECODER selects the beam search decoder, they are always kept:
+    partial transcriptions stay greedy and `finish()` runs the beam search over all
+    frames, biased towards `expected_text` if given.
+
+    Usage:
+        transcriber = StreamingTranscriber('eng')
+        for piece in pieces:
+            partial = transcriber.feed(piece)   # None until a window completes
+        final = transcriber.finish()
+    """
+
+    def __init__(self, language, chunk_length_s=None, stride_length_s=None, keep_log_probs=False,
+                 expected_text=None):
+        selected = select_model(language)
+        if selected is None:
+            raise ValueError(f"No model available for language '{language}'")
+        self.processor, self.backend = selected
+        self.language = language
+        self.decoder = get_decoder(language, self.processor.tokenizer)
+        self.expected_text = expected_text
+
+        chunk_length_s = settings.ASR_CHUNK_LENGTH_S if chunk_length_s is None else chunk_length_s
+        stride_length_s = settings.ASR_STRIDE_LENGTH_S if stride_length_s is None else stride_length_s
+        if chunk_length_s <= 2 * stride_length_s:
+            raise ValueError("chunk_length_s must be more than twice stride_length_s")
+
+        ratio = self.backend.config.inputs_to_logits_ratio
+        self.chunk_samples = int(chunk_length_s * SAMPLE_RATE)
+        self.stride_samples = int(stride_length_s * SAMPLE_RATE)
+        self.step_samples = self.chunk_samples - 2 * self.stride_samples
+        self.stride_frames = int(round(self.stride_samples / ratio))
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._token_ids = []
+        # Partial transcriptions are decoded incrementally: finished words are decoded once
+        tokenizer = self.processor.tokenizer
+        self._pad_id, self._delimiter_id = tokenizer.pad_token_id, tokenizer.word_delimiter_token_id
+        self._last_token = None
+        self._words = []
+        self._word_tokens = []
+        self._log_probs = [] if keep_log_probs or self.decoder is not None else None
+        self._first = True
+        self.chunks_processed = 0
+        self.seconds_processed = 0.0
+
+    def _run_window(self, window, keep_left, keep_right):
+        with span("forward"):
+            input_values = self.processor(window, sampling_rate=SAMPLE_RATE, return_tensors="pt").input_values
+            logits = self.backend.logits(input_values)[0]
+        start = self.stride_frames if not keep_left else 0
+        end = logits.shape[0] - (self.stride_frames if not keep_right else 0)
+        token_ids = torch.argmax(logits[start:end], dim=-1).tolist()
+        self._token_ids.extend(token_ids)
+        self._collapse(token_ids)
+        if self._log_probs is not None:
+            self._log_probs.append(torch.log_softmax(logits[start:end].float(), dim=-1).numpy())
+        self.chunks_processed += 1
+
+    def _collapse(self, token_ids):
+        """CTC-collapses new token ids (repeats merge across windows) into words."""
+        for token_id in token_ids:
+            if token_id == self._last_token:
+                continue
+            self._last_token = token_id
+            if token_id == self._pad_id:
+                continue
+            if token_id == self._delimiter_id:
+                if self._word_tokens:
+                    self._words.append(self.processor.decode(self._word_tokens, group_tokens=False))
+                    self._word_tokens = []
+            else:
+                self._word_tokens.append(token_id)
+
+    def feed(self, samples):
+        """
+        Appends 16 kHz mono samples and transcribes every window that is now complete.
+        Returns: the transcription so far if at least one window completed, else None.
+        """
+        self._buffer = np.concatenate([self._buffer, np.asarray(samples, dtype=np.float32)])
+        completed = False
+        while len(self._buffer) >= self.chunk_samples:
+            self._run_window(self._buffer[:self.chunk_samples], keep_left=self._first, keep_right=False)
+            self._buffer = self._buffer[self.step_samples:]
+            self.seconds_processed += self.step_samples / SAMPLE_RATE
+            self._first = False
+            completed = True
+        return self.transcription() if completed else None
+
+    def finish(self):
+        """Transcribes whatever is still buffered and returns the full transcription."""
+        # After the first window, the first stride of the buffer was already covered
+        if (self._first and len(self._buffer)) or len(self._buffer) > self.stride_samples:
+            self._run_window(self._buffer, keep_left=self._first, keep_right=True)
+            self.seconds_processed += len(self._buffer) / SAMPLE_RATE
+        self._buffer = np.zeros(0, dtype=np.float32)
+        if self.decoder is not None:
+            return beam_search_decode(self.decoder, self.processor, self.log_probs(), self.language,
+                                      self.expected_text)
+        with span("ctc_decode"):
+            return postprocess_transcription(self.processor.decode(self._token_ids), self.language)
+
+    def log_probs(self):
+        """(frames, vocab) log-probabilities of all kept frames; needs keep_log_probs=True."""
+        if self._log_probs is None:
+            raise ValueError("StreamingTranscriber was created without keep_log_probs")
+        if not self._log_probs:
+            return np.zeros((0, self.backend.config.vocab_size), dtype=np.float32)
+        return np.concatenate(self._log_probs)
+
+    def transcription(self):
+        """
+        The greedy transcription so far. Only the word still in progress is decoded again,
+        so a partial costs the same at the end of a long recording as at its start.
+        """
+        with span("ctc_decode"):
+            words = self._words
+            if self._word_tokens:
+                words = words + [self.processor.decode(self._word_tokens, group_tokens=False)]
+            return postprocess_transcription(' '.join(words), self.language)
+
+
+def iter_partial_transcriptions(waveform, language, chunk_length_s=None, stride_length_s=None,
+                                expected_text=None):
+    """
+    Transcribes a full waveform window by window.
+    Yields: (is_final, transcription) after each completed window and once at the end.
+    """
+    transcriber = StreamingTranscriber(language, chunk_length_s, stride_length_s, expected_text=expected_text)
+    for start in range(0, len(waveform), transcriber.step_samples):
+        partial = transcriber.feed(waveform[start:start + transcriber.step_samples])
+        if partial is not None:
+            yield False, partial
+    yield True, transcriber.finish()
+
+
+def transcribe_long_audio(waveform, language, chunk_length_s=None, stride_length_s=None, expected_text=None):
+    """Transcribes a waveform of any length with bounded memory."""
+    for is_final, transcription in iter_partial_transcriptions(waveform, language, chunk_length_s,
+                                                                stride_length_s, expected_text):
+        if not is_final:
+            logger.debug(f"Partial transcription: {transcription}")
+    return transcription
@@ -1,10 +1,11 @@
-import difflib
 import re
 
-import re
-import difflib
 from indicnlp.tokenize import indic_tokenize
 
+from .metrics import span
+from .normalize_transcription import nepali_comparer
+from .word_alignment import align_words, alignment_cost, exact_match_costs
+
 def tokenize(text, language="eng"):
     """
     Tokenize text based on language.
@@ -16,7 +17,7 @@ def tokenize(text, language="eng"):
     Returns:
         list: List of tokens
     """
-    if language == "eng":
+    if language in ("eng", "en"):
         # English tokenization: extract words and punctuation while preserving spaces
         return re.findall(r"\w+|[^\w\s]", text)
     elif language == "np":
@@ -42,32 +43,16 @@ def compare_texts(transcription, user_input, language="en"):
     input_words = tokenize(user_input.lower(), language)
     original_input_words = tokenize(user_input, language)
     
-    # Use sequence matcher to find differences
-    matcher = difflib.SequenceMatcher(None, input_words, trans_words)
-    
+    # Align the words (misread words pair up with what was said, see word_alignment.py)
     output = []
-    
-    # Process the opcodes (edit operations)
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-        if tag == "equal":
-            for k in range(i1, i2):
-                output.append((original_input_words[k], "correct"))
-        elif tag in ["replace", "delete"]:
-            for k in range(i1, i2):
-                output.append((original_input_words[k], "incorrect"))
-        elif tag == "insert":
-            pass  # Ignore extra words in transcription
-    
-    # Handle correct words with ±2 position check
-    for i, (word, status) in enumerate(output):
-        if status == "incorrect":  # Only check incorrect words
-            for j in range(max(0, i - 2), min(len(trans_words), i + 3)):  # Look within ±2 words
-                if trans_words[j] == word.lower():
-                    output[i] = (word, "correct")  # Mark as correct
-                    break  # Stop once a match is found
+    for step in align_words(input_words, trans_words):
+        if step.tag == "insert":
+            continue  # Ignore extra words in transcription
+        status = "correct" if step.tag == "equal" else "incorrect"
+        output.append((original_input_words[step.ref_index], status))
     
     # Language-specific post-processing
-    if language == "en":
+    if language in ("en", "eng"):
         # Mark common punctuation as correct
         punctuation = ['.', ',', '!', '?']
         for i, (word, status) in enumerate(output):
@@ -83,6 +68,59 @@ def compare_texts(transcription, user_input, language="en"):
                 output[i] = (word, "correct")
     
     return output
+
+def word_errors(reference, hypothesis):
+    """
+    Word edits (substitutions + deletions + insertions) turning `reference` into `hypothesis`.
+    Returns: (number of edits, number of reference words)
+    """
+    ref_words = reference.split()
+    steps = align_words(ref_words, hypothesis.split(), cost=exact_match_costs)
+    return int(alignment_cost(steps)), len(ref_words)
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word error rate: (substitutions + deletions + insertions) / number of reference words.
+    Over several utterances, sum word_errors() instead of averaging the rates.
+    """
+    edits, words = word_errors(reference, hypothesis)
+    if not words:
+        return float(edits > 0)
+    return edits / words
+
+def compare_transcription(transcription, user_input, language):
+    """
+    Compares a transcription with the expected text using the comparer for `language`
+    ('eng' -> compare_texts, 'np' -> the shared NepaliTextComparer).
+    """
+    with span("comparison"):
+        if language == 'eng':
+            return compare_texts(transcription, user_input, language)
+        elif language == 'np':
+            return nepali_comparer.compare_texts(transcription, user_input)
+    raise ValueError(f"Unsupported language: {language}")
+
+def apply_confidence_threshold(result, confidences, threshold):
+    """
+    Decides each word by acoustic confidence instead of string equality: 'correct' when
+    the expected word's posterior confidence is at least `threshold`. Words without a
+    confidence (punctuation, characters the model does not know) keep their status.
+
+    Args:
+        result (list): (word, status) tuples from compare_transcription
+        confidences (list): confidence per word of `result`, or None
+        threshold (float): minimum confidence for 'correct'
+
+    Returns:
+        list: List of tuples (word, status, confidence)
+    """
+    decided = []
+    for (word, status), confidence in zip(result, confidences):
+        if confidence is not None:
+            status = "correct" if confidence >= threshold else "incorrect"
+        decided.append((word, status, confidence))
+    return decided
+
 """
 # Example usage:
 
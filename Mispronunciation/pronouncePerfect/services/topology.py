@@ -0,0 +1,136 @@
+"""
+Execution topology of the ASR workers: how many torch threads each worker process uses
+and, optionally, which CPUs it runs on.
+
+PyTorch defaults to one intra-op thread per core in every process, so N web workers on
+an N-core host run N * N threads and tail latency suffers. settings.ASR_THREADING splits
+the usable CPUs between the workers instead; `manage.py calibrate_topology` measures
+which split works best on a host.
+
+apply_topology() runs at start-up (AppConfig.ready) and, under Gunicorn, again in every
+forked worker with its index (see gunicorn.conf.py) so pinned workers get distinct CPUs.
+Start-up does not import torch: the thread counts are handed to torch as soon as it is
+loaded (configure_torch(), called by model loading), before any inference runs.
+"""
+import os
+import sys
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THREADING = {
+    'WORKERS': None,
+    'INTRA_OP_THREADS': None,
+    'INTER_OP_THREADS': 1,
+    'PIN_CPUS': False,
+}
+
+_applied = None
+# Affinity of the process before apply_topology pinned it. Gunicorn workers forked from a
+# preloading master inherit it, so they split the host's CPUs rather than the master's block.
+_initial_cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else None
+
+
+def threading_settings():
+    return {**DEFAULT_THREADING, **getattr(settings, 'ASR_THREADING', {})}
+
+
+def usable_cpus():
+    """
+    CPUs this process may run on before any pinning (respects taskset/cgroup affinity
+    where available).
+    """
+    if _initial_cpus is not None:
+        return list(_initial_cpus)
+    return list(range(os.cpu_count() or 1))
+
+
+def worker_count():
+    """Worker processes sharing the host: ASR_THREADING['WORKERS'], else $WEB_CONCURRENCY, else 1."""
+    workers = threading_settings()['WORKERS'] or os.environ.get('WEB_CONCURRENCY') or 1
+    return max(1, int(workers))
+
+
+def worker_topology(index, cpus, workers, intra_op_threads=None):
+    """
+    The share of `cpus` of worker `index` out of `workers`.
+    Args: intra_op_threads: threads per worker (default: the worker's share of the CPUs)
+    Returns: (intra-op thread count, list of CPUs of the worker's block)
+    """
+    share = max(1, len(cpus) // workers)
+    start = (index % max(1, len(cpus) // share)) * share
+    block = cpus[start:start + share]
+    return max(1, int(intra_op_threads or share)), block
+
+
+def apply_topology(worker_index=None, workers=None, intra_op_threads=None, inter_op_threads=None, pin=None):
+    """
+    Sets the torch thread counts (and CPU affinity when pinning) of this process. When torch
+    is not imported yet the thread counts are kept for configure_torch().
+    Arguments default to settings.ASR_THREADING; worker_index to $ASR_WORKER_INDEX or 0.
+    Returns: dict describing the applied topology
+    """
+    global _applied
+    config = threading_settings()
+    workers = workers or worker_count()
+    if worker_index is None:
+        worker_index = int(os.environ.get('ASR_WORKER_INDEX', 0))
+    intra_op_threads = intra_op_threads or config['INTRA_OP_THREADS']
+    inter_op_threads = inter_op_threads or config['INTER_OP_THREADS']
+    pin = config['PIN_CPUS'] if pin is None else pin
+
+    threads, block = worker_topology(worker_index, usable_cpus(), workers, intra_op_threads)
+    if pin and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, block)
+
+    _applied = {
+        'worker_index': worker_index,
+        'workers': workers,
+        'intra_op_threads': threads,
+        'inter_op_threads': int(inter_op_threads) if inter_op_threads else None,
+        'cpus': block if pin else usable_cpus(),
+        'pinned': bool(pin),
+        'torch_configured': False,
+    }
+    logger.info(f"ASR worker {worker_index}/{workers}: {threads} intra-op thread(s), "
+                f"{inter_op_threads or 'default'} inter-op, CPUs {block if pin else 'unpinned'}")
+    if 'torch' in sys.modules:
+        _set_torch_threads(_applied)
+    return _applied
+
+
+def configure_torch():
+    """
+    Hands the thread counts of this process's topology to torch, once. Model loading calls
+    it; the first call applies the topology from the settings if nothing applied one yet.
+    Returns: dict describing the applied topology
+    """
+    import torch  # noqa: F401 (apply_topology configures torch once it is imported)
+
+    if _applied is None:
+        return apply_topology()
+    if not _applied['torch_configured']:
+        _set_torch_threads(_applied)
+    return _applied
+
+
+def _set_torch_threads(topology):
+    import torch
+
+    torch.set_num_threads(topology['intra_op_threads'])
+    if topology['inter_op_threads']:
+        try:
+            torch.set_num_interop_threads(topology['inter_op_threads'])
+        except RuntimeError:
+            # Only possible before the first inter-op parallel work of the process
+            logger.info("Inter-op thread count already fixed for this process")
+    topology.update(intra_op_threads=torch.get_num_threads(),
+                    inter_op_threads=torch.get_num_interop_threads(),
+                    torch_configured=True)
+
+
+def topology_status():
+    """The topology applied in this process, or None."""
+    return _applied
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .ctc_decoder import decoder_settings
+from .model_registry import backend_name, get_model_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRANSCRIPTION_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 1024,   # in-process LRU size
+    'DJANGO_CACHE': None,  # optional alias in settings.CACHES shared by all workers
+    'TIMEOUT': 7 * 24 * 3600,
+}
+
+# Files whose size/mtime identify a checkpoint
+MODEL_FILES = ('config.json', 'vocab.json', 'model.safetensors', 'pytorch_model.bin', 'model.onnx')
+
+
+def cache_settings():
+    return {**DEFAULT_TRANSCRIPTION_CACHE, **getattr(settings, 'TRANSCRIPTION_CACHE', {})}
+
+
+def checkpoint_signature(language):
+    """(name, size, mtime) of each checkpoint file of `language`; changes when a file is replaced."""
+    model_path = get_model_path(language)
+    signature = []
+    for name in MODEL_FILES:
+        try:
+            stat = os.stat(os.path.join(model_path, name))
+        except FileNotFoundError:
+            continue
+        signature.append((name, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def model_version(language, signature=None):
+    """
+    Fingerprint of everything that changes the transcription for a given waveform:
+    the checkpoint files, the inference backend/quantization and the
+    pre-processing and chunking settings.
+    """
+    if signature is None:
+        signature = checkpoint_signature(language)
+    parts = [f"{name}:{size}:{mtime}" for name, size, mtime in signature]
+    parts.append(json.dumps({
+        'backend': backend_name(language),
+        'quantized': language in getattr(settings, 'ASR_QUANTIZED_LANGUAGES', []),
+        'vad': getattr(settings, 'ASR_VAD', None),
+        'chunk': [settings.ASR_CHUNK_LENGTH_S, settings.ASR_STRIDE_LENGTH_S],
+        'decoder': decoder_settings(language),
+    }, sort_keys=True))
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=8).hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Transcriptions keyed by hash(decoded PCM) + language + model version.
+    Lookups go to an in-process LRU first, then to the optional shared Django cache
+    (e.g. a FileBasedCache with MAX_ENTRIES, which evicts when full).
+
+    The model version follows the checkpoint files on disk (re-checked with os.stat on
+    every key), so replacing a checkpoint starts a new key space at once. The registry
+    keeps serving the model it already loaded, though: restart the workers after
+    swapping a checkpoint so the new keys are filled by the new model.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, waveform, language, expected_text=None):
+        signature = checkpoint_signature(language)
+        known = self._versions.get(language)
+        if known is None or known[0] != signature:
+            known = self._versions[language] = (signature, model_version(language, signature))
+        version = known[1]
+        digest = hashlib.blake2b(waveform.tobytes(), digest_size=16)
+        if expected_text is not None:
+            # Biased decoding (ctc_decoder.uses_expected_text) depends on the expected sentence
+            digest.update(b"\0" + expected_text.encode())
+        digest = digest.hexdigest()
+        return f"transcription:{language}:{version}:{digest}"
+
+    def _shared(self):
+        alias = cache_settings()['DJANGO_CACHE']
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        shared = self._shared()
+        value = shared.get(key) if shared is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        self._remember(key, value)
+        shared = self._shared()
+        if shared is not None:
+            shared.set(key, value, timeout=cache_settings()['TIMEOUT'])
+
+    def _remember(self, key, value):
+        max_entries = cache_settings()['MAX_ENTRIES']
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries),
+                'shared_cache': cache_settings()['DJANGO_CACHE'],
+            }
+
+
+transcription_cache = TranscriptionCache()
@@ -0,0 +1,123 @@
+"""
+Sharing ASR model weights between worker processes.
+
+Two ways, which can be combined:
+
+- Preload: the master process loads the models before forking its workers (Gunicorn
+  `preload_app`, see gunicorn.conf.py). The weights are never written afterwards, so the
+  workers keep sharing the master's pages copy-on-write; `freeze_for_fork()` moves the
+  objects created so far out of the garbage collector's reach so collections in the
+  workers do not dirty their pages either.
+- Memory-mapped weights (settings.ASR_MMAP_WEIGHTS): after loading, every parameter found
+  with the same shape and dtype in the checkpoint's .safetensors file(s) is replaced by a
+  read-only view of the mapped file. Those pages belong to the page cache and are shared
+  by every process that maps the file, preloaded or not.
+
+`memory_breakdown()` reads the shared/private split of a process from /proc (Linux).
+torch is imported by the functions that need it: /metrics and /api/model-status/ read the
+memory breakdown without loading the ML stack.
+"""
+import gc
+import glob
+import json
+import mmap
+import os
+import struct
+import warnings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# safetensors dtype -> name of the torch dtype
+_DTYPES = {
+    'F64': 'float64', 'F32': 'float32', 'F16': 'float16', 'BF16': 'bfloat16',
+    'I64': 'int64', 'I32': 'int32', 'I16': 'int16', 'I8': 'int8',
+    'U8': 'uint8', 'BOOL': 'bool',
+}
+
+
+def mmap_safetensors(path):
+    """
+    Maps a .safetensors file read-only without copying it.
+    Returns: dict of tensor name -> tensor viewing the mapped file (must never be written)
+    """
+    import torch
+
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    base = 8 + header_size
+
+    tensors = {}
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='The given buffer is not writable')
+        for name, info in header.items():
+            if name == '__metadata__' or info['dtype'] not in _DTYPES:
+                continue
+            dtype = getattr(torch, _DTYPES[info['dtype']])
+            start, end = info['data_offsets']
+            count = (end - start) // torch.empty(0, dtype=dtype).element_size()
+            tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=base + start) if count else \
+                torch.empty(0, dtype=dtype)
+            tensors[name] = tensor.reshape(info['shape'])
+    return tensors
+
+
+def map_model_weights(model, model_path):
+    """
+    Points the parameters and buffers of `model` at the memory-mapped safetensors
+    checkpoint(s) in `model_path`. Tensors without an identical counterpart in the files
+    (renamed or converted at load time) keep their private copy.
+    Returns: bytes now backed by the mapped files
+    """
+    files = sorted(glob.glob(os.path.join(model_path, '*.safetensors')))
+    if not files:
+        logger.warning(f"No .safetensors files in {model_path}; weights stay in private memory")
+        return 0
+    mapped = {}
+    for path in files:
+        mapped.update(mmap_safetensors(path))
+
+    model.requires_grad_(False)
+    shared = 0
+    for name, tensor in [*model.named_parameters(), *model.named_buffers()]:
+        source = mapped.get(name)
+        if source is not None and source.shape == tensor.shape and source.dtype == tensor.dtype:
+            tensor.data = source
+            shared += source.numel() * source.element_size()
+    logger.info(f"{shared / 2 ** 20:.1f} MB of weights memory-mapped from {model_path}")
+    return shared
+
+
+def freeze_for_fork():
+    """Call in the master after preloading, right before the workers are forked."""
+    gc.collect()
+    gc.freeze()
+
+
+def memory_breakdown(pid='self'):
+    """
+    Shared vs private memory of a process, in MB, from /proc/<pid>/smaps_rollup.
+    Returns: dict with rss, pss, shared, private, anonymous and swap, or None where /proc
+    is unavailable
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    fields = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(':')
+        parts = value.split()
+        if parts and parts[-1] == 'kB':
+            fields[key] = int(parts[0]) / 1024
+    return {
+        'rss': round(fields.get('Rss', 0.0), 1),
+        'pss': round(fields.get('Pss', 0.0), 1),
+        'shared': round(fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0), 1),
+        'private': round(fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0), 1),
+        'anonymous': round(fields.get('Anonymous', 0.0), 1),
+        'swap': round(fields.get('Swap', 0.0), 1),
+    }
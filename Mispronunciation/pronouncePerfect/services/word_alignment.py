@@ -0,0 +1,151 @@
+"""
+Word-level alignment of the expected text to a transcription.
+
+Banded edit distance: only cells within `band` words of the diagonal (scaled to the two
+lengths) are filled, so time and memory are O(n * band) instead of O(n * m), and the
+result does not depend on matching heuristics. Insertions and deletions cost 1, a
+substitution costs a fuzzy distance in [0, 1] (0 for words that count as the same), so a
+misread word pairs up with what was said instead of showing up as a deletion plus an
+insertion.
+
+All substitution costs of the band are computed up front in one vectorized batch; each
+DP row is then a handful of NumPy operations (the chain of insertions along a row is a
+running minimum).
+"""
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+
+DEFAULT_BAND = 32
+
+# One step of an alignment. tag is 'equal', 'replace', 'delete' (reference word not in the
+# hypothesis) or 'insert' (extra hypothesis word); the index of the missing side is None.
+AlignedPair = namedtuple('AlignedPair', ['tag', 'ref_index', 'hyp_index', 'cost'])
+
+def edit_distance_costs(words, first, second):
+    """
+    Normalized Levenshtein distance (edits / longer length) of words[first[k]] and
+    words[second[k]] for all k at once: one vectorized DP step per character position.
+    Returns: float array, 0 for identical words, 1 for words sharing nothing
+    """
+    first, second = np.asarray(first, dtype=np.int64), np.asarray(second, dtype=np.int64)
+    lengths = np.array([len(word) for word in words], dtype=np.int64)
+    longest = int(lengths.max(initial=0))
+    if not len(first) or longest == 0:
+        return np.zeros(len(first))
+
+    codes = np.full((len(words), longest), -1, dtype=np.int64)
+    for index, word in enumerate(words):
+        codes[index, :len(word)] = [ord(char) for char in word]
+    a, b = codes[first], np.where(codes[second] < 0, -2, codes[second])  # padding never matches
+    length_a, length_b = lengths[first], lengths[second]
+
+    positions = np.arange(longest + 1)
+    previous = np.broadcast_to(positions, (len(first), longest + 1))
+    distance = length_b.copy()  # empty first word
+    for i in range(1, longest + 1):
+        best = np.minimum(previous[:, :-1] + (a[:, i - 1, None] != b), previous[:, 1:] + 1)
+        row = np.concatenate([np.full((len(first), 1), i), best], axis=1)
+        # Insertions along the row: current[j] = min over k <= j of row[k] + (j - k)
+        current = np.minimum.accumulate(row - positions, axis=1) + positions
+        done = np.flatnonzero(length_a == i)
+        distance[done] = current[done, length_b[done]]
+        previous = current
+    return distance / np.maximum(np.maximum(length_a, length_b), 1)
+
+
+def exact_match_costs(words, first, second):
+    """Substitution cost for word error rates: any two different words are a full edit."""
+    return np.ones(len(first))
+
+
+def align_words(reference, hypothesis, cost=edit_distance_costs, band=None):
+    """
+    Aligns two word sequences with banded edit distance.
+
+    Args:
+        reference (list): Expected words (strings)
+        hypothesis (list): Transcribed words
+        cost (callable): cost(words, first, second) -> substitution cost in [0, 1] of each
+            pair (words[first[k]], words[second[k]]), 0 meaning the words match. Called once,
+            with every distinct pair of different words in the band (default: edit_distance_costs).
+        band (int): Half-width of the band around the diagonal (default:
+            settings.WORD_ALIGNMENT_BAND). Paths that stray further are not considered.
+
+    Returns:
+        list: AlignedPair steps in order, covering every word of both sequences
+    """
+    n, m = len(reference), len(hypothesis)
+    if n == 0 or m == 0:
+        return ([AlignedPair('delete', i, None, 1.0) for i in range(n)] +
+                [AlignedPair('insert', None, j, 1.0) for j in range(m)])
+    band = band or getattr(settings, 'WORD_ALIGNMENT_BAND', DEFAULT_BAND)
+    # Consecutive rows' bands must overlap
+    band = max(int(band), -(-m // n) + 1)
+    width = 2 * band + 1
+
+    # Row i covers columns low[i] .. low[i] + width - 1 (those beyond m are unreachable)
+    rows = np.arange(n + 1)
+    low = np.maximum(0, (rows * m + n // 2) // n - band)
+    columns = low[:, None] + np.arange(width)
+
+    # Substitution cost of reference word i-1 and hypothesis word j-1 for every cell (i, j)
+    words = list(dict.fromkeys([*reference, *hypothesis]))
+    ids = {word: index for index, word in enumerate(words)}
+    ref_ids = np.array([ids[word] for word in reference], dtype=np.int64)
+    hyp_ids = np.array([ids[word] for word in hypothesis], dtype=np.int64)
+    substitution = np.full((n + 1, width), np.inf)
+    valid = (columns[1:] >= 1) & (columns[1:] <= m)
+    pair_ref = np.broadcast_to(ref_ids[:, None], valid.shape)[valid]
+    pair_hyp = hyp_ids[columns[1:][valid] - 1]
+    pair_costs = np.zeros(len(pair_ref))
+    different = np.flatnonzero(pair_ref != pair_hyp)
+    if len(different):
+        keys, inverse = np.unique(pair_ref[different] * len(words) + pair_hyp[different], return_inverse=True)
+        pair_costs[different] = np.asarray(cost(words, keys // len(words), keys % len(words)),
+                                           dtype=np.float64)[inverse]
+    substitution[1:][valid] = pair_costs
+
+    # Previous row, padded with unreachable cells so both moves into a row are plain slices.
+    # Cells beyond column m get values too, but no move from them reaches a column <= m.
+    shift = np.diff(low).tolist()
+    padded = np.full(width + max(shift, default=0) + 1, np.inf)
+    padded[1:width + 1] = columns[0]
+    # Back pointers: insertion (left) wins over deletion (up) wins over the diagonal
+    lefts = np.zeros((n + 1, width), dtype=bool)
+    lefts[0] = True
+    ups = np.zeros((n + 1, width), dtype=bool)
+    for i in range(1, n + 1):
+        delta = shift[i - 1]
+        diagonal = padded[delta:delta + width] + substitution[i]
+        up = padded[delta + 1:delta + 1 + width] + 1
+        best = np.minimum(diagonal, up)
+        # Insertions along the row: current[j] = min over k <= j of best[k] + (j - k)
+        chained = np.minimum.accumulate(best - columns[i]) + columns[i]
+        # (best - j) + j may round below best: only a real improvement counts as an insertion
+        np.less(chained, best - 1e-9, out=lefts[i])
+        np.less(up, diagonal, out=ups[i])
+        np.minimum(chained, best, out=padded[1:width + 1])
+
+    steps = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        k = j - low[i]
+        if lefts[i, k]:
+            steps.append(AlignedPair('insert', None, j - 1, 1.0))
+            j -= 1
+        elif ups[i, k]:
+            steps.append(AlignedPair('delete', i - 1, None, 1.0))
+            i -= 1
+        else:
+            value = float(substitution[i, k])
+            steps.append(AlignedPair('equal' if value == 0 else 'replace', i - 1, j - 1, value))
+            i, j = i - 1, j - 1
+    steps.reverse()
+    return steps
+
+
+def alignment_cost(steps):
+    """Total cost of an alignment."""
+    return sum(step.cost for step in steps)
@@ -1,3 +1,1034 @@
-from django.test import TestCase
+import importlib.util
+import io
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import torch
+from django.apps import apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from transformers import Wav2Vec2Config, Wav2Vec2FeatureExtractor, Wav2Vec2ForCTC
+
+from pronouncePerfect.live_feedback import LiveFeedbackSession
+from pronouncePerfect.services import audio_processing, batch_scoring, batching, jobs, metrics, streaming, topology
+from pronouncePerfect.services import model_registry as model_registry_module
+from pronouncePerfect.services.alignment import ctc_viterbi, transcription_confidences
+from pronouncePerfect.services.batching import BatchScheduler
+from pronouncePerfect.services.ctc_decoder import BeamSearchDecoder, NgramLM
+from pronouncePerfect.services.inference_backends import (
+    OnnxBackend, TorchBackend, export_onnx_model, max_logit_difference,
+)
+from pronouncePerfect.services.normalize_transcription import (
+    DEFAULT_RULES_FILE, NepaliTextComparer, are_equivalent_uncached, generate_schwa_variations, get_rules,
+    nepali_comparer, normalize_nepali_text, normalize_nepali_text_sequential, reload_rules,
+)
+from pronouncePerfect.services.model_registry import LoadedModel, ModelRegistry, get_model_path
+from pronouncePerfect.services.lexicon import CompiledLexicon, write_lexicon
+from pronouncePerfect.services.streaming import StreamingTranscriber
+from pronouncePerfect.services.transcription_cache import TranscriptionCache
+from pronouncePerfect.services.segment_nepali_text import WordTrie, segment_nepali_text
+from pronouncePerfect.services.text_analysis import apply_confidence_threshold, compare_texts
+from pronouncePerfect.services.topology import worker_topology
+from pronouncePerfect.services.weight_sharing import map_model_weights, memory_breakdown, mmap_safetensors
+from pronouncePerfect.services.word_alignment import align_words, alignment_cost, edit_distance_costs
 
 # Create your tests here.
+
+HAS_ONNX = all(importlib.util.find_spec(name) for name in ('onnx', 'onnxruntime'))
+
+
+class ModelRegistryTests(SimpleTestCase):
+    """Models are loaded once per language, however many threads ask for them."""
+
+    @staticmethod
+    def fake_load_model(language):
+        get_model_path(language)  # unknown languages fail like the real loader
+        time.sleep(0.05)
+        backend = mock.Mock()
+        backend.memory_bytes.return_value = 0
+        return LoadedModel(language, processor=None, backend=backend, load_time=0.05)
+
+    def test_concurrent_gets_load_once(self):
+        registry = ModelRegistry()
+        with mock.patch.object(model_registry_module, 'load_model', side_effect=self.fake_load_model) as load:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                models = list(pool.map(lambda _: registry.get('eng'), range(16)))
+        load.assert_called_once_with('eng')
+        self.assertTrue(all(loaded is models[0] for loaded in models))
+        self.assertEqual(registry.stats()['loads'], 1)
+        self.assertEqual(registry.stats()['hits'], 16)
+
+    def test_unknown_language_raises(self):
+        registry = ModelRegistry()
+        with mock.patch.object(model_registry_module, 'load_model', side_effect=self.fake_load_model):
+            with self.assertRaises(ValueError):
+                registry.get('fr')
+        self.assertFalse(registry.is_loaded('fr'))
+
+    def test_failed_warm_up_forward_is_logged(self):
+        registry = ModelRegistry()
+        loaded = self.fake_load_model('eng')
+        loaded.backend.logits.side_effect = RuntimeError("broken model")
+        with mock.patch.object(model_registry_module, 'load_model', return_value=loaded), \
+                self.assertLogs(model_registry_module.logger, 'ERROR'):
+            registry.warm_up(['eng'])
+        self.assertTrue(registry.is_loaded('eng'))
+
+
+class BatchSchedulerTests(SimpleTestCase):
+
+    def test_queued_requests_share_a_forward_pass(self):
+        sizes = []
+
+        def infer(waveforms, language):
+            sizes.append(len(waveforms))
+            return [f"{language}:{waveform}" for waveform in waveforms]
+
+        scheduler = BatchScheduler(infer, max_batch_size=4, max_wait_ms=200)
+        futures = [scheduler.submit(i, 'eng') for i in range(5)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [f"eng:{i}" for i in range(5)])
+        self.assertEqual(sizes, [4, 1])
+        self.assertEqual(scheduler.stats()['batches'], 2)
+
+    def test_partial_batch_runs_after_max_wait(self):
+        scheduler = BatchScheduler(lambda waveforms, language: waveforms, max_batch_size=8, max_wait_ms=50)
+        start = time.perf_counter()
+        self.assertEqual(scheduler.transcribe('clip', 'eng', timeout=5), 'clip')
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.assertEqual(scheduler.stats()['avg_batch_size'], 1.0)
+
+    def test_failure_reaches_every_request_of_the_batch(self):
+        def infer(waveforms, language):
+            raise RuntimeError("forward failed")
+
+        scheduler = BatchScheduler(infer, max_batch_size=2, max_wait_ms=200)
+        # A full batch runs (and logs) right away: listen before submitting
+        with self.assertLogs(batching.logger, 'ERROR'):
+            futures = [scheduler.submit(i, 'eng') for i in range(2)]
+            for future in futures:
+                with self.assertRaisesRegex(RuntimeError, "forward failed"):
+                    future.result(timeout=5)
+        self.assertEqual(scheduler.stats()['errors'], 2)
+
+
+class BatchedForwardTests(SimpleTestCase):
+    """A clip's logits must not depend on the clips batched with it."""
+
+    def logits(self, feat_extract_norm):
+        torch.manual_seed(0)
+        config = Wav2Vec2Config(vocab_size=32, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                                intermediate_size=64, conv_dim=(16,) * 7, feat_extract_norm=feat_extract_norm,
+                                num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2)
+        backend = TorchBackend(Wav2Vec2ForCTC(config).eval())
+        model_pair = (Wav2Vec2FeatureExtractor(return_attention_mask=True), backend)
+        rng = np.random.default_rng(0)
+        waveforms = [(rng.standard_normal(n) * 0.1).astype(np.float32) for n in (16000, 27000, 16000)]
+        with mock.patch.object(backend, 'logits', wraps=backend.logits) as forward:
+            _, _, batched = audio_processing.compute_logits(waveforms, 'eng', model_pair)
+        single = [audio_processing.compute_logits([waveform], 'eng', model_pair)[2][0] for waveform in waveforms]
+        return batched, single, [call.args[0].shape for call in forward.call_args_list]
+
+    def assert_matches(self, batched, single):
+        for clip, alone in zip(batched, single):
+            self.assertEqual(clip.shape, alone.shape)
+            self.assertLess((clip - alone).abs().max().item(), 1e-4)
+
+    def test_group_norm_batches_only_equal_lengths(self):
+        batched, single, shapes = self.logits('group')
+        self.assert_matches(batched, single)
+        self.assertEqual(sorted(shapes), [(1, 27000), (2, 16000)])
+
+    def test_layer_norm_masks_padding(self):
+        batched, single, shapes = self.logits('layer')
+        self.assert_matches(batched, single)
+        self.assertEqual(shapes, [(3, 27000)])
+
+
+class AudioDecodeTests(SimpleTestCase):
+
+    @staticmethod
+    def wav_bytes(seconds, sample_rate):
+        import soundfile as sf
+
+        buffer = io.BytesIO()
+        sf.write(buffer, np.zeros((int(seconds * sample_rate), 2), dtype=np.float32), sample_rate, format='WAV')
+        return buffer.getvalue()
+
+    def test_small_upload_is_decoded_in_memory_and_resampled(self):
+        upload = SimpleUploadedFile('clip.wav', self.wav_bytes(0.5, 22050))
+        with mock.patch.object(audio_processing, 'spool_audio_file') as spool:
+            waveform = audio_processing.decode_audio(upload)
+        spool.assert_not_called()
+        self.assertEqual(waveform.dtype, np.float32)
+        self.assertEqual(waveform.shape, (8000,))
+
+    def test_unsupported_format_falls_back_to_ffmpeg(self):
+        data = b'\x1aE\xdf\xa3 not a wav file'
+        decoded = np.zeros(160, dtype=np.float32)
+        with mock.patch.object(audio_processing, '_ffmpeg_decode', return_value=decoded) as ffmpeg:
+            self.assertIs(audio_processing.decode_audio_bytes(data), decoded)
+        ffmpeg.assert_called_once_with(['-i', 'pipe:0'], data)
+
+    def test_large_upload_is_spooled_and_removed(self):
+        upload = SimpleUploadedFile('clip.wav', self.wav_bytes(0.5, 16000))
+        spool_audio_file, spooled = audio_processing.spool_audio_file, []
+
+        def spool(audio_file):
+            spooled.append(spool_audio_file(audio_file))
+            return spooled[-1]
+
+        with override_settings(AUDIO_SPOOL_THRESHOLD_BYTES=1024), \
+                mock.patch.object(audio_processing, 'spool_audio_file', side_effect=spool):
+            waveform = audio_processing.decode_audio(upload)
+        self.assertEqual(len(spooled), 1)
+        self.assertTrue(spooled[0].endswith('.wav'))
+        self.assertFalse(os.path.exists(spooled[0]))
+        self.assertEqual(waveform.shape, (8000,))
+
+
+class VoiceActivityTests(SimpleTestCase):
+
+    @staticmethod
+    def tone(seconds):
+        t = np.arange(int(seconds * 16000)) / 16000
+        return (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+    @staticmethod
+    def silence(seconds):
+        return np.zeros(int(seconds * 16000), dtype=np.float32)
+
+    def test_speech_mask_marks_tone_with_padding(self):
+        waveform = np.concatenate([self.silence(1.0), self.tone(0.5), self.silence(1.0)])
+        mask, frame_length = audio_processing.speech_mask(waveform, frame_ms=30, padding_ms=210)
+        self.assertEqual(frame_length, 480)
+        speech = np.flatnonzero(mask)
+        # Tone frames 33..49 (samples 16000..23999), widened by 7 frames on each side
+        self.assertEqual((speech[0], speech[-1]), (33 - 7, 49 + 7))
+        self.assertEqual(len(speech), speech[-1] - speech[0] + 1)
+
+    def test_digital_silence_has_no_speech(self):
+        mask, _ = audio_processing.speech_mask(self.silence(1.0))
+        self.assertFalse(mask.any())
+        waveform, removed = audio_processing.trim_silence(self.silence(1.0))
+        self.assertEqual((len(waveform), removed), (16000, 0.0))
+
+    def test_trim_silence_keeps_padded_speech(self):
+        waveform = np.concatenate([self.silence(1.0), self.tone(0.5), self.silence(1.0)])
+        trimmed, removed = audio_processing.trim_silence(waveform, padding_ms=210)
+        self.assertEqual(len(trimmed), (56 - 26 + 1) * 480)
+        tone_start = 16000 - 26 * 480
+        self.assertTrue(np.array_equal(trimmed[tone_start:tone_start + 8000], self.tone(0.5)))
+        self.assertAlmostEqual(removed, (len(waveform) - len(trimmed)) / 16000)
+
+    def test_split_on_silence_cuts_only_long_pauses(self):
+        waveform = np.concatenate([self.silence(0.5), self.tone(0.3), self.silence(1.5), self.tone(0.3),
+                                   self.silence(0.3), self.tone(0.3), self.silence(0.5)])
+        segments, removed = audio_processing.split_on_silence(waveform, min_silence_ms=700)
+        self.assertEqual(len(segments), 2)
+        # The 0.3 s pause stays inside the second segment
+        self.assertGreater(len(segments[1]), int(0.9 * 16000))
+        self.assertAlmostEqual(removed, (len(waveform) - sum(map(len, segments))) / 16000)
+        self.assertEqual(len(audio_processing.split_on_silence(waveform, min_silence_ms=2000)[0]), 1)
+
+
+class FrameBackend:
+    """A stand-in model emitting, for every 320-sample frame, the token id its samples encode."""
+
+    name = 'test'
+
+    def __init__(self, vocab_size):
+        self.config = SimpleNamespace(inputs_to_logits_ratio=320, vocab_size=vocab_size, feat_extract_norm='group')
+
+    def logits(self, input_values, attention_mask=None):
+        frames = input_values.shape[1] // 320
+        token_ids = input_values[:, :frames * 320].reshape(len(input_values), frames, 320).mean(-1).round().long()
+        return torch.nn.functional.one_hot(token_ids, self.config.vocab_size).float()
+
+    def output_lengths(self, input_lengths):
+        return input_lengths // 320
+
+
+class StreamingTests(SimpleTestCase):
+    """Windows must tile the recording so streaming matches a single pass over it."""
+
+    def setUp(self):
+        from transformers import Wav2Vec2CTCTokenizer, Wav2Vec2Processor
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "vocab.json")
+            with open(path, "w") as f:
+                json.dump({"[PAD]": 0, "[UNK]": 1, "|": 2, "a": 3, "b": 4, "c": 5}, f)
+            tokenizer = Wav2Vec2CTCTokenizer(path, pad_token="[PAD]", unk_token="[UNK]")
+        feature_extractor = Wav2Vec2FeatureExtractor(do_normalize=False, return_attention_mask=True)
+        self.model_pair = (Wav2Vec2Processor(feature_extractor=feature_extractor, tokenizer=tokenizer),
+                           FrameBackend(6))
+        patches = [mock.patch.object(module, 'select_model', return_value=self.model_pair)
+                   for module in (audio_processing, streaming)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    @staticmethod
+    def recording(rng, n_frames):
+        token_ids = rng.choice([0, 0, 2, 3, 4, 5], size=n_frames)
+        return token_ids.tolist(), np.repeat(token_ids, 320).astype(np.float32)
+
+    def test_chunked_feed_matches_single_pass(self):
+        rng = np.random.default_rng(0)
+        processor = self.model_pair[0]
+        for n_frames in (10, 60, 97):
+            token_ids, waveform = self.recording(rng, n_frames)
+            transcriber = StreamingTranscriber('eng', chunk_length_s=0.64, stride_length_s=0.16)
+            for start in range(0, len(waveform), 1000):
+                partial = transcriber.feed(waveform[start:start + 1000])
+                if partial is not None:
+                    kept = len(transcriber._token_ids)
+                    self.assertEqual(transcriber._token_ids, token_ids[:kept])
+                    self.assertEqual(partial.split(), processor.decode(token_ids[:kept]).lower().split())
+            final = transcriber.finish()
+            self.assertEqual(transcriber._token_ids, token_ids)
+            with override_settings(ASR_CHUNK_LENGTH_S=30):
+                self.assertEqual(final, audio_processing.transcribe_audio(waveform, 'eng'))
+
+    def test_live_feedback_session_reports_partials_and_final(self):
+        _, waveform = self.recording(np.random.default_rng(1), 80)
+        with override_settings(LIVE_CHUNK_LENGTH_S=0.64, LIVE_STRIDE_LENGTH_S=0.16):
+            session = LiveFeedbackSession('eng', 'abc cab', 'f32le')
+        data = waveform.tobytes()
+        messages = [session.feed(data[start:start + 4096]) for start in range(0, len(data), 4096)]
+        partials = [message for message in messages if message is not None]
+        final = session.finish()
+
+        self.assertEqual(len(partials), session.transcriber.chunks_processed - 1)
+        self.assertTrue(all(message['type'] == 'partial' for message in partials))
+        self.assertEqual(final['type'], 'final')
+        self.assertEqual([word for word, _ in final['result']], ['abc', 'cab'])
+        with override_settings(ASR_CHUNK_LENGTH_S=30):
+            self.assertEqual(final['transcription'], audio_processing.transcribe_audio(waveform, 'eng'))
+
+
+@unittest.skipUnless(HAS_ONNX, "onnx and onnxruntime are required")
+class OnnxParityTests(SimpleTestCase):
+    """The ONNX Runtime backend must produce the same logits as eager PyTorch."""
+
+    def setUp(self):
+        torch.manual_seed(0)
+        config = Wav2Vec2Config(vocab_size=32, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                                intermediate_size=64, conv_dim=(16,) * 7,
+                                num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2)
+        self.model = Wav2Vec2ForCTC(config).eval()
+        self.processor = Wav2Vec2FeatureExtractor(return_attention_mask=False)
+        rng = np.random.default_rng(0)
+        self.waveforms = [(rng.standard_normal(n) * 0.1).astype(np.float32) for n in (16000, 27000)]
+
+    def test_logits_match_pytorch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = export_onnx_model(self.model, os.path.join(directory, 'model.onnx'))
+            onnx_backend = OnnxBackend(path, self.model.config)
+            difference, same_tokens = max_logit_difference(TorchBackend(self.model), onnx_backend,
+                                                           self.waveforms, self.processor)
+        self.assertLess(difference, 1e-4)
+        self.assertTrue(same_tokens)
+
+    def test_output_lengths_match_pytorch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = export_onnx_model(self.model, os.path.join(directory, 'model.onnx'))
+            onnx_backend = OnnxBackend(path, self.model.config)
+            lengths = torch.tensor([400, 16000, 27001])
+            self.assertTrue(torch.equal(onnx_backend.output_lengths(lengths),
+                                        TorchBackend(self.model).output_lengths(lengths)))
+
+
+class QuantizationTests(SimpleTestCase):
+    """Languages in ASR_QUANTIZED_LANGUAGES load an int8 model that decodes like the fp32 one."""
+
+    def test_quantized_model_matches_float_tokens(self):
+        from transformers import Wav2Vec2CTCTokenizer, Wav2Vec2Processor
+
+        torch.manual_seed(0)
+        config = Wav2Vec2Config(vocab_size=5, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                                intermediate_size=64, conv_dim=(16,) * 7,
+                                num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2)
+        input_values = torch.randn(1, 16000, generator=torch.Generator().manual_seed(0))
+        with tempfile.TemporaryDirectory() as directory:
+            vocab_path = os.path.join(directory, "vocab.json")
+            with open(vocab_path, "w") as f:
+                json.dump({"[PAD]": 0, "[UNK]": 1, "|": 2, "a": 3, "b": 4}, f)
+            tokenizer = Wav2Vec2CTCTokenizer(vocab_path, pad_token="[PAD]", unk_token="[UNK]")
+            Wav2Vec2Processor(feature_extractor=Wav2Vec2FeatureExtractor(), tokenizer=tokenizer).save_pretrained(directory)
+            Wav2Vec2ForCTC(config).save_pretrained(directory)
+
+            with override_settings(MODEL_DIR=directory, ASR_QUANTIZED_LANGUAGES=['eng']):
+                quantized = model_registry_module.load_model('eng')
+                float_model = model_registry_module.load_model('eng', quantized=False)
+
+        self.assertTrue(quantized.quantized)
+        self.assertTrue(any(isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+                            for module in quantized.model.modules()))
+        self.assertFalse(any(isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+                             for module in float_model.model.modules()))
+        expected, actual = float_model.backend.logits(input_values), quantized.backend.logits(input_values)
+        error = (actual - expected).abs().max().item()
+        self.assertLess(error, 0.05)
+        # A random model's logits are close to ties: compare the frames int8 error cannot flip
+        top2 = expected.topk(2, dim=-1).values
+        decided = (top2[..., 0] - top2[..., 1]) > 2 * error
+        self.assertGreater(decided.float().mean().item(), 0.5)
+        self.assertTrue(torch.equal(actual.argmax(-1)[decided], expected.argmax(-1)[decided]))
+
+
+@unittest.skipUnless(HAS_ONNX, "onnx and onnxruntime are required")
+class ExportOnnxCommandTests(SimpleTestCase):
+
+    def test_exports_for_a_language_served_by_onnx(self):
+        from django.core.management import call_command
+        from transformers import Wav2Vec2CTCTokenizer, Wav2Vec2Processor
+
+        torch.manual_seed(0)
+        config = Wav2Vec2Config(vocab_size=5, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                                intermediate_size=64, conv_dim=(16,) * 7,
+                                num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2)
+        with tempfile.TemporaryDirectory() as directory:
+            vocab_path = os.path.join(directory, "vocab.json")
+            with open(vocab_path, "w") as f:
+                json.dump({"[PAD]": 0, "[UNK]": 1, "|": 2, "a": 3, "b": 4}, f)
+            tokenizer = Wav2Vec2CTCTokenizer(vocab_path, pad_token="[PAD]", unk_token="[UNK]")
+            Wav2Vec2Processor(feature_extractor=Wav2Vec2FeatureExtractor(), tokenizer=tokenizer).save_pretrained(directory)
+            Wav2Vec2ForCTC(config).save_pretrained(directory)
+
+            with override_settings(MODEL_DIR=directory, ASR_BACKENDS={'eng': 'onnx'}):
+                # Without model.onnx yet, then re-exporting over it
+                for _ in range(2):
+                    output = io.StringIO()
+                    call_command('export_onnx', language=['eng'], stdout=output)
+                    self.assertIn("Export finished", output.getvalue())
+            self.assertTrue(os.path.exists(os.path.join(directory, "model.onnx")))
+
+
+class TranscriptionCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.config_path = os.path.join(directory.name, "config.json")
+        with open(self.config_path, "w") as f:
+            f.write("{}")
+        model_dir = override_settings(MODEL_DIR=directory.name)
+        model_dir.enable()
+        self.addCleanup(model_dir.disable)
+        self.waveform = np.arange(1600, dtype=np.float32)
+
+    def test_key_covers_audio_language_and_expected_text(self):
+        cache = TranscriptionCache()
+        key = cache.key(self.waveform, 'eng')
+        self.assertEqual(key, TranscriptionCache().key(self.waveform.copy(), 'eng'))
+        self.assertTrue(key.startswith("transcription:eng:"))
+        self.assertNotEqual(key, cache.key(self.waveform + 1, 'eng'))
+        self.assertNotEqual(key, cache.key(self.waveform, 'eng', expected_text="hello"))
+        with override_settings(NEP_MODEL_DIR=os.path.dirname(self.config_path)):
+            self.assertTrue(cache.key(self.waveform, 'np').startswith("transcription:np:"))
+
+    def test_replaced_checkpoint_changes_the_key(self):
+        cache = TranscriptionCache()
+        key = cache.key(self.waveform, 'eng')
+        with open(self.config_path, "w") as f:
+            f.write('{"vocab_size": 32}')
+        self.assertNotEqual(cache.key(self.waveform, 'eng'), key)
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = TranscriptionCache()
+        with override_settings(TRANSCRIPTION_CACHE={'MAX_ENTRIES': 2}):
+            cache.set("a", "first")
+            cache.set("b", "second")
+            self.assertEqual(cache.get("a"), "first")  # "b" is now the oldest
+            cache.set("c", "third")
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual((cache.get("a"), cache.get("c")), ("first", "third"))
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_shared_cache_is_read_after_the_local_lru(self):
+        caches_setting = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'transcription-test'},
+        }
+        with override_settings(CACHES=caches_setting, TRANSCRIPTION_CACHE={'DJANGO_CACHE': 'shared'}):
+            TranscriptionCache().set("key", "hello")  # another worker
+            cache = TranscriptionCache()
+            self.assertEqual(cache.get("key"), "hello")
+            self.assertEqual(cache.stats()['entries'], 1)  # copied into the local LRU
+            self.assertIsNone(cache.get("missing"))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+@override_settings(TRANSCRIPTION_JOBS={'EXECUTOR': 'thread', 'WORKERS': 1, 'MAX_QUEUE_DEPTH': 2, 'MAX_WAIT_S': 5})
+class JobQueueTests(TransactionTestCase):
+    """Background jobs on a thread pool, with run_job replaced by a stand-in."""
+
+    def setUp(self):
+        self.queue = jobs.JobQueue()
+        for patch in (mock.patch.object(jobs, 'job_queue', self.queue), mock.patch.object(jobs, 'run_job', self.run_job)):
+            patch.start()
+            self.addCleanup(patch.stop)
+        # Cleanups run last-in first-out: let the jobs finish before run_job is restored
+        self.addCleanup(lambda: self.queue._executor and self.queue._executor.shutdown(wait=True))
+        self.release = threading.Event()
+        self.release.set()
+        self.audio_paths = []
+
+    def run_job(self, job_id, audio_path, language, text):
+        self.audio_paths.append(audio_path)
+        with open(audio_path, 'rb') as f:
+            data = f.read()
+        self.release.wait(5)
+        if data == b'broken':
+            raise RuntimeError("could not decode")
+        return {'transcription': data.decode(), 'result': [[text, 'correct']] if text else None,
+                'timings': {'decode': 0.0}, 'started_at': timezone.now()}
+
+    def drain(self):
+        # Joining the pool threads also waits for the done callbacks that store the outcome:
+        # polling the in-memory test database while a pool thread writes to it can hit
+        # SQLite's shared-cache table locks
+        executor, self.queue._executor = self.queue._executor, None
+        executor.shutdown(wait=True)
+
+    def status(self, response):
+        return self.client.get(response.json()['status_url'], {'wait': 5}).json()
+
+    def post(self, data=b'hello', text='hello'):
+        return self.client.post('/api/jobs/', {'audio': SimpleUploadedFile('clip.wav', data),
+                                               'language': 'eng', 'text': text})
+
+    def test_job_runs_and_status_reports_the_result(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 202)
+        self.drain()
+        job = self.status(response)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual((job['transcription'], job['result']), ('hello', [['hello', 'correct']]))
+        self.assertIn('total', job['timings'])
+        # The upload was spooled to a file for the worker and removed afterwards
+        self.assertEqual(len(self.audio_paths), 1)
+        self.assertFalse(os.path.exists(self.audio_paths[0]))
+        self.assertEqual(self.queue.depth, 0)
+
+    def test_full_queue_answers_429(self):
+        self.release.clear()
+        first, second, third = self.post(), self.post(), self.post()
+        self.assertEqual((first.status_code, second.status_code, third.status_code), (202, 202, 429))
+        self.assertEqual(third['Retry-After'], '5')
+        self.release.set()
+        self.drain()
+        self.assertEqual(self.queue.depth, 0)
+        self.assertEqual(self.post().status_code, 202)
+
+    def test_failed_and_unknown_jobs(self):
+        with self.assertLogs(jobs.logger, 'ERROR'):
+            response = self.post(b'broken')
+            self.drain()
+        job = self.status(response)
+        self.assertEqual((job['status'], job['error']), ('failed', 'could not decode'))
+        self.assertEqual(self.client.get(f'/api/jobs/{uuid.uuid4()}/').status_code, 404)
+        self.assertEqual(self.client.get(response.json()['status_url'], {'wait': 'soon'}).status_code, 400)
+
+    def test_broken_pool_is_replaced(self):
+        from concurrent.futures.process import BrokenProcessPool
+
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool("a worker died")
+        self.queue._executor = broken
+        with self.assertLogs(jobs.logger, 'WARNING'):
+            response = self.post()
+        self.assertEqual(response.status_code, 202)
+        broken.shutdown.assert_called_once_with(wait=False)
+        self.assertIsNot(self.queue._executor, broken)
+        self.drain()
+        job = self.status(response)
+        self.assertEqual(job['status'], 'done')
+
+    def test_failure_to_store_the_outcome_marks_the_job_failed(self):
+        with mock.patch.object(jobs.JobQueue, '_save_outcome', side_effect=OperationalError("database is locked")), \
+                self.assertLogs(jobs.logger, 'ERROR'):
+            response = self.post()
+            self.drain()
+        job = self.status(response)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn("database is locked", job['error'])
+        self.assertIsNotNone(job['finished_at'])
+        self.assertEqual(self.queue.depth, 0)
+
+    def test_failed_submission_marks_the_job_failed(self):
+        from pronouncePerfect.models import TranscriptionJob
+
+        with mock.patch.object(self.queue, '_submit', side_effect=RuntimeError("no workers")), \
+                self.assertRaises(RuntimeError):
+            self.queue.submit(SimpleUploadedFile('clip.wav', b'hello'), 'eng')
+        job = TranscriptionJob.objects.get()
+        self.assertEqual((job.status, job.error), ('failed', "Could not queue the job: no workers"))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.queue.depth, 0)
+
+    def test_already_done_future_keeps_the_request_connection(self):
+        from concurrent.futures import Future
+
+        future = Future()
+        future.set_result({'transcription': 'hello', 'result': None, 'timings': {}, 'started_at': timezone.now()})
+        with mock.patch.object(self.queue, '_submit', return_value=future), \
+                mock.patch.object(jobs.connection, 'close') as close:
+            job = self.queue.submit(SimpleUploadedFile('clip.wav', b'hello'), 'eng')
+        close.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+
+
+class CompiledNormalizerTests(SimpleTestCase):
+    """The compiled normalizer must match the sequential reference exactly."""
+
+    PIECES = ['छान्', 'गार्न', 'ठीक', 'शीक्षा', 'पूर्ण', 'शुरू', 'हुंदै', 'मैँ', 'तिमीं', 'अत', 'प्राय', 'विशेषत',
+              'स', 'ष', 'व', 'क्ष', 'ज्ञ', 'क', 'त', 'अ', 'ा', 'ि', 'ं', 'ँ', 'ः', '्',
+              ' ', '  ', '\t', '\n', '\xa0', '1', '9', '!', '?', 'a']
+
+    def test_random_text_matches_sequential(self):
+        rng = random.Random(0)
+        for _ in range(5000):
+            text = ''.join(rng.choice(self.PIECES) for _ in range(rng.randint(0, 20)))
+            self.assertEqual(normalize_nepali_text(text), normalize_nepali_text_sequential(text), repr(text))
+
+    def test_rules_applied(self):
+        self.assertEqual(normalize_nepali_text('  ठीक  छ 12!\n'), 'ठिक छ १२।')
+        self.assertEqual(normalize_nepali_text('अत तिमीं'), 'अतः तिमीँ')
+
+
+class ComparerEquivalenceTests(SimpleTestCase):
+    """Memoized equivalence checks must agree with the uncached reference."""
+
+    PIECES = ['क', 'ख', 'ग', 'श', 'ष', 'स', 'व', 'ब', 'म', 'ल', 'न', 'छ', 'ा', 'ि', '्',
+              'छु', 'छौं', 'छौ', 'न्छ', 'न्छौ', 'नुहोस्', 'A', 'a']
+
+    def test_random_words_match_reference(self):
+        rng = random.Random(0)
+        comparer = NepaliTextComparer()
+        words = [''.join(rng.choice(self.PIECES) for _ in range(rng.randint(0, 5))) for _ in range(300)]
+        for _ in range(5000):
+            word1 = rng.choice(words)
+            related = generate_schwa_variations(word1) + sorted(get_rules().honorific_forms(word1))
+            word2 = rng.choice(related) if rng.random() < 0.3 else rng.choice(words)
+            self.assertEqual(comparer.are_equivalent(word1, word2), are_equivalent_uncached(word1, word2),
+                             (word1, word2))
+
+
+class NepaliRulesReloadTests(SimpleTestCase):
+    """Rule tables are swapped atomically on reload and kept when the new file is invalid."""
+
+    def tearDown(self):
+        reload_rules()
+
+    def test_reload_swaps_tables(self):
+        with open(DEFAULT_RULES_FILE, encoding='utf-8') as f:
+            data = json.load(f)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rules.json')
+            with override_settings(NEPALI_RULES_FILE=path):
+                data.update(version='test', sound_classes={'म': 'न'})
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                rules = reload_rules()
+                self.assertEqual(rules.version, 'test')
+                self.assertTrue(nepali_comparer.are_equivalent('मन', 'नन'))
+
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write('{not json')
+                self.assertIs(reload_rules(), rules)
+                self.assertIs(get_rules(), rules)
+
+    def test_word_tables_change_comparisons(self):
+        with open(DEFAULT_RULES_FILE, encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertFalse(nepali_comparer.are_equivalent('घर', 'मकान'))
+        self.assertEqual(nepali_comparer.compare_texts('घर', 'मकान'), [('मकान', 'incorrect')])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rules.json')
+            with override_settings(NEPALI_RULES_FILE=path):
+                data['homophones']['घर'] = ['मकान']
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                rules = reload_rules()
+                self.assertTrue(nepali_comparer.are_equivalent('मकान', 'घर'))
+                self.assertTrue(are_equivalent_uncached('मकान', 'घर', rules))
+                self.assertEqual(nepali_comparer.compare_texts('घर', 'मकान'), [('मकान', 'correct')])
+
+
+class SegmenterTests(SimpleTestCase):
+
+    def test_segments_run_together_text(self):
+        self.assertEqual(segment_nepali_text('मौसमपानीपरेकोछ'), ['मौसम', 'पानी', 'परेको', 'छ'])
+        self.assertEqual(segment_nepali_text('तिमी के हो'), ['तिमी', 'के', 'हो'])
+
+    def test_never_splits_before_combining_marks(self):
+        self.assertEqual(segment_nepali_text('मौसम्पानीपरेकोछ'), ['मौसम्', 'पानी', 'परेको', 'छ'])
+        self.assertEqual(segment_nepali_text('हामीगर्छौं'), ['हामी', 'गर्छौं'])
+
+    def test_frequencies_break_ties(self):
+        text = 'कखग'
+        self.assertEqual(segment_nepali_text(text, WordTrie({'कख': 100, 'ग': 100, 'क': 1, 'खग': 1})), ['कख', 'ग'])
+        self.assertEqual(segment_nepali_text(text, WordTrie({'कख': 1, 'ग': 1, 'क': 100, 'खग': 100})), ['क', 'खग'])
+
+    def test_compiled_lexicon_matches_trie(self):
+        rng = random.Random(0)
+        syllables = [c + m for c in 'कखगतनपमरसह' for m in ('', 'ा', 'ि', 'ो', '्')]
+        counts = {''.join(rng.choices(syllables, k=rng.randint(1, 3))): rng.randint(1, 50) for _ in range(2000)}
+        trie = WordTrie(counts)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'words.lex')
+            write_lexicon(counts, path)
+            compiled = CompiledLexicon(path)
+            self.assertEqual(len(compiled), len(trie))
+            self.assertEqual(compiled.unknown_cost, trie.unknown_cost)
+            self.assertEqual(sorted(compiled.words()), sorted(counts))
+            for _ in range(50):
+                text = ''.join(rng.choices(syllables, k=40))
+                self.assertEqual(list(compiled.prefixes(text, 3)), list(trie.prefixes(text, 3)))
+                self.assertEqual(segment_nepali_text(text, compiled), segment_nepali_text(text, trie))
+            compiled.close()
+
+
+class ForcedAlignmentTests(SimpleTestCase):
+
+    @staticmethod
+    def collapse(path, blank):
+        return [label for i, label in enumerate(path) if label != blank and (i == 0 or path[i - 1] != label)]
+
+    def test_viterbi_matches_exhaustive_search(self):
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            n_frames, targets = int(rng.integers(1, 6)), [int(t) for t in rng.integers(1, 4, size=rng.integers(0, 4))]
+            log_probs = np.log(rng.dirichlet(np.ones(4), size=n_frames))
+            best = max((log_probs[np.arange(n_frames), path].sum()
+                        for path in itertools.product(range(4), repeat=n_frames)
+                        if self.collapse(path, 0) == targets), default=None)
+
+            states = ctc_viterbi(log_probs, targets, blank_id=0)
+            if best is None:
+                self.assertIsNone(states)
+                continue
+            labels = np.zeros(2 * len(targets) + 1, dtype=int)
+            labels[1::2] = targets
+            path = labels[states]
+            self.assertEqual(self.collapse(path.tolist(), 0), targets)
+            self.assertAlmostEqual(log_probs[np.arange(n_frames), path].sum(), best)
+
+
+class ConfidenceTests(SimpleTestCase):
+
+    def setUp(self):
+        from transformers import Wav2Vec2CTCTokenizer
+        vocab = {"[PAD]": 0, "[UNK]": 1, "|": 2, "a": 3, "b": 4, "c": 5}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "vocab.json")
+            with open(path, "w") as f:
+                json.dump(vocab, f)
+            self.tokenizer = Wav2Vec2CTCTokenizer(path, pad_token="[PAD]", unk_token="[UNK]")
+
+    def test_confidences_follow_the_decoded_text(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            log_probs = np.log(rng.dirichlet(np.full(6, 0.3), size=int(rng.integers(1, 30))))
+            # Greedy output, or any other text a beam search could have picked
+            text = self.tokenizer.decode(log_probs.argmax(-1).tolist()) if rng.random() < 0.5 else "cab a"
+            confidences = transcription_confidences(log_probs, text, self.tokenizer, frame_duration=0.02, offset=1.0)
+            self.assertEqual([word["word"] for word in confidences["words"]], text.lower().split())
+            for entry in confidences["tokens"] + confidences["words"]:
+                if entry["confidence"] is not None:
+                    self.assertTrue(0 < entry["confidence"] <= 1)
+                    self.assertTrue(1.0 <= entry["start"] < entry["end"] <= 1.0 + 0.02 * len(log_probs) + 1e-9)
+
+    def test_confidences_score_the_decoded_tokens_not_the_argmax(self):
+        # The argmax path reads "ab"; a language model preferred "ac"
+        probs = np.full((3, 6), 0.02)
+        probs[0, 3], probs[1, 4], probs[1, 5], probs[2, 0] = 0.9, 0.6, 0.3, 0.9
+        confidences = transcription_confidences(np.log(probs / probs.sum(-1, keepdims=True)), "ac", self.tokenizer,
+                                                frame_duration=0.02)
+        self.assertEqual([token["token"] for token in confidences["tokens"]], ["a", "c"])
+        self.assertAlmostEqual(confidences["tokens"][1]["confidence"], 0.3 / 0.98, places=3)
+
+    def test_threshold_overrides_string_comparison(self):
+        result = [("hello", "incorrect"), ("world", "correct"), (",", "correct")]
+        self.assertEqual(apply_confidence_threshold(result, [0.9, 0.4, None], threshold=0.5),
+                         [("hello", "correct", 0.9), ("world", "incorrect", 0.4), (",", "correct", None)])
+
+    def test_non_numeric_threshold_is_rejected(self):
+        response = self.client.post('/api/process-audio-text/', {
+            'audio': SimpleUploadedFile('clip.wav', b'RIFF'), 'text': 'hello', 'language': 'eng',
+            'confidence_threshold': 'high'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('confidence_threshold', response.json()['error'])
+
+    def test_zero_threshold_and_false_flags(self):
+        from pronouncePerfect.services import alignment
+
+        with mock.patch.object(alignment, 'analyze_audio_file', return_value={'transcription': 'hello'}) as analyze:
+            response = self.client.post('/api/process-audio-text/', {
+                'audio': SimpleUploadedFile('clip.wav', b'RIFF'), 'text': 'hello', 'language': 'eng',
+                'confidence_threshold': '0', 'align': 'false', 'confidence': '0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(analyze.call_args.kwargs, {'align': False, 'confidence': False, 'threshold': 0.0})
+
+
+class BeamSearchDecoderTests(SimpleTestCase):
+
+    def setUp(self):
+        from transformers import Wav2Vec2CTCTokenizer
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "vocab.json")
+            with open(path, "w") as f:
+                json.dump({"[PAD]": 0, "|": 1, "a": 2, "b": 3, "[UNK]": 4}, f)
+            self.tokenizer = Wav2Vec2CTCTokenizer(path, pad_token="[PAD]", unk_token="[UNK]")
+
+    @staticmethod
+    def canonical(path):
+        # CTC collapse, with leading, repeated and trailing word delimiters dropped
+        labels = []
+        for i, label in enumerate(path):
+            if label == 0 or (i and path[i - 1] == label) or (label == 1 and (not labels or labels[-1] == 1)):
+                continue
+            labels.append(label)
+        return tuple(labels[:-1] if labels and labels[-1] == 1 else labels)
+
+    def test_wide_beam_finds_most_likely_text(self):
+        rng = np.random.default_rng(0)
+        decoder = BeamSearchDecoder(self.tokenizer, beam_width=1000, prune_log_prob=-np.inf)
+        for _ in range(100):
+            n_frames = int(rng.integers(1, 6))
+            log_probs = np.log(rng.dirichlet(np.full(5, 0.7), size=n_frames))
+            scores = {}
+            for path in itertools.product(range(5), repeat=n_frames):
+                text = self.canonical(path)
+                scores[text] = np.logaddexp(scores.get(text, -np.inf), log_probs[np.arange(n_frames), path].sum())
+            decoded = tuple(decoder.decode(log_probs))
+            self.assertAlmostEqual(scores[decoded], max(scores.values()))
+
+    def test_lm_and_expected_words_steer_ambiguous_frames(self):
+        # Every frame is an even split between "a" and "b"
+        log_probs = np.log(np.array([[0.02, 0.02, 0.47, 0.47, 0.02]] * 3))
+        lm = NgramLM([["b"], ["b"], ["a"]], order=2)
+        self.assertEqual(self.tokenizer.decode(BeamSearchDecoder(self.tokenizer, lm=lm).decode(log_probs),
+                                               group_tokens=False), "b")
+        biased = BeamSearchDecoder(self.tokenizer, lm=lm, hotword_bonus=2.0)
+        self.assertEqual(self.tokenizer.decode(biased.decode(log_probs, expected_text="A!"), group_tokens=False), "a")
+
+
+class WordAlignmentTests(SimpleTestCase):
+
+    @staticmethod
+    def full_cost(reference, hypothesis):
+        # Plain O(n * m) edit distance with the same costs
+        words = list(dict.fromkeys(reference + hypothesis))
+        pairs = list(itertools.product(range(len(words)), repeat=2))
+        costs = edit_distance_costs(words, [a for a, _ in pairs], [b for _, b in pairs])
+        costs = {(words[a], words[b]): cost for (a, b), cost in zip(pairs, costs)}
+        previous = list(range(len(hypothesis) + 1))
+        for i, word in enumerate(reference, 1):
+            current = [i]
+            for j, other in enumerate(hypothesis, 1):
+                current.append(min(previous[j - 1] + costs[word, other], previous[j] + 1, current[j - 1] + 1))
+            previous = current
+        return previous[-1]
+
+    def test_wide_band_is_optimal(self):
+        rng = random.Random(0)
+        vocabulary = ["cat", "cap", "dog", "dot", "bird", "a", "the"]
+        for _ in range(200):
+            reference = [rng.choice(vocabulary) for _ in range(rng.randint(0, 12))]
+            hypothesis = [rng.choice(vocabulary) for _ in range(rng.randint(0, 12))]
+            steps = align_words(reference, hypothesis, band=20)
+            self.assertEqual([s.ref_index for s in steps if s.ref_index is not None], list(range(len(reference))))
+            self.assertEqual([s.hyp_index for s in steps if s.hyp_index is not None], list(range(len(hypothesis))))
+            self.assertAlmostEqual(alignment_cost(steps), self.full_cost(reference, hypothesis))
+
+    def test_misread_word_pairs_with_what_was_said(self):
+        steps = align_words("she sells sea shells".split(), "she sell see shells today".split())
+        self.assertEqual([s.tag for s in steps], ['equal', 'replace', 'replace', 'equal', 'insert'])
+        self.assertEqual(compare_texts("she sell see shells today", "She sells sea shells", "eng"),
+                         [("She", "correct"), ("sells", "incorrect"), ("sea", "incorrect"), ("shells", "correct")])
+
+
+@override_settings(TRANSCRIPTION_CACHE={'ENABLED': False}, ASR_VAD={'ENABLED': False})
+class BatchScoringTests(SimpleTestCase):
+
+    def test_batches_forward_passes_and_reports_failures(self):
+        import soundfile as sf
+
+        passes = []
+
+        def compute_logits(waveforms, language):
+            passes.append(len(waveforms))
+            return None, None, [len(waveform) for waveform in waveforms]
+
+        with tempfile.TemporaryDirectory() as directory:
+            items = []
+            for i in range(5):
+                path = os.path.join(directory, f"{i}.wav")
+                sf.write(path, np.zeros(1600 * (i + 1), dtype=np.float32), 16000)
+                items.append(batch_scoring.BatchItem(path, path, "one two"))
+            broken = os.path.join(directory, "broken.wav")
+            with open(broken, "wb") as f:
+                f.write(b"not audio")
+            items.append(batch_scoring.BatchItem(broken, broken, "one two"))
+
+            with mock.patch.object(batch_scoring, "compute_logits", compute_logits), \
+                    mock.patch.object(batch_scoring, "decode_logits", lambda processor, frames, *args: "one"), \
+                    mock.patch.object(batch_scoring, "decode_audio_path",
+                                      side_effect=lambda path: sf.read(path, dtype="float32")[0]):
+                records = list(batch_scoring.score_batch(items, "eng", batch_size=2, decode_workers=2))
+
+        summary = records.pop()["summary"]
+        self.assertEqual(sorted(passes), [1, 2, 2])
+        self.assertEqual(summary["files"], 6)
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(summary["batches"], 3)
+        self.assertAlmostEqual(summary["audio_seconds"], 1.5)
+        by_name = {record["name"]: record for record in records}
+        self.assertIsNotNone(by_name[broken]["error"])
+        self.assertEqual(by_name[items[0].name]["result"], [("one", "correct"), ("two", "incorrect")])
+
+
+class MetricsTests(SimpleTestCase):
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', "Test.", 'stage', (0.1, 1.0))
+        for seconds in (0.05, 0.5, 5.0):
+            histogram.observe('forward', seconds)
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{stage="forward",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="forward",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="forward",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{stage="forward"} 5.550000', lines)
+
+    def test_spans_are_summed_per_request(self):
+        with metrics.collect_timings() as timings:
+            metrics.record('forward', 0.25)
+            metrics.record('forward', 0.5)
+            with metrics.span('comparison'):
+                pass
+        metrics.record('forward', 1.0)  # outside the request
+        self.assertEqual(timings['forward'], 0.75)
+        self.assertIn('comparison', timings)
+        self.assertIn('pronounce_stage_seconds_count{stage="forward"}', metrics.render_metrics())
+
+
+class TopologyTests(SimpleTestCase):
+
+    def test_workers_get_disjoint_cpu_blocks(self):
+        cpus = list(range(8))
+        blocks = [worker_topology(index, cpus, 3) for index in range(3)]
+        self.assertEqual(blocks, [(2, [0, 1]), (2, [2, 3]), (2, [4, 5])])
+        self.assertEqual(worker_topology(1, cpus, 3, intra_op_threads=1), (1, [2, 3]))
+
+    def test_more_workers_than_cpus_share_them(self):
+        self.assertEqual([worker_topology(index, [0, 1], 4) for index in range(4)],
+                         [(1, [0]), (1, [1]), (1, [0]), (1, [1])])
+
+    def test_forked_worker_splits_the_affinity_from_before_pinning(self):
+        # A worker forked from a master pinned to worker 0's block still gets its own block
+        with mock.patch.object(topology, '_initial_cpus', list(range(8))), \
+                mock.patch.object(topology, '_applied', None), \
+                mock.patch.object(topology, '_set_torch_threads'), \
+                mock.patch.object(topology.os, 'sched_getaffinity', return_value={0, 1}, create=True), \
+                mock.patch.object(topology.os, 'sched_setaffinity', create=True) as set_affinity:
+            applied = topology.apply_topology(2, workers=4, pin=True)
+        set_affinity.assert_called_once_with(0, [4, 5])
+        self.assertEqual((applied['intra_op_threads'], applied['cpus']), (2, [4, 5]))
+
+    def test_preloading_master_is_not_pinned(self):
+        with mock.patch.dict(os.environ, {'ASR_PRELOAD_FOR_FORK': '1'}), \
+                mock.patch.object(topology, 'apply_topology') as apply:
+            apps.get_app_config('pronouncePerfect').ready()
+        apply.assert_called_once_with(pin=False)
+
+
+class StartupImportTests(SimpleTestCase):
+    """Django start-up and the non-inference endpoints must not import the ML stack."""
+
+    HEAVY_MODULES = ('torch', 'transformers', 'librosa', 'pydub')
+
+    def heavy_modules_after(self, code):
+        """Heavy modules imported by a fresh process that sets up Django and runs `code`."""
+        script = (
+            "import sys, django\n"
+            "django.setup()\n"
+            "from django.test import Client\n"
+            f"{code}"
+            f"print([name for name in {self.HEAVY_MODULES!r} if name in sys.modules])\n"
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'Mispronunciation.settings'}
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.strip().splitlines()[-1]
+
+    def test_boot_does_not_import_ml_dependencies(self):
+        self.assertEqual(self.heavy_modules_after(
+            "from django.urls import get_resolver\n"
+            "import Mispronunciation.asgi\n"
+            "get_resolver().url_patterns\n"
+            "assert Client().get('/api/csrf-token/', HTTP_HOST='localhost').status_code == 200\n"
+        ), '[]')
+
+    def test_metrics_endpoints_do_not_import_ml_dependencies(self):
+        # A Prometheus scrape of a cold worker must not pay for loading torch
+        self.assertEqual(self.heavy_modules_after(
+            "assert Client().get('/metrics', HTTP_HOST='localhost').status_code == 200\n"
+            "assert Client().get('/api/model-status/', HTTP_HOST='localhost').status_code == 200\n"
+        ), '[]')
+
+    def test_services_exports_resolve_on_access(self):
+        import pronouncePerfect.services as services
+
+        self.assertIs(services.compare_texts, compare_texts)
+        with self.assertRaises(AttributeError):
+            services.missing_name
+
+
+class WeightSharingTests(SimpleTestCase):
+
+    def test_mapped_weights_give_the_same_logits(self):
+        from safetensors.torch import load_file
+
+        torch.manual_seed(0)
+        config = Wav2Vec2Config(vocab_size=32, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                                intermediate_size=64, conv_dim=(16,) * 7,
+                                num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2)
+        input_values = torch.randn(1, 16000)
+        with tempfile.TemporaryDirectory() as directory:
+            Wav2Vec2ForCTC(config).save_pretrained(directory)
+            path = os.path.join(directory, "model.safetensors")
+            mapped = mmap_safetensors(path)
+            for name, tensor in load_file(path).items():
+                self.assertTrue(torch.equal(mapped[name], tensor), name)
+
+            model = Wav2Vec2ForCTC.from_pretrained(directory).eval()
+            with torch.inference_mode():
+                expected = model(input_values).logits
+            self.assertGreater(map_model_weights(model, directory), 0)
+            with torch.inference_mode():
+                self.assertTrue(torch.equal(model(input_values).logits, expected))
+
+    @unittest.skipUnless(os.path.exists("/proc/self/smaps_rollup"), "Linux /proc is required")
+    def test_memory_breakdown_adds_up(self):
+        memory = memory_breakdown()
+        self.assertAlmostEqual(memory["shared"] + memory["private"], memory["rss"], delta=1.0)
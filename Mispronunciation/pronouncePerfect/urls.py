@@ -8,4 +8,8 @@ urlpatterns = [
     path('process-audio-text/', views.process_audio_text, name='process_audio_text'),
     path('csrf-token/', views.csrf_token_view, name='csrf_token'),
     path('get-practice-samples/', views.get_practice_samples, name='get_practice_samples'),
+    path('model-status/', views.model_status, name='model_status'),
+    path('batch-score/', views.batch_score, name='batch_score'),
+    path('jobs/', views.submit_job, name='submit_job'),
+    path('jobs/<uuid:job_id>/', views.job_status, name='job_status'),
 ]
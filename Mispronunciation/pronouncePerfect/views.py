@@ -1,20 +1,23 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.conf import settings
-from pronouncePerfect.services import process_audio_file, compare_texts,  NepaliTextComparer
 from django.views.decorators.csrf import csrf_exempt
 from pronouncePerfect.models import PracticeSample
+import json
 import os
-import librosa
 
 import logging
 logger = logging.getLogger(__name__)
-# import soundfile as sf
+# The inference views import pronouncePerfect.services inside the function: it loads torch,
+# transformers and librosa, which the other endpoints (and manage.py commands) do not need
 
-from pydub import AudioSegment
-from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
-import torch
-# import torchaudio
+# Form values that switch an option on ("0", "false", ... switch it off)
+TRUE_VALUES = {"1", "true", "on", "yes"}
+
+
+def is_true(value):
+    return str(value).strip().lower() in TRUE_VALUES
 
 # ------Render--------
 def pronouncePerfect(request):
@@ -27,6 +30,8 @@ def audio_upload(request):
 
 # Django view to process uploaded audio
 def process_audio(request):
+    from pronouncePerfect.services import process_audio_file
+
     if request.method == "POST":
         print("FILES RECEIVED:", request.FILES)
         
@@ -39,8 +44,12 @@ def process_audio(request):
         try:
             # Get uploaded audio file
             audio_file = request.FILES["audio"]
-            unique_name = f"temp_{audio_file.name}.wav" if audio_file.name else "temp_audio.wav"
             
+            if is_true(request.POST.get("confidence")):
+                # Token/word posterior confidences along with the transcription
+                from pronouncePerfect.services.alignment import analyze_audio_file
+                return JsonResponse(analyze_audio_file(audio_file, language, confidence=True))
+
             # process audio ( possible conversion + transcribes it)
             transcription = process_audio_file(audio_file, language)
 
@@ -54,6 +63,8 @@ def process_audio(request):
 
 # Django view to process audio and text
 def process_audio_text(request):
+    from pronouncePerfect.services import process_audio_file, compare_transcription
+
     if request.method == "POST":
         print("FILES RECEIVED:", request.FILES)
         if "audio" not in request.FILES or "text" not in request.POST:
@@ -72,20 +83,32 @@ def process_audio_text(request):
             if not audio_file or not text_input:
                 return JsonResponse({"error": "Missing audio file or text input"}, status=400)
 
-            # Process audio (converts if needed, transcribes)
-            transcription = process_audio_file(audio_file, language)
-
-            # Compare transcribed text with user input
-            if language=='eng':
-                comparison_result = compare_texts(transcription, text_input)
-            elif language == 'np':
-                nep = NepaliTextComparer()
-                comparison_result=nep.compare_texts(transcription, text_input)
-
-            return JsonResponse({
-                "transcription": transcription,
-                "result": comparison_result
-            })
+            threshold = request.POST.get("confidence_threshold", settings.COMPARISON_CONFIDENCE_THRESHOLD)
+            try:
+                threshold = None if threshold in (None, "") else float(threshold)
+            except ValueError:
+                return JsonResponse({"error": "confidence_threshold must be a number"}, status=400)
+            options = {
+                "align": is_true(request.POST.get("align")),
+                "confidence": is_true(request.POST.get("confidence")),
+                "threshold": threshold,
+            }
+            if options["threshold"] is not None or options["align"] or options["confidence"]:
+                # Alignment / confidences / confidence-based decisions, all from the same model pass
+                from pronouncePerfect.services.alignment import analyze_audio_file
+                response = analyze_audio_file(audio_file, language, text_input, **options)
+            else:
+                # Process audio (converts if needed, transcribes)
+                transcription = process_audio_file(audio_file, language, text_input)
+
+                # Compare transcribed text with user input
+                comparison_result = compare_transcription(transcription, text_input, language)
+
+                response = {
+                    "transcription": transcription,
+                    "result": comparison_result
+                }
+            return JsonResponse(response)
 
         except Exception as e:
             print(f"Error in process_audio text view: {e}")
@@ -116,6 +139,101 @@ def get_practice_samples(request):
         return JsonResponse({"samples": samples_list}, safe=False)
     return JsonResponse({"error": "Invalid request method"}, status=400)
 
+# Queue audio (+ optional text) for background processing; poll job_status for the result
+def submit_job(request):
+    from pronouncePerfect.services.jobs import QueueFull, job_queue, job_to_dict
+
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+    if "audio" not in request.FILES:
+        return JsonResponse({"error": "No audio file received"}, status=400)
+
+    language = request.POST.get("language")
+    if language not in ("eng", "np"):
+        return JsonResponse({"error": f"Unsupported language: {language}"}, status=400)
+
+    try:
+        job = job_queue.submit(request.FILES["audio"], language, request.POST.get("text", "").strip())
+    except QueueFull as e:
+        response = JsonResponse({"error": f"Too many pending jobs: {e}"}, status=429)
+        response["Retry-After"] = "5"
+        return response
+
+    payload = job_to_dict(job)
+    payload["status_url"] = reverse("job_status", args=[job.pk])
+    return JsonResponse(payload, status=202)
+
+# Job status; ?wait=<seconds> long-polls until the job finishes
+def job_status(request, job_id):
+    from pronouncePerfect.models import TranscriptionJob
+    from pronouncePerfect.services.jobs import job_to_dict, wait_for_job
+
+    try:
+        wait = float(request.GET.get("wait", 0))
+        job = wait_for_job(job_id, wait) if wait > 0 else TranscriptionJob.objects.get(pk=job_id)
+    except ValueError:
+        return JsonResponse({"error": "wait must be a number of seconds"}, status=400)
+    except TranscriptionJob.DoesNotExist:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    return JsonResponse(job_to_dict(job))
+
+# Scores a class's recordings at once: audio files under "audio", expected text(s) under "text"
+# (one for all files, or one per file in the same order) or a PracticeSample "sample_id".
+# Streams one JSON line per file as it is scored, then a summary line with the throughput.
+def batch_score(request):
+    from pronouncePerfect.services.batch_scoring import BatchItem, batch_scoring_settings, score_batch
+
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+    audio_files = request.FILES.getlist("audio")
+    if not audio_files:
+        return JsonResponse({"error": "No audio files received"}, status=400)
+    max_files = batch_scoring_settings()["MAX_FILES"]
+    if len(audio_files) > max_files:
+        return JsonResponse({"error": f"At most {max_files} files per batch"}, status=400)
+
+    language = request.POST.get("language")
+    if language not in ("eng", "np"):
+        return JsonResponse({"error": f"Unsupported language: {language}"}, status=400)
+
+    texts = [text.strip() for text in request.POST.getlist("text")]
+    if request.POST.get("sample_id"):
+        try:
+            texts = [PracticeSample.objects.get(pk=request.POST["sample_id"]).text]
+        except (PracticeSample.DoesNotExist, ValueError):
+            return JsonResponse({"error": "Practice sample not found"}, status=404)
+    if len(texts) not in (0, 1, len(audio_files)):
+        return JsonResponse({"error": "Send one text for all files or one text per file"}, status=400)
+    if len(texts) == 1:
+        texts = texts * len(audio_files)
+
+    items = [BatchItem(audio_file.name, audio_file, texts[i] if texts else "")
+             for i, audio_file in enumerate(audio_files)]
+    lines = (json.dumps(record, ensure_ascii=False) + "\n" for record in score_batch(items, language))
+    return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+# Prometheus text-format metrics: per-stage and per-view latency histograms, model and
+# transcription cache counters, queue depths
+def metrics(request):
+    from django.http import HttpResponse
+    from pronouncePerfect.services.metrics import render_metrics
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def model_status(request):
+    """Load time, memory footprint and hit counters of the cached ASR models."""
+    from pronouncePerfect.services.model_registry import model_registry
+    from pronouncePerfect.services.batching import batching_enabled, get_batch_scheduler
+    from pronouncePerfect.services.transcription_cache import transcription_cache
+    from pronouncePerfect.services.topology import topology_status
+    from pronouncePerfect.services.weight_sharing import memory_breakdown
+    status = model_registry.stats()
+    status['transcription_cache'] = transcription_cache.stats()
+    status['topology'] = topology_status()
+    status['memory_mb'] = memory_breakdown()
+    if batching_enabled():
+        status['batching'] = get_batch_scheduler().stats()
+    return JsonResponse(status)
+
 @csrf_exempt
 def csrf_token_view(request):
      return JsonResponse({'status': 'success'})
@@ -2,6 +2,7 @@ import { AudioRecorder } from "./src/audioRecorder.js";
 import { AudioSubmitter } from "./src/audioSubmitter.js";
 import { TranscriptionUI } from "./src/transcriptionUI.js";
 import { AudioTextSubmitter } from "./src/audioTextSubmitter.js";
+import { LiveFeedbackClient } from "./src/liveFeedback.js";
 
 /** Sets up event listeners and initializes the app when DOM content is fully loaded
  *  Code runs after the HTML document is fully loaded
@@ -167,6 +168,62 @@ class AudioPracticeApp {
 
     this.fetchPracticeSamples(parentElement);
     this.practiceTextInput = parentElement.querySelector("#practiceTextInput");
+
+    this.liveButton = parentElement.querySelector("#practiceLiveButton");
+    if (this.liveButton) {
+      this.initLiveFeedback(parentElement);
+    }
+  }
+
+  /** Word results while the user reads the selected sample, over the live feedback WebSocket */
+  initLiveFeedback(parentElement) {
+    const sampleSelector = parentElement.querySelector(
+      "#practiceSampleSelector"
+    );
+    sampleSelector.addEventListener("change", () => {
+      this.liveButton.disabled = false;
+    });
+
+    const showResult = (message) =>
+      this.transcriptionUI.showTranscription(
+        this.submitter.formatComparison(message.result)
+      );
+
+    this.liveButton.addEventListener("click", async () => {
+      if (this.live) {
+        this.stopLiveFeedback();
+        return;
+      }
+      const sample = sampleSelector.selectedOptions[0];
+      if (!sample || !sample.dataset.id) {
+        console.error("No practice sample selected!");
+        return;
+      }
+      this.live = new LiveFeedbackClient("/ws/live-feedback/", {
+        onPartial: showResult,
+        onFinal: showResult,
+        onError: (error) => {
+          console.error("Live feedback error:", error);
+          this.stopLiveFeedback();
+        },
+      });
+      this.liveButton.textContent = "Stop Live Feedback";
+      try {
+        // The server reads the sample's text and language from its id
+        await this.live.start({ sample_id: Number(sample.dataset.id) });
+      } catch (error) {
+        console.error("Could not start live feedback:", error);
+        this.stopLiveFeedback();
+      }
+    });
+  }
+
+  stopLiveFeedback() {
+    if (this.live) {
+      this.live.stop();
+      this.live = null;
+    }
+    this.liveButton.textContent = "Live Feedback";
   }
 
   getElementId(parentElement, id) {
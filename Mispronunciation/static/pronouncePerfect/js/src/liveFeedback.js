@@ -0,0 +1,63 @@
+/**
+ * Streams microphone audio to the live feedback WebSocket and reports
+ * incremental transcriptions / word results while the user reads.
+ *
+ * Usage:
+ *   const live = new LiveFeedbackClient("/ws/live-feedback/", {
+ *     onPartial: (msg) => ..., onFinal: (msg) => ..., onError: (err) => ...
+ *   });
+ *   await live.start({ language: "np", sample_id: 3 });
+ *   ...
+ *   live.stop();
+ */
+export class LiveFeedbackClient {
+  constructor(path, { onPartial, onFinal, onError } = {}) {
+    const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+    this.url = `${protocol}//${window.location.host}${path}`;
+    this.onPartial = onPartial || (() => {});
+    this.onFinal = onFinal || (() => {});
+    this.onError = onError || ((err) => console.error("Live feedback error:", err));
+  }
+
+  async start(session) {
+    this.stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    // The server expects 16 kHz mono float32 PCM; let the browser resample.
+    this.audioContext = new AudioContext({ sampleRate: 16000 });
+    this.source = this.audioContext.createMediaStreamSource(this.stream);
+    this.processor = this.audioContext.createScriptProcessor(4096, 1, 1);
+
+    this.socket = new WebSocket(this.url);
+    this.socket.binaryType = "arraybuffer";
+    this.socket.onmessage = (event) => this.handleMessage(JSON.parse(event.data));
+    this.socket.onerror = (event) => this.onError(event);
+
+    await new Promise((resolve) => (this.socket.onopen = resolve));
+    this.socket.send(JSON.stringify({ type: "start", format: "f32le", ...session }));
+
+    this.processor.onaudioprocess = (event) => {
+      if (this.socket.readyState === WebSocket.OPEN) {
+        // Copy: the input buffer is reused by the browser
+        const samples = new Float32Array(event.inputBuffer.getChannelData(0));
+        this.socket.send(samples.buffer);
+      }
+    };
+    this.source.connect(this.processor);
+    this.processor.connect(this.audioContext.destination);
+  }
+
+  handleMessage(message) {
+    if (message.type === "partial") this.onPartial(message);
+    else if (message.type === "final") this.onFinal(message);
+    else if (message.type === "error") this.onError(message.error);
+  }
+
+  stop() {
+    if (this.processor) this.processor.disconnect();
+    if (this.source) this.source.disconnect();
+    if (this.stream) this.stream.getTracks().forEach((track) => track.stop());
+    if (this.audioContext) this.audioContext.close();
+    if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+      this.socket.send(JSON.stringify({ type: "stop" }));
+    }
+  }
+}